@@ -0,0 +1,430 @@
+"""
+This example is a benchmark suite for the component loading paths of OPICS.
+It generates a synthetic library (XML look-up-table, sparam files in the
+formats A, B, and C, and npz files) and times each loading stage as well as
+the cold start of `import opics`. Results are written to a JSON file so they
+can be tracked over releases.
+
+Usage:
+    python io_benchmark.py --ports 4 --points 1000 --entries 100 --output io_benchmark.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import opics
+from opics.cache import interpolation_cache
+from opics.components import componentModel
+from opics.libraries.pack import build_pack
+from opics.utils import LUT_reader, LUT_processor, universal_sparam_filereader
+
+# ------------------------ synthetic library data ------------------------
+
+
+def synthetic_sparameters(nports, npoints, seed=0):
+    """
+    Generates a random frequency grid and s-parameters.
+
+    Args:
+        nports (int): Number of ports.
+        npoints (int): Number of frequency datapoints.
+        seed (int): Random seed.
+
+    Returns:
+        (f, s): Frequency data and (npoints, nports, nports) s-parameters.
+    """
+    rng = np.random.default_rng(seed)
+    f = np.linspace(opics.C / 1.6e-6, opics.C / 1.5e-6, npoints)
+    mag = rng.uniform(0.0, 1.0, (npoints, nports, nports))
+    phase = rng.uniform(-np.pi, np.pi, (npoints, nports, nports))
+    return f, mag * np.exp(1j * phase)
+
+
+def write_sparam_file(filepath, format_type, f, s):
+    """
+    Writes s-parameters in one of the Lumerical sparam formats read by
+    `opics.utils.universal_sparam_filereader`.
+
+    Args:
+        filepath (pathlib.Path): Output file path.
+        format_type (str): Sparam file format, "A", "B", or "C".
+        f (numpy.ndarray): Frequency data.
+        s (numpy.ndarray): S-parameter data.
+    """
+    nports = s.shape[-1]
+    with open(filepath, "w") as fid:
+        if format_type == "C":
+            # two-port grating coupler style columns, stored in decreasing order
+            data = [f[::-1]]
+            for m, n in ((0, 0), (0, 1), (1, 0), (1, 1)):
+                data += [np.abs(s[::-1, m, n]), np.angle(s[::-1, m, n])]
+            np.savetxt(fid, np.array(data).T, fmt="%.12e")
+            return
+
+        if format_type == "A":
+            for i in range(nports):
+                fid.write(f'["port {i+1}",""]\n')
+
+        for n in range(nports):
+            for m in range(nports):
+                fid.write(f'("port {m+1}","mode 1",1,"port {n+1}",1,"transmission")\n')
+                fid.write(f"({f.size}, 3)\n")
+                data = np.array([f, np.abs(s[:, m, n]), np.angle(s[:, m, n])]).T
+                np.savetxt(fid, data, fmt="%.12e")
+
+
+def write_lut(filepath, entries):
+    """
+    Writes an XML look-up-table.
+
+    Args:
+        filepath (pathlib.Path): Output file path.
+        entries (list): A list of (parameters, sparam_filename) tuples.
+    """
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<lumerical_lookup_table version="1.0" name="index_table">',
+    ]
+    for params, sparam_filename in entries:
+        lines.append("<association>")
+        lines.append("    <design>")
+        for key, value in params:
+            lines.append(f'        <value name="{key}" type="double">{value}</value>')
+        lines.append("    </design>")
+        lines.append("    <extracted>")
+        lines.append(
+            f'        <value name="sparam" type="string">{sparam_filename}</value>'
+        )
+        lines.append("    </extracted>")
+        lines.append("</association>")
+    lines.append("</lumerical_lookup_table>")
+    Path(filepath).write_text("\n".join(lines))
+
+
+def lut_parameters(idx):
+    """Look-up-table parameters of the synthetic entry `idx`."""
+    return [["gap", str(1e-7 + idx * 1e-9)], ["radius", str(5e-6)]]
+
+
+def create_library(dirpath, nports, npoints, entries):
+    """
+    Creates a synthetic component library.
+
+    Args:
+        dirpath (pathlib.Path): Library folder.
+        nports (int): Number of ports of each entry.
+        npoints (int): Number of frequency datapoints of each entry.
+        entries (int): Number of look-up-table entries.
+    """
+    dirpath.mkdir(parents=True, exist_ok=True)
+    f, s = synthetic_sparameters(nports, npoints)
+    for format_type in "ABC":
+        write_sparam_file(dirpath / f"format_{format_type}.sparam", format_type, f, s)
+    np.savez(dirpath / "sdata.npz", f=f, s=s)
+
+    write_lut(
+        dirpath / "lookup_table.xml",
+        [
+            (lut_parameters(i), f"entry_{i}.sparam" if i else "format_B.sparam")
+            for i in range(entries)
+        ],
+    )
+
+
+class SyntheticComponent(componentModel):
+    """A file-backed component that loads its data the way library components do."""
+
+    def __init__(self, f=opics.F, data_folder=None, filename=None, nports=4, gap=1e-7):
+        super().__init__(
+            f=f,
+            data_folder=data_folder,
+            filename=filename,
+            nports=nports,
+            sparam_attr="sparam",
+            gap=gap,
+            radius=5e-6,
+        )
+        self.s = self.load_sparameters(data_folder, filename)
+
+
+# ------------------------------ timing ----------------------------------
+
+
+def time_stage(func, repeats, setup=None):
+    """
+    Times a benchmark stage.
+
+    Args:
+        func (callable): Function to time.
+        repeats (int): Number of repetitions.
+        setup (callable, optional): Untimed function called before each repetition.
+
+    Returns:
+        dict: Timing statistics in seconds, or the error raised by the stage.
+    """
+    timings = []
+    try:
+        for _ in range(repeats):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    except Exception as error:
+        return {"error": f"{type(error).__name__}: {error}"}
+
+    return {
+        "repeats": repeats,
+        "min_s": float(np.min(timings)),
+        "median_s": float(np.median(timings)),
+        "mean_s": float(np.mean(timings)),
+    }
+
+
+def time_cold_import(repeats):
+    """
+    Times `import opics` in fresh interpreters, relative to an empty interpreter start.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+
+    def run(code):
+        subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    baseline = time_stage(lambda: run("pass"), repeats)
+    total = time_stage(lambda: run("import opics"), repeats)
+    if "error" in baseline or "error" in total:
+        return total
+
+    total["interpreter_median_s"] = baseline["median_s"]
+    total["import_median_s"] = total["median_s"] - baseline["median_s"]
+    return total
+
+
+def measure_component_memory(npoints, count=10000):
+    """
+    Measures the memory held by each instance of a large number of\
+        components that share a frequency grid, as in a large netlist.
+    """
+    f = np.linspace(opics.C / 1.6e-6, opics.C / 1.5e-6, npoints)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        components = [componentModel(f=f, nports=2) for _ in range(count)]
+        elapsed = time.perf_counter() - start
+        for each in components:
+            each.lambda_
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "count": count,
+        "bytes_per_component": size / count,
+        "median_s": elapsed / count,
+    }
+
+
+def run_benchmarks(workdir, nports, npoints, entries, repeats, large_ports=12):
+    """
+    Runs all stages of the benchmark suite.
+
+    Args:
+        workdir (pathlib.Path): Scratch folder for the synthetic library.
+        nports (int): Number of component ports.
+        npoints (int): Number of frequency datapoints in the data files.
+        entries (int): Number of look-up-table entries.
+        repeats (int): Number of repetitions of each stage.
+        large_ports (int): Number of ports of the large multi-port sparam files.
+
+    Returns:
+        dict: Results of each stage.
+    """
+    library = workdir / "library"
+    os.environ["OPICS_CACHE_DIR"] = str(workdir / "cache")
+    create_library(library, nports, npoints, entries)
+    results = {}
+
+    # look-up-table resolution, first and last (worst case) entries
+    for name, idx in (("first", 0), ("last", entries - 1)):
+        results[f"LUT_reader_{name}"] = time_stage(
+            lambda: LUT_reader(library, "lookup_table.xml", lut_parameters(idx)),
+            repeats,
+        )
+
+    # text sparam file parsing
+    for format_type in "ABC":
+        ports = 2 if format_type == "C" else nports
+        results[f"sparam_reader_{format_type}"] = time_stage(
+            lambda: universal_sparam_filereader(
+                ports, f"format_{format_type}.sparam", library, format_type
+            ),
+            repeats,
+        )
+        results[f"sparam_reader_{format_type}_auto"] = time_stage(
+            lambda: universal_sparam_filereader(
+                ports, f"format_{format_type}.sparam", library, "auto"
+            ),
+            repeats,
+        )
+
+    # large multi-port files, format detection and parsing throughput
+    f, s = synthetic_sparameters(large_ports, npoints, seed=1)
+    for format_type in "AB":
+        filename = f"large_{format_type}.sparam"
+        write_sparam_file(library / filename, format_type, f, s)
+        results[f"sparam_reader_{format_type}_large"] = time_stage(
+            lambda: universal_sparam_filereader(large_ports, filename, library),
+            repeats,
+        )
+        results[f"sparam_reader_{format_type}_large"]["nports"] = large_ports
+
+    results["npz_load"] = time_stage(
+        lambda: dict(np.load(library / "sdata.npz")), repeats
+    )
+
+    # cubic interpolation onto the default simulation grid
+    sdata = np.load(library / "sdata.npz")
+    source_f, source_s = sdata["f"], sdata["s"]
+    target = componentModel(f=opics.F, nports=nports)
+    results["interpolation_cubic"] = time_stage(
+        lambda: target.interpolate_sparameters(opics.F, source_f, source_s), repeats
+    )
+
+    # look-up-table processing: first use (text parse + conversion), then reuse
+    cold = workdir / "cold"
+
+    def fresh_library():
+        shutil.rmtree(cold, ignore_errors=True)
+        shutil.rmtree(workdir / "cache", ignore_errors=True)
+        shutil.copytree(library, cold)
+
+    results["LUT_processor_cold"] = time_stage(
+        lambda: LUT_processor(
+            cold, "lookup_table.xml", lut_parameters(0), nports, "sparam"
+        ),
+        repeats,
+        setup=fresh_library,
+    )
+    results["LUT_processor_warm"] = time_stage(
+        lambda: LUT_processor(
+            cold, "lookup_table.xml", lut_parameters(0), nports, "sparam"
+        ),
+        repeats,
+    )
+
+    # ahead-of-time library compilation, serial and with a process pool
+    results["library_compile_serial"] = time_stage(
+        lambda: build_pack(library, processes=1), repeats
+    )
+    results["library_compile_parallel"] = time_stage(
+        lambda: build_pack(library, processes=None), repeats
+    )
+
+    # look-up-table processing from the memory-mapped library pack
+    results["LUT_processor_pack"] = time_stage(
+        lambda: LUT_processor(
+            library, "lookup_table.xml", lut_parameters(0), nports, "sparam"
+        ),
+        repeats,
+    )
+
+    # end-to-end component construction, s-parameters are loaded on first use
+    def init_component():
+        SyntheticComponent(
+            data_folder=cold, filename="lookup_table.xml", nports=nports
+        ).materialize()
+
+    results["component_init"] = time_stage(
+        init_component, repeats, setup=interpolation_cache.clear
+    )
+    results["component_init_cached"] = time_stage(init_component, repeats)
+    results["component_init_deferred"] = time_stage(
+        lambda: SyntheticComponent(
+            data_folder=cold, filename="lookup_table.xml", nports=nports
+        ),
+        repeats,
+    )
+
+    results["component_memory"] = measure_component_memory(npoints)
+    results["import_opics_cold"] = time_cold_import(repeats)
+
+    for each in results.values():
+        each.setdefault("nports", nports)
+        each.setdefault("npoints", npoints)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ports", type=int, default=4, help="component port count")
+    parser.add_argument(
+        "--points", type=int, default=1000, help="frequency datapoints per data file"
+    )
+    parser.add_argument(
+        "--entries", type=int, default=100, help="look-up-table entries"
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="repetitions per stage")
+    parser.add_argument(
+        "--large-ports",
+        type=int,
+        default=12,
+        help="port count of the large multi-port sparam files",
+    )
+    parser.add_argument(
+        "--output", type=str, default="io_benchmark.json", help="JSON results file"
+    )
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="opics_io_benchmark_"))
+    try:
+        results = run_benchmarks(
+            workdir,
+            args.ports,
+            args.points,
+            args.entries,
+            args.repeats,
+            args.large_ports,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "opics_version": opics.__version__,
+        "python_version": platform.python_version(),
+        "numpy_version": np.__version__,
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "results": results,
+    }
+
+    with open(args.output, "w") as fid:
+        json.dump(report, fid, indent=2)
+
+    for stage, result in results.items():
+        if "error" in result:
+            print(f"{stage:32s} failed: {result['error']}")
+        elif "bytes_per_component" in result:
+            print(f"{stage:32s} {result['bytes_per_component']:10.0f} B per component")
+        else:
+            print(f"{stage:32s} {result['median_s']*1000:10.3f} ms (median)")
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
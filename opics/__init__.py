@@ -1,9 +1,11 @@
-"""Top-level package for OPICS."""
+"""Top-level package for OPICS.
 
-from opics import libraries
-from opics.network import Network
-from opics.utils import netlistParser
-from opics.globals import C, F
+Submodules, libraries, and the package attributes are imported on first\
+    access, so `import opics` is fast and has no side effects, e.g., in\
+    worker processes.
+"""
+
+from importlib import import_module
 
 __author__ = "Jaspreet Jhoja"
 __email__ = "jj@alumni.ubc.ca"
@@ -22,13 +24,34 @@ __all__ = [
     "F",
 ]
 
-print(
-    r"""
-   ____  ____  _______________
-  / __ \/ __ \/  _/ ____/ ___/
- / / / / /_/ // // /    \__ \
-/ /_/ / ____// // /___ ___/ /
-\____/_/   /___/\____//____/
-"""
-)
-print("OPICS version", __version__)
+# attributes imported on first access, {attribute: (module, name)}
+_lazy_attributes = {
+    "Network": ("opics.network", "Network"),
+    "netlistParser": ("opics.utils", "netlistParser"),
+    "C": ("opics.globals", "C"),
+    "F": ("opics.globals", "F"),
+}
+
+# the `opics.globals` submodule shadows the `globals` builtin once imported
+_namespace = globals()
+
+
+def __getattr__(attribute):
+    if attribute in _lazy_attributes:
+        module, name = _lazy_attributes[attribute]
+        value = getattr(import_module(module), name)
+    else:
+        try:
+            value = import_module(f"{__name__}.{attribute}")
+        except ModuleNotFoundError as error:
+            if error.name != f"{__name__}.{attribute}":
+                raise
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {attribute!r}"
+            ) from None
+    _namespace[attribute] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(_namespace) | set(__all__))
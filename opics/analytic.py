@@ -0,0 +1,236 @@
+"""Closed-form component models, vectorized over frequency and parameters"""
+
+from abc import ABCMeta, abstractmethod
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+from numpy import ndarray
+from opics.cache import analytic_cache, array_digest
+from opics.components import componentModel
+from opics.globals import C
+
+
+def _param_key(value) -> Hashable:
+    """Cache key of a parameter value, hashed if it is an array."""
+    if np.ndim(value) == 0:
+        return value.item() if isinstance(value, np.generic) else value
+    return array_digest(np.asarray(value))
+
+
+class AnalyticComponentModel(componentModel, metaclass=ABCMeta):
+    """
+    Base class of the components whose s-parameters are closed-form in the\
+        frequency and the component parameters.
+
+    Subclasses set the number of ports `num_ports` and the default parameter\
+        values `defaults`, and implement the vectorized `s_model`. There is\
+        no file I/O nor interpolation, and evaluated s-parameters are cached\
+        per frequency grid and parameter values.
+
+    Args:
+        f: Frequency datapoints.
+        params: Component parameter values, overriding the defaults.
+    """
+
+    num_ports = 2
+    defaults: Dict[str, float] = {}
+
+    def __init__(self, f: Optional[ndarray] = None, **params) -> None:
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError(
+                f"Unknown parameters {sorted(unknown)} for {type(self).__name__}, "
+                f"expected {sorted(self.defaults)}."
+            )
+        self.params = {**self.defaults, **params}
+        if any(np.ndim(each) for each in self.params.values()):
+            raise ValueError(
+                "Component parameters must be scalars, use `evaluate` to "
+                "compute the s-parameters of a batch of parameter values."
+            )
+
+        super().__init__(f=f, nports=self.num_ports, **self.params)
+        self.s = self.evaluate(self.f, **self.params)
+
+    @classmethod
+    @abstractmethod
+    def s_model(cls, f: ndarray, **params) -> ndarray:
+        """
+        Vectorized s-parameter model, implemented by the subclasses.
+
+        Args:
+            f: Frequency datapoints, shape is (f,).
+            params: Parameter values, as arrays of shape (*batch, 1) that\
+                broadcast against `f`.
+
+        Returns:
+            S-parameters, shape is (*batch, f, n, n).
+        """
+
+    @classmethod
+    def evaluate(cls, f: ndarray, **params) -> ndarray:
+        """
+        S-parameters at a batch of parameter values. Results are cached, and\
+            the returned arrays are read-only.
+
+        Args:
+            f: Frequency datapoints.
+            params: Parameter values, as scalars or arrays that broadcast\
+                together. Missing parameters take their default value.
+
+        Returns:
+            S-parameters, shape is (*batch, f, n, n), where batch is the\
+                broadcast shape of the parameter values.
+        """
+        values = {**cls.defaults, **params}
+        key = (
+            cls,
+            array_digest(f),
+            tuple((name, _param_key(values[name])) for name in sorted(values)),
+        )
+        s = analytic_cache.get(key)
+        if s is None:
+            names = sorted(values)
+            arrays = np.broadcast_arrays(
+                *[np.asarray(values[name], dtype=float) for name in names]
+            )
+            batch = arrays[0].shape if arrays else ()
+            s = cls.s_model(
+                np.asarray(f, dtype=float),
+                **{name: each[..., None] for name, each in zip(names, arrays)},
+            )
+            s = analytic_cache.put(
+                key, np.broadcast_to(s, batch + s.shape[-3:]).astype(np.complex128)
+            )
+        return s
+
+    @classmethod
+    def derivatives(
+        cls,
+        f: ndarray,
+        names: Optional[List[str]] = None,
+        rel_step: float = 1e-6,
+        **params,
+    ) -> Dict[str, ndarray]:
+        """
+        Derivatives of the s-parameters with respect to the parameters, by\
+            central differences of `s_model`, evaluated in a single batch.\
+            Subclasses can override them with closed forms.
+
+        Args:
+            f: Frequency datapoints.
+            names: Parameters to differentiate, defaults to all of them.
+            rel_step: Step relative to the parameter values, or absolute for\
+                parameters that are zero.
+            params: Scalar parameter values. Missing parameters take their\
+                default value.
+
+        Returns:
+            Derivatives {name: dS/dp}, each of shape (f, n, n).
+        """
+        values = {**cls.defaults, **params}
+        names = sorted(values) if names is None else list(names)
+        steps = np.array([rel_step * (abs(values[name]) or 1.0) for name in names])
+
+        # two parameter sets per parameter, shifted by +/- its step
+        shifts = np.zeros((2 * len(names), len(names)))
+        shifts[0::2][np.diag_indices(len(names))] = steps
+        shifts[1::2][np.diag_indices(len(names))] = -steps
+        batch = {
+            name: np.full((2 * len(names), 1), values[name], dtype=float)
+            for name in values
+        }
+        for i, name in enumerate(names):
+            batch[name] = batch[name] + shifts[:, i : i + 1]
+
+        s = cls.s_model(np.asarray(f, dtype=float), **batch)
+        s = np.broadcast_to(s, (2 * len(names),) + s.shape[-3:])
+        return {
+            name: (s[2 * i] - s[2 * i + 1]) / (2 * steps[i])
+            for i, name in enumerate(names)
+        }
+
+
+def _transmission(f: ndarray, length, neff, ng, wl0, loss) -> ndarray:
+    """
+    Complex transmission of a waveguide, with a first-order dispersive\
+        effective index around `wl0` and a propagation loss in dB/m.
+    """
+    wl = C / f
+    neff_wl = neff - (ng - neff) * (wl - wl0) / wl0
+    phase = 2 * np.pi * neff_wl * length / wl
+    return 10 ** (-loss * length / 20) * np.exp(-1j * phase)
+
+
+def _two_port(t: ndarray) -> ndarray:
+    """Reciprocal, reflectionless two-port s-parameters."""
+    s = np.zeros(t.shape + (2, 2), dtype=np.complex128)
+    s[..., 0, 1] = s[..., 1, 0] = t
+    return s
+
+
+class IdealWaveguide(AnalyticComponentModel):
+    """
+    Reflectionless waveguide with a linear dispersion.
+
+    Args:
+        f: Frequency datapoints.
+        length: Length (m).
+        neff: Effective index at `wl0`.
+        ng: Group index at `wl0`.
+        wl0: Center wavelength (m).
+        loss: Propagation loss (dB/m).
+    """
+
+    defaults = {"length": 10e-6, "neff": 2.44, "ng": 4.2, "wl0": 1.55e-6, "loss": 0.0}
+
+    @classmethod
+    def s_model(cls, f, length, neff, ng, wl0, loss):
+        return _two_port(_transmission(f, length, neff, ng, wl0, loss))
+
+
+class PhaseShifter(AnalyticComponentModel):
+    """
+    Reflectionless, wavelength independent phase shifter.
+
+    Args:
+        f: Frequency datapoints.
+        phase: Phase shift (rad).
+        insertion_loss: Insertion loss (dB).
+    """
+
+    defaults = {"phase": 0.0, "insertion_loss": 0.0}
+
+    @classmethod
+    def s_model(cls, f, phase, insertion_loss):
+        t = 10 ** (-insertion_loss / 20) * np.exp(-1j * phase) * np.ones_like(f)
+        return _two_port(t)
+
+
+class IdealCoupler(AnalyticComponentModel):
+    """
+    Lossless, reflectionless, wavelength independent directional coupler.\
+        Ports 0 and 1 are the inputs, port 2 is the through port of port 0\
+        and port 3 its cross port.
+
+    Args:
+        f: Frequency datapoints.
+        coupling: Power coupling ratio to the cross port.
+    """
+
+    num_ports = 4
+    defaults = {"coupling": 0.5}
+
+    @classmethod
+    def s_model(cls, f, coupling):
+        through = np.sqrt(1 - coupling) * np.ones_like(f)
+        cross = 1j * np.sqrt(coupling) * np.ones_like(f)
+
+        s = np.zeros(through.shape + (4, 4), dtype=np.complex128)
+        for i, j, value in (
+            (0, 2, through),
+            (1, 3, through),
+            (0, 3, cross),
+            (1, 2, cross),
+        ):
+            s[..., i, j] = s[..., j, i] = value
+        return s
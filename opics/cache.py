@@ -0,0 +1,217 @@
+""" Process-wide and on-disk caches used when loading component data
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+import numpy as np
+from numpy import ndarray
+
+
+def _nbytes(value: Any) -> int:
+    """Memory held by the numpy arrays in a cache value."""
+    if isinstance(value, ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(each) for each in value)
+    return 0
+
+
+class LRUCache:
+    """
+    A thread-safe, memory-bounded, least-recently-used cache.
+
+    Cached numpy arrays are shared by every caller that gets them, so they\
+        are made read-only when they are added to the cache.
+
+    Args:
+        max_bytes: Maximum memory held by the cached arrays. The least\
+            recently used entries are evicted when it is exceeded.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value cached for `key`, or `default` on a cache miss.
+        """
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """
+        Adds a value to the cache and evicts the least recently used entries\
+            if the memory bound is exceeded. Values larger than the bound are\
+            not cached.
+
+        Returns:
+            The value, with its arrays made read-only if it is cached.
+        """
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+
+        for each in value if isinstance(value, (tuple, list)) else [value]:
+            if isinstance(each, ndarray):
+                each.setflags(write=False)
+
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= _nbytes(self._data.pop(key))
+            self._data[key] = value
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= _nbytes(evicted)
+        return value
+
+    def clear(self) -> None:
+        """Removes all the cached entries."""
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+def file_identity(filepath: os.PathLike) -> Tuple[str, int, int]:
+    """
+    Identifies the content of a data file by its path, modification time,\
+        and size, without reading it.
+    """
+    stat = os.stat(filepath)
+    return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
+
+def array_digest(data: ndarray) -> str:
+    """Hash of the values of an array, e.g., a frequency grid."""
+    data = np.ascontiguousarray(data)
+    digest = hashlib.sha1(data.tobytes())
+    digest.update(str((data.dtype, data.shape)).encode())
+    return digest.hexdigest()
+
+
+_file_digests = {}
+
+
+def file_digest(filepath: os.PathLike) -> str:
+    """
+    SHA-256 hash of the content of a file. Hashes are memoized per process\
+        and recomputed when the file is modified.
+    """
+    identity = file_identity(filepath)
+    if identity not in _file_digests:
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as fid:
+            for block in iter(lambda: fid.read(2**20), b""):
+                digest.update(block)
+        _file_digests[identity] = digest.hexdigest()
+    return _file_digests[identity]
+
+
+def cache_dir(*subdirs: str, create: bool = True) -> Path:
+    """
+    User-level OPICS cache directory, `~/.opics/cache` by default.\
+        It can be moved with the `OPICS_CACHE_DIR` environment variable.
+
+    Args:
+        subdirs: Sub-directories of the cache directory.
+        create: Create the directory if it does not exist.
+    """
+    root = os.environ.get("OPICS_CACHE_DIR", Path.home() / ".opics" / "cache")
+    path = Path(root).joinpath(*subdirs)
+    if create:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class FileLock:
+    """
+    An exclusive, inter-process lock held on a lock file.
+
+    Args:
+        filepath: Path of the lock file, created if it does not exist.
+    """
+
+    def __init__(self, filepath: os.PathLike) -> None:
+        self.filepath = filepath
+        self._fid = None
+
+    def __enter__(self) -> "FileLock":
+        self._fid = open(self.filepath, "a+b")
+        if os.name == "nt":
+            import msvcrt
+
+            self._fid.seek(0)
+            msvcrt.locking(self._fid.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(self._fid.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if os.name == "nt":
+            import msvcrt
+
+            self._fid.seek(0)
+            msvcrt.locking(self._fid.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(self._fid.fileno(), fcntl.LOCK_UN)
+        self._fid.close()
+        self._fid = None
+
+
+def atomic_write(filepath: os.PathLike, write: Callable[[Any], None]) -> None:
+    """
+    Writes a file atomically: the data is written to a temporary file in the\
+        same directory, which then replaces `filepath`. Readers never see a\
+        partially written file.
+
+    Args:
+        filepath: Destination file path.
+        write: Function that writes the data to the binary file object it is given.
+    """
+    filepath = Path(filepath)
+    fid = tempfile.NamedTemporaryFile(
+        dir=filepath.parent, prefix=f".{filepath.name}.", delete=False
+    )
+    try:
+        with fid:
+            write(fid)
+            fid.flush()
+            os.fsync(fid.fileno())
+        os.replace(fid.name, filepath)
+    except BaseException:
+        if os.path.exists(fid.name):
+            os.remove(fid.name)
+        raise
+
+
+# interpolated component s-parameters, see componentModel.load_sparameters
+interpolation_cache = LRUCache()
+
+# evaluated analytic s-parameters, see AnalyticComponentModel.evaluate
+analytic_cache = LRUCache()
@@ -1,13 +1,194 @@
 import numpy as np
-from scipy.interpolate import interp1d
-import matplotlib.pyplot as plt
-from .utils import LUT_processor
+from numpy.lib.mixins import NDArrayOperatorsMixin
+from .utils import LUT_processor, LUT_reader
+from .cache import interpolation_cache, file_identity, array_digest
+from .libraries.pack import find_pack
+from .touchstone import read_touchstone, write_touchstone
+from .views import QUANTITIES, SParameterView, decimate
 from numpy import ndarray
 from pathlib import PosixPath
 from typing import Dict, List, Union
 from opics.globals import F, C
 import os
-import binascii
+import copy
+import itertools
+import weakref
+from collections.abc import MutableMapping
+
+_component_ids = itertools.count()
+_wavelengths = {}
+_placeholders = {}
+
+
+def _next_component_id() -> str:
+    """Unique component id, the process id keeps ids of worker processes apart."""
+    return f"{os.getpid():x}_{next(_component_ids):x}"
+
+
+def wavelengths(f: ndarray) -> ndarray:
+    """
+    Wavelengths (um) of a frequency grid, computed once and shared by every\
+        component defined on the same grid array. The returned array is\
+        read-only.
+    """
+    entry = _wavelengths.get(id(f))
+    if entry is not None and entry[0]() is f:
+        return entry[1]
+
+    lambda_ = C * 1e6 / f
+    lambda_.setflags(write=False)
+    try:
+        key = id(f)
+        ref = weakref.ref(f, lambda _: _wavelengths.pop(key, None))
+    except TypeError:
+        return lambda_  # not a numpy array, not shared
+    _wavelengths[key] = (ref, lambda_)
+    return lambda_
+
+
+class PortReferences(MutableMapping):
+    """
+    Port numbers and custom port names of a component, a mapping from each\
+        port number to its name (the number itself if it has no custom name)\
+        and from each custom name to its port number. Names are stored in an\
+        array that is only allocated when a port is named.
+
+    Args:
+        nports: Number of ports.
+    """
+
+    __slots__ = ("nports", "names")
+
+    def __init__(self, nports: int) -> None:
+        self.nports = nports
+        self.names = None
+
+    def _number(self, key) -> Union[int, None]:
+        if isinstance(key, (int, np.integer)) and not isinstance(key, bool):
+            return int(key) if 0 <= key < self.nports else None
+        if self.names is not None:
+            for number, name in enumerate(self.names):
+                if name is not None and name == key:
+                    return number
+        return None
+
+    def __getitem__(self, key):
+        number = self._number(key)
+        if number is None:
+            raise KeyError(key)
+        if isinstance(key, (int, np.integer)):
+            if self.names is not None and self.names[number] is not None:
+                return self.names[number]
+            return number
+        return number
+
+    def __setitem__(self, key, value) -> None:
+        # {port_number: port_name} or {port_name: port_number}
+        if isinstance(key, (int, np.integer)):
+            number, name = key, value
+        else:
+            number, name = value, key
+        if not 0 <= number < self.nports:
+            raise KeyError(number)
+        if self.names is None:
+            self.names = np.full(self.nports, None, dtype=object)
+        self.names[number] = None if name == number else name
+
+    def __delitem__(self, key) -> None:
+        number = self._number(key)
+        if number is None:
+            raise KeyError(key)
+        if self.names is not None:
+            self.names[number] = None
+
+    def __iter__(self):
+        yield from range(self.nports)
+        if self.names is not None:
+            yield from (each for each in self.names if each is not None)
+
+    def __len__(self) -> int:
+        if self.names is None:
+            return self.nports
+        return self.nports + sum(each is not None for each in self.names)
+
+    def copy(self) -> "PortReferences":
+        """A copy whose port names can be changed independently."""
+        other = PortReferences(self.nports)
+        if self.names is not None:
+            other.names = self.names.copy()
+        return other
+
+    def __repr__(self) -> str:
+        return f"PortReferences({dict(self)})"
+
+
+class DeferredSparameters(NDArrayOperatorsMixin):
+    """
+    S-parameters that are loaded and interpolated on first use.
+
+    Deferred s-parameters behave like the numpy array they stand for: indexing\
+        them, reading their array attributes, or using them in numpy operations\
+        materializes the data. Only the recipe (the component and the data\
+        location) is pickled, so components sent to worker processes load\
+        their data in the worker.
+
+    Args:
+        component: The component the s-parameters belong to.
+        data_folder: Directory path of the data folder.
+        filename: Name of the data file or of the XML look-up-table file.
+    """
+
+    __slots__ = ("component", "data_folder", "filename", "_data")
+
+    def __init__(
+        self, component: "componentModel", data_folder: PosixPath, filename: str
+    ) -> None:
+        self.component = component
+        self.data_folder = data_folder
+        self.filename = filename
+        self._data = None
+
+    def __getstate__(self):
+        return (self.component, self.data_folder, self.filename)
+
+    def __setstate__(self, state):
+        self.component, self.data_folder, self.filename = state
+        self._data = None
+
+    def materialize(self) -> ndarray:
+        """Loads and interpolates the s-parameters, once."""
+        if self._data is None:
+            self._data = self.component._load_sparameters(
+                self.data_folder, self.filename
+            )
+        return self._data
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.materialize()
+        return data if dtype is None else data.astype(dtype)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [
+            each.materialize() if isinstance(each, DeferredSparameters) else each
+            for each in inputs
+        ]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __len__(self) -> int:
+        return len(self.materialize())
+
+    def __getattr__(self, name):
+        # slots are unset while unpickling, do not recurse into materialize
+        if name.startswith("__") or name in DeferredSparameters.__slots__:
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._data is not None else "deferred"
+        return f"DeferredSparameters({self.data_folder / self.filename}, {state})"
 
 
 class componentModel:
@@ -24,8 +205,36 @@ class componentModel:
         filename (str): Name of the XML look-up-table file.
         sparam_attr (str, optional): Look-up-table attribute\
                 Defaults to None.
+
+    S-parameters returned by `load_sparameters` are loaded lazily, the first\
+        time `s` is used, unless the class sets `lazy_sparameters = False`.
+
+    S-parameters loaded from data files are shared by all the components\
+        that load the same data onto the same frequency grid, and are\
+        read-only. Assign a copy to `s` before modifying it in place, e.g.,\
+        `component.s = component.s.copy()`.
+
+    The base attributes are slotted and the wavelengths are shared per\
+        frequency grid, so that networks of many components stay compact.
     """
 
+    __slots__ = (
+        "f",
+        "_s",
+        "componentParameters",
+        "component_id",
+        "nports",
+        "_port_references",
+        "sparam_attr",
+        "sparam_file",
+        "_view",
+        "_lambda",
+        "__weakref__",
+    )
+
+    C = C
+    lazy_sparameters = True
+
     def __init__(
         self,
         f: ndarray = None,
@@ -41,28 +250,122 @@ class componentModel:
         if self.f is None:
             self.f = F
 
-        self.C = C
-
         self.s = s
         if s is None:
-            self.s = np.array((nports, nports))
-        self.lambda_ = self.C * 1e6 / self.f
-        self.componentParameters = []
-        self.component_id = str(binascii.hexlify(os.urandom(4)))[2:-1]
+            if nports not in _placeholders:
+                _placeholders[nports] = np.array((nports, nports))
+                _placeholders[nports].setflags(write=False)
+            self.s = _placeholders[nports]
+        self.componentParameters = [[key, str(value)] for key, value in kwargs.items()]
+        self.component_id = _next_component_id()
         self.nports = nports
 
-        self.port_references = {_: _ for _ in range(self.nports)}
+        self._port_references = None
+        self._view = None
+        self._lambda = None
         self.sparam_attr = sparam_attr
         self.sparam_file = filename
 
-        self.componentParameters.extend(
-            [key, str(value)] for key, value in kwargs.items()
-        )
+    @property
+    def lambda_(self) -> ndarray:
+        """
+        Wavelengths (um), shared by the components on the same grid, unless\
+            they are assigned.
+        """
+        if self._lambda is not None:
+            return self._lambda
+        return wavelengths(self.f)
+
+    @lambda_.setter
+    def lambda_(self, value: ndarray) -> None:
+        self._lambda = value
+
+    @property
+    def port_references(self) -> PortReferences:
+        """Port numbers and custom port names."""
+        if self._port_references is None:
+            self._port_references = PortReferences(self.nports)
+        return self._port_references
+
+    @port_references.setter
+    def port_references(self, value) -> None:
+        if isinstance(value, PortReferences) or value is None:
+            self._port_references = value
+            return
+        # a plain dictionary {port_number: port_name, port_name: port_number}
+        references = PortReferences(self.nports)
+        for key, name in value.items():
+            if isinstance(key, (int, np.integer)) and name != key:
+                references[key] = name
+        self._port_references = references
+
+    @property
+    def s(self) -> ndarray:
+        """
+        S-parameter data, loaded on first access if it is deferred. Data\
+            loaded from data files is shared and read-only.
+        """
+        if isinstance(self._s, DeferredSparameters):
+            self._s = self._s.materialize()
+        return self._s
+
+    @s.setter
+    def s(self, value: ndarray) -> None:
+        self._s = value
+
+    @property
+    def is_materialized(self) -> bool:
+        """Whether the s-parameter data is loaded."""
+        return not isinstance(self._s, DeferredSparameters)
 
-    def load_sparameters(self, data_folder: PosixPath, filename: str) -> ndarray:
+    def materialize(self) -> "componentModel":
+        """Loads the s-parameter data now if it is deferred."""
+        self.s
+        return self
+
+    def clone(self, component_id: str = None) -> "componentModel":
+        """
+        A copy of the component that shares its s-parameter data, loaded or\
+            deferred. The copy has its own port references, initially the\
+            same as the component's.
+
+        Args:
+            component_id: Component id of the copy. Defaults to a new id.
+        """
+        other = copy.copy(self)
+        other.component_id = component_id or _next_component_id()
+        other._view = None
+        if self._port_references is not None:
+            other._port_references = self._port_references.copy()
+        return other
+
+    def load_sparameters(
+        self, data_folder: PosixPath, filename: str
+    ) -> Union[ndarray, DeferredSparameters]:
         """
         Loads sparameters either from an npz file or from a raw sparam\
-             file using a look-up table.
+             file using a look-up table. Data is read from the library pack\
+             instead, if the library has one. The data is loaded on first use\
+             if `lazy_sparameters` is set.
+
+        Args:
+            data_folder: Directory path of the data folder containing\
+                 s-parameter data files and a look up table.
+            filename: Name of the XML look-up-table file.
+
+        Returns:
+            sparameters: Array of the component's s-parameters, or deferred\
+                s-parameters.
+        """
+        if self.lazy_sparameters:
+            return DeferredSparameters(self, data_folder, filename)
+        return self._load_sparameters(data_folder, filename)
+
+    def _load_sparameters(self, data_folder: PosixPath, filename: str) -> ndarray:
+        """
+        Loads sparameters either from an npz file or from a raw sparam\
+             file using a look-up table. Data is read from the library pack\
+             instead, if the library has one.
 
         Args:
             data_folder: Directory path of the data folder containing\
@@ -73,22 +376,68 @@ class componentModel:
             sparameters: Array of the component's s-parameters.
         """
 
+        # interpolated data is shared by all the instances that load the same
+        # data file onto the same frequency grid
+        grid = array_digest(self.f)
+
         if ".npz" in filename:
-            componentData = np.load(data_folder / filename)
-            return self.interpolate_sparameters(
-                self.f, componentData["f"], componentData["f"]
-            )
+            key = (file_identity(data_folder / filename), grid, "cubic")
+            sparameters = interpolation_cache.get(key)
+            if sparameters is None:
+                pack = find_pack(data_folder)
+                componentData = (
+                    pack.lookup_file(data_folder / filename) if pack else None
+                )
+                if componentData is None:
+                    npz = np.load(data_folder / filename)
+                    componentData = (npz["f"], npz["s"])
+                sparameters = interpolation_cache.put(
+                    key,
+                    self.interpolate_sparameters(
+                        self.f, componentData[0], componentData[1]
+                    ),
+                )
+            return sparameters
         else:
-            componentData, self.sparam_file = LUT_processor(
-                data_folder,
-                filename,
-                self.componentParameters,
+            # keyed on the data file of the look-up-table entry, which is read
+            sparam_files, _, _ = LUT_reader(
+                data_folder, filename, self.componentParameters
+            )
+            npz_files = [each for each in sparam_files if ".npz" in each]
+            data_file = data_folder / (npz_files[0] if npz_files else sparam_files[-1])
+            try:
+                data_identity = file_identity(data_file)
+            except OSError:
+                data_identity = None  # served from the library pack
+            key = (
+                file_identity(data_folder / filename),
+                data_identity,
+                tuple(sorted(tuple(each) for each in self.componentParameters)),
                 self.nports,
                 self.sparam_attr,
+                grid,
+                "cubic",
             )
-            return self.interpolate_sparameters(
-                self.f, componentData[0], componentData[1]
-            )
+            cached = interpolation_cache.get(key)
+            if cached is None:
+                componentData, sparam_file = LUT_processor(
+                    data_folder,
+                    filename,
+                    self.componentParameters,
+                    self.nports,
+                    self.sparam_attr,
+                )
+                cached = interpolation_cache.put(
+                    key,
+                    (
+                        self.interpolate_sparameters(
+                            self.f, componentData[0], componentData[1]
+                        ),
+                        sparam_file,
+                    ),
+                )
+            sparameters, self.sparam_file = cached
+            return sparameters
 
     def set_port_reference(self, port_number: int, port_name: str) -> None:
         """
@@ -106,7 +455,8 @@ class componentModel:
     ) -> ndarray:
         """
         Cubic interpolation of the component sparameter data to match the\
-             desired simulation frequency range.
+             desired simulation frequency range. The source data is returned\
+             as is if it is already sampled on the target frequency range.
 
         Args:
             target_f: The target frequency range onto which\
@@ -121,6 +471,11 @@ class componentModel:
                  over the target frequency range.
         """
 
+        if np.array_equal(source_f, target_f):
+            return source_s
+
+        from scipy.interpolate import interp1d
+
         func = interp1d(source_f, source_s, kind="cubic", axis=0)
         return func(target_f)
 
@@ -132,7 +487,8 @@ class componentModel:
         s_data: ndarray,
         port_name_tag="port ",
     ) -> None:
-        """Export the simulated s-parameters to a file.
+        """Export the simulated s-parameters to a file, in the Lumerical\
+            sparam format B read by `universal_sparam_filereader`.
 
         Args:
             dirpath: Directory path.
@@ -140,29 +496,72 @@ class componentModel:
             f_data: Frequency data.
             s_data: S-parameter data.
         """
-        with open(dirpath / filename, "w") as datafile_id:
-            datalen = s_data.shape[0]
-
-            incr = 1  # increment indexes by 1, initiates indexes from 1, not 0
+        nports = s_data.shape[-1]
+        row_format = "%.12e %.12e %.12e\n" * s_data.shape[0]
+        magnitude, phase = np.abs(s_data), np.angle(s_data)
 
-            for i in range(s_data.shape[1]):
-                for j in range(s_data.shape[2]):
+        with open(dirpath / filename, "w") as datafile_id:
+            # blocks are ordered by input port j, then output port i
+            for j in range(nports):
+                for i in range(nports):
                     datafile_id.write(
-                        f"('{port_name_tag}{i+incr}','TE',1,'{port_name_tag}{j+incr}',1,'transmission')\n"
+                        f"('{port_name_tag}{i+1}','TE',1,'{port_name_tag}{j+1}',1,'transmission')\n"
+                        f"({s_data.shape[0]},3)\n"
                     )
-                    datafile_id.write("(%d,3)\n" % (datalen))
+                    data = np.array([f_data, magnitude[:, i, j], phase[:, i, j]]).T
+                    datafile_id.write(row_format % tuple(data.ravel()))
 
-                    temp_data = s_data[:, i, j]
-                    data = np.array([f_data, np.abs(temp_data), np.angle(temp_data)])
-                    data = data.T
-                    np.savetxt(datafile_id, data, fmt=["%d", "%f", "%f"])
+    def write_touchstone(self, filepath: PosixPath, **kwargs) -> None:
+        """
+        Exports the s-parameters to a Touchstone file.
+
+        Args:
+            filepath: Touchstone file path, e.g., `circuit.s4p`.
+            kwargs: Options of `opics.touchstone.write_touchstone`, e.g.,\
+                data_format ("MA", "DB", "RI") and version (1, 2).
+        """
+        write_touchstone(filepath, self.f, self.s, **kwargs)
+
+    @classmethod
+    def from_touchstone(
+        cls, filepath: PosixPath, f: ndarray = None
+    ) -> "componentModel":
+        """
+        Creates a component from a Touchstone file.
+
+        Args:
+            filepath: Touchstone file path.
+            f: Frequency datapoints to interpolate the s-parameters on.\
+                Defaults to the frequencies of the file.
+        """
+        source_f, source_s, options = read_touchstone(filepath)
+        component = cls(
+            f=source_f if f is None else f, s=source_s, nports=options["nports"]
+        )
+        if f is not None:
+            component.s = component.interpolate_sparameters(f, source_f, source_s)
+        return component
+
+    @property
+    def view(self) -> SParameterView:
+        """
+        Cached views of the derived quantities of the s-parameters, see\
+            :class:`opics.views.SParameterView`.
+        """
+        if self._view is None:
+            self._view = SParameterView(self)
+        return self._view
 
     def get_data(
-        self, ports: List[List[int]] = None, xscale: str = "freq", yscale: str = "log"
+        self,
+        ports: List[List[int]] = None,
+        xscale: str = "freq",
+        yscale: str = "log",
+        max_points: int = None,
+        method: str = "minmax",
     ) -> Dict[str, Union[ndarray, str]]:
         """Get the S-parameters data for specific [input,output] port\
              combinations, to be used for plotting functionalities.
-        (WARNING: unused, to be used in plot_sparameters)
 
         Args:
             ports: List of lists that contains the desired\
@@ -170,42 +569,37 @@ class componentModel:
                      Defaults to None.
             xscale: Plotting x axis label. Defaults to "freq".
             yscale: Plotting Y axis label. Defaults to "log".
+            max_points: Decimate each S-parameter to about this many points,\
+                 keeping its peaks. Defaults to None, all the points.
+            method: Decimation method, "minmax" or "lttb".
 
         Returns:
             temp_data: Dictionary containing the plotting information\
                  to be used, including S-parameters data and plotting labels.
         """
-        ports_ = []  # ports the plot
-
-        if xscale == "freq":
-            x_data = self.f
-            xlabel = "Frequency (Hz)"
-        else:
-            x_data = self.C * 1e6 / self.f
-            xlabel = "Wavelength (um)"
-
-        temp_data = {"xdata": x_data, "xunit": xlabel}
         if ports is None:
             nports = self.s.shape[-1]
-            for i in range(nports):
-                ports_.extend("S_%d_%d" % (i, j) for j in range(nports))
-        else:
-            ports_ = ["S_%d_%d" % (each[0], each[1]) for each in ports]
-
-        for each_port in ports_:
-            _, i, j = each_port.split("_")
-            if yscale == "abs":
-                temp_data[each_port] = np.abs(self.s[:, int(i), int(j)])
-                temp_data["yunit"] = "abs"
-            elif yscale == "abs_sq":
-                temp_data[each_port] = np.square(np.abs(self.s[:, int(i), int(j)]))
-                temp_data["yunit"] = "abs_sq"
-
-            elif yscale == "log":
-                temp_data[each_port] = 10 * np.log10(
-                    np.square(np.abs(self.s[:, int(i), int(j)]))
+            ports = [[i, j] for i in range(nports) for j in range(nports)]
+
+        x_data, xlabel = self.view.xdata(xscale)
+        y_data = {
+            "S_%d_%d" % (i, j): self.view(int(i), int(j), yscale) for i, j in ports
+        }
+
+        if max_points is not None:
+            # the points kept for any of the S-parameters share the x data
+            idx = np.unique(
+                np.concatenate(
+                    [decimate(x_data, y, max_points, method) for y in y_data.values()]
                 )
-                temp_data["yunit"] = "dB"
+            )
+            x_data = x_data[idx]
+            y_data = {key: y[idx] for key, y in y_data.items()}
+
+        temp_data = {"xdata": x_data, "xunit": xlabel}
+        temp_data.update(y_data)
+        if y_data:
+            temp_data["yunit"] = QUANTITIES[yscale][1]
         return temp_data
 
     def plot_sparameters(
@@ -214,6 +608,8 @@ class componentModel:
         show_freq: bool = True,
         scale: str = "log",
         interactive: bool = False,
+        max_points: int = 2000,
+        method: str = "minmax",
     ):
         """Plot the component's S-parameters.
 
@@ -224,41 +620,39 @@ class componentModel:
             show_freq: Flag to determine whether to plot\
                  with respect to frequency or wavelength. Defaults to True.
             scale: Plotting y axis scale, options available:\
-                 ["log", "abs", "abs_sq"]. Defaults to "log".
+                 ["log", "abs", "abs_sq", "phase"]. Defaults to "log".
             interactive: Make the plots interactive or not.
+            max_points: Decimate each curve to about this many points, e.g.,\
+                 the plot width in pixels, keeping its peaks. None plots all\
+                 the points.
+            method: Decimation method, "minmax" or "lttb".
         """
-
-        ports_ = []  # ports the plot
-
-        if show_freq:
-            x_data = self.f
-            xlabel = "Frequency (Hz)"
-        else:
-            x_data = self.C * 1e6 / self.f
-            xlabel = "Wavelength (um)"
-
         if ports is None:
             nports = self.s.shape[-1]
-            for i in range(nports):
-                ports_.extend("S_%d_%d" % (i, j) for j in range(nports))
-        else:
-            ports_ = ["S_%d_%d" % (each[0], each[1]) for each in ports]
+            ports = [[i, j] for i in range(nports) for j in range(nports)]
+        ports_ = ["S_%d_%d" % (each[0], each[1]) for each in ports]
+        xscale = "freq" if show_freq else "lambda"
+        ylabels = {
+            "abs": "Transmission (normalized)",
+            "abs_sq": "Transmission (normalized^2)",
+            "log": "Transmission (dB)",
+            "phase": "Phase (rad)",
+        }
 
         if not interactive:
-            for each_port in ports_:
-                _, i, j = each_port.split("_")
-                if scale == "abs":
-                    plt.plot(x_data, np.abs(self.s[:, int(i), int(j)]))
-                    plt.ylabel("Transmission (normalized)")
-                elif scale == "abs_sq":
-                    plt.plot(x_data, np.square(np.abs(self.s[:, int(i), int(j)])))
-                    plt.ylabel("Transmission (normalized^2)")
-                elif scale == "log":
+            import matplotlib.pyplot as plt
+
+            x_data, xlabel = self.view.xdata(xscale)
+            for i, j in ports:
+                if max_points is None:
+                    plt.plot(x_data, self.view(int(i), int(j), scale))
+                else:
                     plt.plot(
-                        x_data,
-                        10 * np.log10(np.square(np.abs(self.s[:, int(i), int(j)]))),
+                        *self.view.decimated(
+                            int(i), int(j), scale, xscale, max_points, method
+                        )
                     )
-                    plt.ylabel("Transmission (dB)")
+            plt.ylabel(ylabels[scale])
             plt.xlabel(xlabel)
             plt.xlim(left=np.min(x_data), right=np.max(x_data))
             plt.tight_layout()
@@ -270,7 +664,13 @@ class componentModel:
             from bokeh.plotting import show
 
             hv.extension("bokeh")
-            temp_data = self.get_data(ports=ports, xscale="lambda", yscale=scale)
+            temp_data = self.get_data(
+                ports=ports,
+                xscale="lambda",
+                yscale=scale,
+                max_points=max_points,
+                method=method,
+            )
             filtered_s = dict(
                 [[key, temp_data[key]] for key in temp_data.keys() if "unit" not in key]
             )
@@ -1,8 +1,13 @@
-import yaml as _yaml
+"""OPICS component libraries
+
+The library catalogue is read, and the installed libraries are imported, on\
+    first access, e.g., `opics.libraries.ebeam`. Importing this package reads\
+    and writes no files.
+"""
+
+import sys
 import pathlib as _pathlib
 from importlib import import_module
-from opics.libraries.catalogue_mgmt import download_library, remove_library
-import sys
 
 _curr_dir = _pathlib.Path(__file__).parent.resolve()
 catalogue = _curr_dir / "catalogue.yaml"
@@ -16,37 +21,69 @@ ebeam:
   version: 0.3.34
 """
 
-
-if not catalogue.exists():
-    catalogue.write_text(default_catalog)
-    print(f"write {catalogue!r}")
-
-# read yaml file for available libraries in the catalogue
-with open(_curr_dir / "catalogue.yaml", "r") as _stream:
-    library_catalogue = _yaml.safe_load(_stream)
-
-
-def _import_external_libraries(library_catalogue):
-    installed_libraries = []
-
-    for each_lib in library_catalogue.keys():
-
-        if library_catalogue[each_lib]["installed"]:
-            sys.path.append(f"{library_catalogue[each_lib]['library_path']}")
-            installed_libraries.append(each_lib)
-            globals()[each_lib] = import_module(each_lib)
-
-    return installed_libraries
-
-
-installed_libraries = _import_external_libraries(library_catalogue)
-
 __all__ = [
     "download_library",
     "remove_library",
 ]
 
 
+def read_catalogue():
+    """
+    Reads the catalogue of the available libraries, or the default\
+        catalogue if no library was ever installed.
+    """
+    import yaml as _yaml
+
+    if catalogue.exists():
+        with open(catalogue, "r") as _stream:
+            return _yaml.safe_load(_stream)
+    return _yaml.safe_load(default_catalog)
+
+
+def _import_library(library_name):
+    entry = _module_attribute("library_catalogue").get(library_name)
+    if not entry or not entry["installed"]:
+        return None
+    if entry["library_path"] not in sys.path:
+        sys.path.append(f"{entry['library_path']}")
+    return import_module(library_name)
+
+
+def _module_attribute(name):
+    if name not in globals():
+        globals()[name] = __getattr__(name)
+    return globals()[name]
+
+
+def __getattr__(name):
+    if name == "library_catalogue":
+        value = read_catalogue()
+    elif name == "installed_libraries":
+        value = [
+            each
+            for each, entry in _module_attribute("library_catalogue").items()
+            if entry["installed"]
+        ]
+    elif name in ("download_library", "remove_library"):
+        from opics.libraries import catalogue_mgmt
+
+        value = getattr(catalogue_mgmt, name)
+    elif (_curr_dir / f"{name}.py").exists():
+        value = import_module(f"{__name__}.{name}")
+    else:
+        value = _import_library(name) if not name.startswith("_") else None
+        if value is None:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def _reset_catalogue():
+    """Forgets the catalogue read, after it is modified."""
+    globals().pop("library_catalogue", None)
+    globals().pop("installed_libraries", None)
+
+
 if __name__ == "__main__":
     import os
     import pathlib
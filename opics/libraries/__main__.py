@@ -0,0 +1,93 @@
+"""Command line tools for OPICS libraries
+
+Usage:
+    python -m opics.libraries compile <library> [--output PATH] [--processes N]
+
+`compile` parses every s-parameter file referenced by the look-up-tables of a\
+    library, in parallel, and writes the library pack: the binary data of\
+    every look-up-table entry, indexed by its parameters. Components of the\
+    library then never read text sparam files at run time.
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import List, Optional
+from opics.libraries.pack import LibraryPack, build_pack
+
+
+def resolve_library(library: str) -> Path:
+    """
+    Folder of a library, given an installed library name or a folder path.
+    """
+    from opics.libraries import library_catalogue
+
+    entry = library_catalogue.get(library)
+    if entry is not None:
+        if not entry["installed"]:
+            raise ValueError(f"Library {library!r} is not installed.")
+        return Path(entry["library_path"])
+
+    if not Path(library).is_dir():
+        raise ValueError(f"{library!r} is neither an installed library nor a folder.")
+    return Path(library)
+
+
+def compile_library(
+    library: str, output: Optional[str] = None, processes: Optional[int] = None
+) -> Path:
+    """
+    Compiles a library into a library pack.
+
+    Args:
+        library: Installed library name or library folder.
+        output: Pack file path. Defaults to the library folder if it is\
+            writable, otherwise to the user-level cache directory.
+        processes: Number of worker processes, None for one per CPU.
+
+    Returns:
+        The pack file path.
+    """
+    root = resolve_library(library)
+    start = time.perf_counter()
+    pack_path = build_pack(root, output, processes)
+
+    pack = LibraryPack(pack_path)
+    print(
+        f"compiled {len(pack)} entries ({len(pack.header['blocks'])} data blocks) "
+        f"of {root} into {pack_path} "
+        f"({pack_path.stat().st_size / 2**20:.1f} MiB) "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+    return pack_path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m opics.libraries", description="OPICS library tools."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser(
+        "compile", help="compile a library into a memory-mapped library pack"
+    )
+    compile_parser.add_argument("library", help="installed library name or folder")
+    compile_parser.add_argument("--output", help="pack file path")
+    compile_parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="number of worker processes, one per CPU by default",
+    )
+
+    args = parser.parse_args(argv)
+    try:
+        compile_library(args.library, args.output, args.processes)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
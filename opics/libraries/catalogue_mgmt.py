@@ -6,7 +6,14 @@ import shutil as _shutil
 from io import BytesIO as _BytesIO
 from pathlib import Path as _Path
 from zipfile import ZipFile as _ZipFile
-from urllib.request import urlopen as _urlopen
+from opics.libraries import catalogue, read_catalogue, _reset_catalogue
+
+
+def _write_catalogue(lib_catalogue):
+    """Writes the catalogue file, which is re-read on its next use."""
+    with open(catalogue, "w") as file:
+        _yaml.dump(lib_catalogue, file)
+    _reset_catalogue()
 
 
 def remove_library(library_name):
@@ -17,11 +24,8 @@ def remove_library(library_name):
         library_name (str): The library name.
     """
 
-    curr_dir = _Path(__file__).parent.resolve()
-
-    # read _yaml file for available libraries in the catalogue
-    with open(curr_dir / "catalogue.yaml", "r") as stream:
-        lib_catalogue = _yaml.safe_load(stream)
+    # available libraries in the catalogue
+    lib_catalogue = read_catalogue()
 
     # if the library is installed
     if lib_catalogue[f"{library_name}"]["installed"] is True:
@@ -38,8 +42,7 @@ def remove_library(library_name):
         lib_catalogue[f"{library_name}"]["library_path"] = ""
 
         # write the updated data-entries to the _yaml file
-        with open(curr_dir / "catalogue.yaml", "w") as file:
-            _yaml.dump(lib_catalogue, file)
+        _write_catalogue(lib_catalogue)
 
         return True
 
@@ -62,9 +65,8 @@ def download_library(
 
     curr_dir = _Path(__file__).parent.resolve()
 
-    # read _yaml file for available libraries in the catalogue
-    with open(curr_dir / "catalogue.yaml", "r") as stream:
-        lib_catalogue = _yaml.safe_load(stream)
+    # available libraries in the catalogue
+    lib_catalogue = read_catalogue()
 
     if lib_catalogue[f"{library_name}"]["installed"] is True:
         return True
@@ -106,8 +108,7 @@ def download_library(
     lib_catalogue[library_name]["library_path"] = library_dirpath
 
     # write the new data to the _yaml file
-    with open(curr_dir / "catalogue.yaml", "w") as file:
-        _yaml.dump(lib_catalogue, file)
+    _write_catalogue(lib_catalogue)
 
     return True
 
@@ -124,6 +125,8 @@ def download_and_extract(library_url, library_path):
     if library_url[:8] != "https://":
         return False
 
+    from urllib.request import urlopen as _urlopen
+
     with _urlopen(library_url) as Response:
 
         Length = Response.getheader("content-length")
@@ -0,0 +1,382 @@
+""" Consolidated, memory-mapped library pack format
+
+A library pack stores the s-parameter data of every component of a library\
+    in a single uncompressed binary file:
+
+    - 8 bytes: the magic string `OPICSPK1`,
+    - 8 bytes: little-endian length of the JSON header,
+    - the JSON header, with the offsets of the data blocks, the look-up keys\
+        that map to each block and the data file each was read from, and the\
+        signatures of the source files,
+    - the data blocks, 64-byte aligned: the frequency data (float64)\
+        followed by the s-parameters (complex128, fxnxn).
+
+Packs are opened with `numpy.memmap`, so the s-parameter data is paged in on\
+    demand and shared through the page cache by every process that uses the\
+    library.
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from math import isqrt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from numpy import ndarray
+from opics.cache import atomic_write, cache_dir, file_identity
+from opics.utils import LUT_index, universal_sparam_filereader
+
+PACK_FILENAME = "library.opicspack"
+_MAGIC = b"OPICSPK1"
+_ALIGN = 64
+
+
+def lut_key(lut_path: str, lutdata: List[List[str]]) -> str:
+    """
+    Pack key of a look-up-table entry.
+
+    Args:
+        lut_path: Path of the look-up-table file, relative to the library root.
+        lutdata: Look-up-table arguments.
+    """
+    params = sorted(f"{name}={value}" for name, value in lutdata)
+    return f"lut:{lut_path}|{';'.join(params)}"
+
+
+def file_key(data_path: str) -> str:
+    """
+    Pack key of a data file.
+
+    Args:
+        data_path: Path of the data file, relative to the library root.
+    """
+    return f"file:{data_path}"
+
+
+def _relative(path: Path, root: Path) -> str:
+    return Path(os.path.relpath(path, root)).as_posix()
+
+
+def _library_cache_path(library_root: Path, create: bool = True) -> Path:
+    """Location of the pack of a library in the user-level cache directory."""
+    digest = hashlib.sha1(str(Path(library_root).resolve()).encode()).hexdigest()
+    return cache_dir("packs", create=create) / f"{digest}.opicspack"
+
+
+class LibraryPack:
+    """
+    A read-only, memory-mapped library pack.
+
+    Args:
+        filepath: Path of the pack file.
+    """
+
+    def __init__(self, filepath: os.PathLike) -> None:
+        self.filepath = Path(filepath)
+        self._map = np.memmap(self.filepath, dtype=np.uint8, mode="r")
+
+        if bytes(self._map[:8]) != _MAGIC:
+            raise ValueError(f"{filepath} is not an OPICS library pack.")
+        header_len = int(self._map[8:16].view("<u8")[0])
+        self.header = json.loads(bytes(self._map[16 : 16 + header_len]))
+
+        # packs stored in a library folder are relative to that folder
+        if self.header["in_library"]:
+            self.root = self.filepath.parent.resolve()
+        else:
+            self.root = Path(self.header["root"])
+
+        self.entries = self.header["entries"]
+        self._valid_sources = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Tuple[ndarray, ndarray]]:
+        """
+        Frequency and s-parameter data of a pack key, as read-only views of the\
+            memory-mapped file. Returns None if the key is not in the pack.
+        """
+        if key not in self.entries:
+            return None
+        f_offset, nf, s_offset, nports = self.header["blocks"][self.entries[key]]
+        f = self._map[f_offset : f_offset + nf * 8].view(np.float64)
+        s = self._map[s_offset : s_offset + nf * nports * nports * 16]
+        return f, s.view(np.complex128).reshape(nf, nports, nports)
+
+    def is_current(self, source: Path) -> bool:
+        """
+        Checks whether a source file of the library is unchanged since the\
+            pack was built.
+        """
+        try:
+            identity = file_identity(source)
+        except OSError:
+            return False
+        if identity not in self._valid_sources:
+            signature = self.header["sources"].get(_relative(source, self.root))
+            self._valid_sources[identity] = signature == list(identity[1:])
+        return self._valid_sources[identity]
+
+    def lookup_lut(
+        self, filedir: Path, lutfilename: str, lutdata: List[List[str]]
+    ) -> Optional[Tuple[Tuple[ndarray, ndarray], str]]:
+        """
+        Data of a look-up-table entry, if the look-up-table and the data file\
+            of the entry are unchanged since the pack was built. Data files\
+            that were removed are served from the pack.
+
+        Returns:
+            ((f, s), key) or None.
+        """
+        lut_path = Path(filedir).resolve() / lutfilename
+        if not self.is_current(lut_path):
+            return None
+        key = lut_key(_relative(lut_path, self.root), lutdata)
+        data = self.get(key)
+        if data is None:
+            return None
+
+        # the data file of the entry may be removed, but not modified
+        data_file = self.header.get("data_files", {}).get(key)
+        if data_file is not None:
+            data_path = self.root / data_file
+            if data_path.exists() and not self.is_current(data_path):
+                return None
+        return data, key
+
+    def lookup_file(self, data_path: Path) -> Optional[Tuple[ndarray, ndarray]]:
+        """
+        Data of a data file of the library, if it is unchanged since the pack\
+            was built.
+        """
+        data_path = Path(data_path).resolve()
+        if not self.is_current(data_path):
+            return None
+        return self.get(file_key(_relative(data_path, self.root)))
+
+
+_open_packs = {}
+_pack_locations = {}
+
+
+def find_pack(filedir: os.PathLike) -> Optional[LibraryPack]:
+    """
+    Finds the library pack that covers a data folder: a pack file in the\
+        folder or one of its parents, or a pack built into the user-level\
+        cache directory for one of them. Packs are opened once per process.
+
+    Args:
+        filedir: Data folder of a component.
+    """
+    filedir = Path(filedir).resolve()
+    if filedir not in _pack_locations:
+        location = None
+        for each in [filedir, *filedir.parents]:
+            candidates = (each / PACK_FILENAME, _library_cache_path(each, False))
+            for candidate in candidates:
+                if candidate.is_file():
+                    location = candidate
+                    break
+            if location is not None:
+                break
+        _pack_locations[filedir] = location
+
+    location = _pack_locations[filedir]
+    if location is None:
+        return None
+    if location not in _open_packs:
+        _open_packs[location] = LibraryPack(location)
+    return _open_packs[location]
+
+
+def _infer_nports(filepath: Path) -> int:
+    """Number of ports of the s-parameters stored in a text sparam file."""
+    with open(filepath, "r") as fid:
+        # formats A and B have two header lines starting with "(" per s-parameter
+        headers = sum(1 for line in fid if line.startswith("("))
+    if headers == 0:
+        return 2  # format C, two-port columns
+    return isqrt(headers // 2)
+
+
+def _read_data_file(data_file: Path) -> Tuple[ndarray, ndarray]:
+    """Frequency and s-parameter data of an npz or a text sparam file."""
+    if data_file.suffix == ".npz":
+        npz = np.load(data_file)
+        return npz["f"], npz["s"]
+    return universal_sparam_filereader(
+        _infer_nports(data_file), data_file.name, data_file.parent, "auto"
+    )
+
+
+def read_library_data(
+    library_root: Path, processes: Optional[int] = 1
+) -> Tuple[Dict, Dict, Dict]:
+    """
+    Reads the data of every look-up-table entry and data file of a library.
+
+    Args:
+        library_root: Library folder.
+        processes: Number of worker processes that parse the data files,\
+            None for one per CPU. Files are read in this process if it is 1.
+
+    Returns:
+        The data {data file: (f, s)}, the pack keys {key: data file}, and the\
+            signatures of the source files {path: [mtime_ns, size]}.
+    """
+    library_root = Path(library_root).resolve()
+    tasks = _library_tasks(library_root)
+    files = tasks["files"]
+
+    if processes == 1 or len(files) < 2:
+        results = map(_read_data_file, files)
+        data = dict(zip(files, results))
+    else:
+        processes = processes or os.cpu_count() or 1
+        chunksize = max(1, len(files) // (4 * processes))
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(_read_data_file, files, chunksize=chunksize)
+            data = dict(zip(files, results))
+
+    return data, tasks["keys"], tasks["sources"]
+
+
+def _library_tasks(library_root: Path) -> Dict:
+    """
+    Lists the data files of a library and the pack keys that refer to them.
+    """
+    keys = {}
+    files = set()
+    sources = {}
+
+    for lut_path in sorted(library_root.rglob("*.xml")):
+        try:
+            _, index, _ = LUT_index(lut_path.parent, lut_path.name)
+        except Exception:
+            continue  # not a look-up-table
+
+        for params, (sparam_files, _) in index.items():
+            sparam_files = sparam_files.split(";")
+            npz_files = [each for each in sparam_files if ".npz" in each]
+            data_file = lut_path.parent / (
+                npz_files[0] if npz_files else sparam_files[-1]
+            )
+            if not data_file.is_file():
+                continue
+            files.add(data_file)
+            keys[lut_key(_relative(lut_path, library_root), params)] = data_file
+            sources[_relative(lut_path, library_root)] = list(
+                file_identity(lut_path)[1:]
+            )
+            sources[_relative(data_file, library_root)] = list(
+                file_identity(data_file)[1:]
+            )
+
+    for npz_path in sorted(library_root.rglob("*.npz")):
+        files.add(npz_path)
+        keys[file_key(_relative(npz_path, library_root))] = npz_path
+        sources[_relative(npz_path, library_root)] = list(file_identity(npz_path)[1:])
+
+    return {"keys": keys, "files": sorted(files), "sources": sources}
+
+
+def write_pack(
+    filepath: Path, library_root: Path, data: Dict, keys: Dict, sources: Dict
+) -> None:
+    """
+    Writes a library pack file atomically.
+
+    Args:
+        filepath: Pack file path.
+        library_root: Library folder.
+        data: The data {data file: (f, s)}.
+        keys: The pack keys {key: data file}.
+        sources: Signatures of the source files {path: [mtime_ns, size]}.
+    """
+    order = list(data.keys())
+    block_index = {each: i for i, each in enumerate(order)}
+
+    def _aligned(offset):
+        return -(-offset // _ALIGN) * _ALIGN
+
+    # data blocks are laid out after the header, whose size depends on the offsets
+    header = {}
+    data_start = 0
+    while True:
+        blocks = []
+        offset = data_start
+        for each in order:
+            f, s = data[each]
+            f_offset = offset
+            s_offset = _aligned(f_offset + f.size * 8)
+            blocks.append([f_offset, int(f.size), s_offset, int(s.shape[-1])])
+            offset = _aligned(s_offset + s.size * 16)
+
+        header = {
+            "version": 1,
+            "in_library": Path(filepath).parent.resolve()
+            == Path(library_root).resolve(),
+            "root": str(Path(library_root).resolve()),
+            "blocks": blocks,
+            "entries": {key: block_index[value] for key, value in keys.items()},
+            "data_files": {
+                key: _relative(value, library_root) for key, value in keys.items()
+            },
+            "sources": sources,
+        }
+        header_bytes = json.dumps(header).encode()
+        required = _aligned(16 + len(header_bytes))
+        if required <= data_start:
+            break
+        data_start = required
+
+    def _write(fid):
+        fid.write(_MAGIC)
+        fid.write(np.array([len(header_bytes)], dtype="<u8").tobytes())
+        fid.write(header_bytes)
+        for each, (f_offset, _, s_offset, _) in zip(order, header["blocks"]):
+            f, s = data[each]
+            fid.write(b"\0" * (f_offset - fid.tell()))
+            fid.write(np.ascontiguousarray(f, dtype="<f8").tobytes())
+            fid.write(b"\0" * (s_offset - fid.tell()))
+            fid.write(np.ascontiguousarray(s, dtype="<c16").tobytes())
+
+    atomic_write(filepath, _write)
+
+
+def build_pack(
+    library_root: os.PathLike,
+    output: Optional[os.PathLike] = None,
+    processes: Optional[int] = 1,
+) -> Path:
+    """
+    Builds the pack of a library.
+
+    Args:
+        library_root: Library folder.
+        output: Pack file path. Defaults to a pack file in the library folder\
+            if it is writable, otherwise to the user-level cache directory.
+        processes: Number of worker processes that parse the data files,\
+            None for one per CPU.
+
+    Returns:
+        The pack file path.
+    """
+    library_root = Path(library_root).resolve()
+    if output is None:
+        output = library_root / PACK_FILENAME
+        if not os.access(library_root, os.W_OK):
+            output = _library_cache_path(library_root)
+
+    write_pack(Path(output), library_root, *read_library_data(library_root, processes))
+
+    # drop the pack locations and maps opened before the pack was (re)built
+    _pack_locations.clear()
+    _open_packs.clear()
+    return Path(output)
@@ -1,9 +1,13 @@
 import os
 import binascii
-from typing import List, Optional, Dict, Union
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Dict, Tuple, Union
+import numpy as np
 from numpy import ndarray
-from opics.sparam_ops import connect_s
-from opics.components import componentModel
+from opics.sparam_ops import connect_s, connect_s_vjp, innerconnect_s_vjp, SparseSystem
+from opics.components import componentModel, PortReferences
+from opics.analytic import AnalyticComponentModel
 from opics.globals import F
 import multiprocessing as mp
 
@@ -42,11 +46,10 @@ def solve_tasks(
         new_net.remove(p2)
 
         new_component.nports = len(new_net)
-        port_references = {_: _ for _ in range(new_component.nports)}
-        new_component.port_references = port_references
+        new_component.port_references = PortReferences(new_component.nports)
 
     else:
-        combination_f = F
+        combination_f = components[0].f
         combination_s = connect_s(components[0].s, ntp[1], components[1].s, ntp[3])
 
         # nets of the new component
@@ -56,7 +59,7 @@ def solve_tasks(
 
         # create new component
         new_component = componentModel(
-            f=combination_f, s=combination_s, nets=new_net, nports=len(new_net)
+            f=combination_f, s=combination_s, nports=len(new_net)
         )
 
     return new_component, new_net
@@ -74,15 +77,28 @@ class Network:
                         1. "enabled" : bool - enable/disable multiprocessing,\n
                         2. "proc_count": int - process count\n
                         3. "close_pool": bool - Should the solver terminate all the processes after the simulation is finished.
+        solver: Network solver, either "pairwise" (default) to merge the\
+                    components one connection at a time, or "sparse" to solve\
+                    the whole network in a single global sparse linear system,\
+                    which scales better on large, highly interconnected netlists.
     """
 
+    solvers = ("pairwise", "sparse")
+
     def __init__(
         self,
         network_id: Optional[str] = None,
         f: Optional[ndarray] = None,
         mp_config: Dict = {"enabled": False, "proc_count": 0, "close_pool": False},
+        solver: str = "pairwise",
     ) -> None:
 
+        if solver not in self.solvers:
+            raise ValueError(
+                f"Unknown solver {solver!r}, expected one of {self.solvers}."
+            )
+        self.solver = solver
+
         self.f = f
         if self.f is None:
             self.f = F
@@ -93,6 +109,10 @@ class Network:
         self.global_netlist = {}
         self.port_references = {}
         self.sim_result = None
+        # precomputed merge schedule, e.g. from a cached netlist
+        self.schedule = None
+        # merges recorded for the reverse pass of the gradients
+        self.tape = None
 
         self.mp_config = mp_config
 
@@ -128,6 +148,7 @@ class Network:
             component_id: Custom component id tag.
         """
 
+        self.schedule = None
         if isinstance(component, componentModel):
             self.current_components[component.component_id] = component
             return component
@@ -137,13 +158,8 @@ class Network:
 
         temp_component = component(**params)
 
-        temp_component.component_id = (
-            temp_component.component_id
-            + "_"
-            + str(binascii.hexlify(os.urandom(4)))[2:-1]
-            if component_id is None
-            else component_id
-        )
+        if component_id is not None:
+            temp_component.component_id = component_id
 
         self.current_components[temp_component.component_id] = temp_component
 
@@ -165,9 +181,9 @@ class Network:
             component_B_id: A component ID or an instance of componentModel class.
             port_B: Port number of component_B
         """
-        if component_A_id.__class__.__bases__[-1] == componentModel:
+        if isinstance(component_A_id, componentModel):
             component_A_id = component_A_id.component_id
-        if component_B_id.__class__.__bases__[-1] == componentModel:
+        if isinstance(component_B_id, componentModel):
             component_B_id = component_B_id.component_id
 
         if type(port_A) == str:
@@ -175,6 +191,7 @@ class Network:
         if type(port_B) == str:
             port_B = self.current_components[component_B_id].port_references[port_B]
 
+        self.schedule = None
         self.current_connections.append(
             [
                 component_A_id,
@@ -184,6 +201,13 @@ class Network:
             ]
         )
 
+    def _port_count(self, component_id: str) -> int:
+        """Number of ports of a component, without loading deferred s-parameters."""
+        component = self.current_components[component_id]
+        if component.is_materialized:
+            return component.s.shape[-1]
+        return component.nports
+
     def initiate_global_netlist(self):
         """
         Initiates a global netlist with negative indices, \
@@ -198,7 +222,7 @@ class Network:
         for component_id in component_ids:
             temp_net = []
             # for each port of component
-            for each_port in range(self.current_components[component_id].s.shape[-1]):
+            for each_port in range(self._port_count(component_id)):
                 net_start -= 1
                 temp_net.append(net_start)
                 # if the port has a custom name
@@ -220,21 +244,19 @@ class Network:
 
         self.global_netlist = gnetlist
 
-    def global_to_local_ports(self, net_id: int, nets: List[List[int]]) -> List[int]:
+    def global_to_local_ports(
+        self, net_id: int, nets: Dict[str, List[int]]
+    ) -> List[int]:
         """
         Maps the net_id to components and their local port numbers.
 
         Args:
             net_id: Net id reference.
-            nets: Nets
+            nets: Nets of each component.
         """
-        _component_ids = self.current_components.keys()
-
         # Get components associated with the net_id
         filtered_components = [
-            each_comp_id
-            for each_comp_id in _component_ids
-            if net_id in nets[each_comp_id]
+            each_comp_id for each_comp_id in nets if net_id in nets[each_comp_id]
         ]
 
         if len(filtered_components) == 1:
@@ -246,10 +268,116 @@ class Network:
 
         return [filtered_components[0], net_idx[0], filtered_components[1], net_idx[1]]
 
-    def simulate_network(self) -> componentModel:
+    def merge_schedule(self) -> List[List[Tuple[List[int], str]]]:
+        """
+        Plans the pairwise merges of the components from the netlist alone,\
+            without loading any s-parameters.
+
+        Returns:
+            The rounds of independent merges. Each merge is a tuple\
+                (net_to_port, result_id), where net_to_port lists the merged\
+                components and their local ports, and result_id is the id of\
+                the resulting component.
+        """
+        if not bool(self.global_netlist):
+            self.initiate_global_netlist()
+
+        nets = {_: list(net) for _, net in self.global_netlist.items()}
+        t_connections = list(range(len(self.current_connections)))
+        merge_count = 0
+        schedule = []
+
+        while t_connections:
+
+            # track components and connections in use
+            _components_in_use = set()
+            _connections_in_use = set()
+            _round = []
+
+            for _connection in t_connections:
+                # get components and port indexes
+                net_to_port = self.global_to_local_ports(_connection, nets)
+
+                # components are already being used in another net, skip this connection
+                if (
+                    net_to_port[0] in _components_in_use
+                    or net_to_port[2] in _components_in_use
+                ):
+                    continue
+
+                _connections_in_use.add(_connection)
+                _components_in_use.add(net_to_port[0])
+                _components_in_use.add(net_to_port[2])
+                _round.append(net_to_port)
+
+            t_connections = [
+                each_conn
+                for each_conn in t_connections
+                if each_conn not in _connections_in_use
+            ]
+
+            # merged components are replaced by the results, in the order of the merges
+            merged_nets = {
+                _: nets.pop(_) for _ in list(nets.keys()) if _ in _components_in_use
+            }
+            merges = []
+            for net_to_port in _round:
+                net1 = list(merged_nets[net_to_port[0]])
+                if net_to_port[0] == net_to_port[2]:
+                    result_id = net_to_port[0]
+                    p1, p2 = net1[net_to_port[1]], net1[net_to_port[3]]
+                    net1.remove(p1)
+                    net1.remove(p2)
+                    new_net = net1
+                else:
+                    result_id = f"{self.network_id}_merge_{merge_count}"
+                    merge_count += 1
+                    net2 = list(merged_nets[net_to_port[2]])
+                    del net1[net_to_port[1]], net2[net_to_port[3]]
+                    new_net = net1 + net2
+
+                nets[result_id] = new_net
+                merges.append((net_to_port, result_id))
+
+            schedule.append(merges)
+
+        return schedule
+
+    def _load_components(self, component_ids: List[str]) -> Dict[str, Future]:
+        """
+        Loads the deferred s-parameters of components in background threads,\
+            in the given order.
+
+        Returns:
+            The pending loads {component_id: future}.
+        """
+        pending = [
+            _
+            for _ in dict.fromkeys(component_ids)
+            if _ in self.current_components
+            and not self.current_components[_].is_materialized
+        ]
+        if not pending:
+            return {}
+
+        executor = ThreadPoolExecutor()
+        loads = {
+            _: executor.submit(self.current_components[_].materialize) for _ in pending
+        }
+        # queued loads keep running, in submission order
+        executor.shutdown(wait=False)
+        return loads
+
+    def simulate_network(self, record: bool = False) -> componentModel:
         """
         Triggers the simulation
+
+        Args:
+            record: Record the merges, to compute the gradients of the\
+                result with `sparameter_gradients` and `parameter_gradients`.
         """
+        if record and self.solver != "pairwise":
+            raise ValueError("Gradients are computed with the pairwise solver.")
 
         # create global netlist
         if not bool(self.global_netlist):
@@ -269,88 +397,81 @@ class Network:
             self.global_netlist = {}
             raise RuntimeError("Some components are not connected.")
 
+        if self.solver == "sparse":
+            return self._simulate_sparse()
+
+        schedule = self.schedule or self.merge_schedule()
+        self.schedule = None
         t_components = self.current_components
         t_nets = self.global_netlist
-        t_connections = list(range(len(self.current_connections)))
-
-        _connections_in_use = set()
-
-        while t_connections:
+        tape = {"components": dict(t_components), "merges": []} if record else None
 
-            # track components and connections in use
-            _components_in_use = set()
-            _nets_in_use = set()
+        # deferred s-parameters are loaded in the order they are merged, worker
+        # processes load the data of the components they are sent
+        loads = {}
+        if not self.mp_config["enabled"]:
+            loads = self._load_components(
+                [
+                    each_id
+                    for merges in schedule
+                    for net_to_port, _ in merges
+                    for each_id in net_to_port[::2]
+                ]
+            )
+
+        def _solve(task):
+            # wait for the data of the merged components only
+            for each_id in task[1][::2]:
+                if each_id in loads:
+                    loads.pop(each_id).result()
+            return solve_tasks(task)
+
+        for merges in schedule:
             _task_bundle = []
-
-            # ------------ Step 1: Create Task Bundles------------------
-            # for loop to iterate over connections
-            for _connection in t_connections:
-                if _connection not in _connections_in_use:
-                    # get components and port indexes
-                    net_to_port = self.global_to_local_ports(_connection, t_nets)
-
-                    # components are already being used in another net, skip this connection
-                    if (
-                        net_to_port[0] in _components_in_use
-                        or net_to_port[2] in _components_in_use
-                    ):
-                        continue
-
-                    # lock components, nets, and connections to prevent from being used in other threads
-                    _connections_in_use.add(_connection)
-                    _components_in_use.add(net_to_port[0])
-                    _components_in_use.add(net_to_port[2])
-                    _nets_in_use.add(tuple(t_nets[net_to_port[0]]))
-                    _nets_in_use.add(tuple(t_nets[net_to_port[2]]))
-
-                    # -------- Step 2: add components to tasks bundles -----------
-                    if net_to_port[0] == net_to_port[2]:
-                        # if the both components are the same
-                        _task_bundle.append(
-                            [
-                                [t_components[net_to_port[0]], None],
-                                net_to_port,
-                                [t_nets[net_to_port[0]], t_nets[net_to_port[2]]],
-                            ]
-                        )
-
-                    else:
-                        _task_bundle.append(
-                            [
-                                [
-                                    t_components[net_to_port[0]],
-                                    t_components[net_to_port[2]],
-                                ],
-                                net_to_port,
-                                [t_nets[net_to_port[0]], t_nets[net_to_port[2]]],
-                            ]
+            for net_to_port, result_id in merges:
+                if net_to_port[0] == net_to_port[2]:
+                    # if the both components are the same
+                    components = [t_components[net_to_port[0]], None]
+                else:
+                    components = [
+                        t_components[net_to_port[0]],
+                        t_components[net_to_port[2]],
+                    ]
+                if record:
+                    # the merged s-matrices, before a merge replaces them
+                    for each_id in net_to_port[::2]:
+                        if each_id in loads:
+                            loads.pop(each_id).result()
+                    tape["merges"].append(
+                        (
+                            net_to_port,
+                            [None if _ is None else _.s for _ in components],
+                            result_id,
                         )
-
-            # ------- Step 3: Remove components, nets, connection ids ----------
-            for _ in _components_in_use:
-                if _ in t_components:
-                    t_components.pop(_)
-
-            for _ in list(t_nets.keys()):
-                if tuple(t_nets[_]) in _nets_in_use:
-                    t_nets.pop(_)
-
-            t_connections = [
-                each_conn
-                for each_conn in t_connections
-                if each_conn not in _connections_in_use
-            ]
+                    )
+                _task_bundle.append(
+                    [
+                        components,
+                        net_to_port,
+                        [t_nets[net_to_port[0]], t_nets[net_to_port[2]]],
+                    ]
+                )
+
+            # remove the merged components and their nets
+            for net_to_port, _ in merges:
+                for each_id in net_to_port[::2]:
+                    t_components.pop(each_id, None)
+                    t_nets.pop(each_id, None)
 
             # ------- solve tasks and merge results -----------
             if self.mp_config["enabled"]:
                 results = self.pool.map(solve_tasks, _task_bundle)
             else:
-                results = [solve_tasks(_) for _ in _task_bundle]
+                results = [_solve(_) for _ in _task_bundle]
 
-            # merge results
-            for each_result in results:
-                t_components[each_result[0].component_id] = each_result[0]
-                t_nets[each_result[0].component_id] = each_result[1]
+            for (component, net), (_, result_id) in zip(results, merges):
+                t_components[result_id] = component
+                t_nets[result_id] = net
 
         if self.mp_config["enabled"] and self.mp_config["close_pool"]:
             self.pool.close()
@@ -359,8 +480,194 @@ class Network:
         t_components[list(t_components.keys())[-1]].component_id = self.network_id
         self.sim_result = t_components[list(t_components.keys())[-1]]
         self.current_connections = []
+        if record:
+            tape["result"] = list(t_components.keys())[-1]
+        self.tape = tape
         return t_components[list(t_components.keys())[-1]]
 
+    def sparameter_gradients(self, grad: ndarray) -> Dict[str, ndarray]:
+        """
+        Gradients of a real loss with respect to the s-parameters of the\
+            components, in one reverse pass through the recorded merges of\
+            the last simulation, see `simulate_network(record=True)`.
+
+        Gradients of a real loss `L` with respect to complex s-parameters `S`\
+            are `dL/dRe(S) + 1j * dL/dIm(S)`, e.g., `2 * (S - target)` for\
+            `L = sum(abs(S - target) ** 2)`.
+
+        Args:
+            grad: Gradient of the loss with respect to the s-parameters of\
+                the simulation result, shape is fxnxn.
+
+        Returns:
+            The gradients with respect to the s-parameters of each component\
+                {component_id: gradient}.
+        """
+        if self.tape is None:
+            raise RuntimeError(
+                "No recorded simulation, use simulate_network(record=True)."
+            )
+
+        grads = {self.tape["result"]: np.asarray(grad, dtype=np.complex128)}
+        for net_to_port, (s_a, s_b), result_id in reversed(self.tape["merges"]):
+            result_grad = grads.pop(result_id, None)
+            if result_grad is None:
+                # a part of the network that is not connected to the result
+                continue
+            if s_b is None:
+                grads[net_to_port[0]] = innerconnect_s_vjp(
+                    s_a, net_to_port[1], net_to_port[3], result_grad
+                )
+            else:
+                grads[net_to_port[0]], grads[net_to_port[2]] = connect_s_vjp(
+                    s_a, net_to_port[1], s_b, net_to_port[3], result_grad
+                )
+        return grads
+
+    def parameter_gradients(self, grad: ndarray) -> Dict[str, Dict[str, float]]:
+        """
+        Gradients of a real loss with respect to the parameters of the\
+            analytic components, chaining `sparameter_gradients` with the\
+            derivatives of the component models.
+
+        Args:
+            grad: Gradient of the loss with respect to the s-parameters of\
+                the simulation result, see `sparameter_gradients`.
+
+        Returns:
+            The gradients {component_id: {parameter: gradient}}.
+        """
+        gradients = {}
+        for component_id, s_grad in self.sparameter_gradients(grad).items():
+            component = self.tape["components"][component_id]
+            if not isinstance(component, AnalyticComponentModel):
+                continue
+            derivatives = component.derivatives(component.f, **component.params)
+            gradients[component_id] = {
+                name: float(np.sum((s_grad.conj() * each).real))
+                for name, each in derivatives.items()
+            }
+        return gradients
+
+    def _sparse_system(self):
+        """
+        Assembles the global sparse linear system of the network.
+
+        Returns:
+            The :class:`opics.sparam_ops.SparseSystem`, the net of each global\
+                port, and the global port indices of each connection net.
+        """
+        component_ids = list(self.global_netlist.keys())
+        for load in self._load_components(component_ids).values():
+            load.result()
+        blocks = [self.current_components[_].s for _ in component_ids]
+        nets = list(itertools.chain(*[self.global_netlist[_] for _ in component_ids]))
+
+        # global port indices of each connection net
+        net_ports = {}
+        for port, net in enumerate(nets):
+            if net >= 0:
+                net_ports.setdefault(net, []).append(port)
+
+        for net, ports in net_ports.items():
+            if len(ports) != 2:
+                raise RuntimeError(f"Net {net} does not connect exactly two ports.")
+
+        return SparseSystem(blocks, list(net_ports.values())), nets, net_ports
+
+    def _simulate_sparse(self) -> componentModel:
+        """
+        Solves the network in a single global sparse linear system.
+        """
+        try:
+            system, nets, _ = self._sparse_system()
+        except RuntimeError:
+            self.global_netlist = {}
+            raise
+
+        s = system.external_s()
+        result = componentModel(f=self.f, s=s, nports=s.shape[-1])
+        result.component_id = self.network_id
+
+        self.current_components = {self.network_id: result}
+        self.global_netlist = {self.network_id: [nets[_] for _ in system.external]}
+        self.current_connections = []
+        self.sim_result = result
+        return result
+
+    def _external_net(self, port: Union[int, str, tuple]) -> int:
+        """
+        Resolves an external port reference to its (negative) net id.
+
+        Args:
+            port: A net id, a custom port name, or a (component_id, port) tuple.
+        """
+        if isinstance(port, tuple):
+            component_id, local_port = port
+            if isinstance(component_id, componentModel):
+                component_id = component_id.component_id
+            if isinstance(local_port, str):
+                local_port = self.current_components[component_id].port_references[
+                    local_port
+                ]
+            return self.global_netlist[component_id][local_port]
+
+        if isinstance(port, str):
+            for net, name in self.port_references.items():
+                if name == port:
+                    return net
+            raise KeyError(f"Unknown port name {port!r}.")
+
+        return port
+
+    def solve_excitation(self, excitation: Dict) -> Dict:
+        """
+        Solves the network response to a set of input port excitations only,\
+            without computing the full network s-matrix. Unlike\
+            `simulate_network`, the wave amplitudes on the internal connection\
+            nets are kept, and the network is left unchanged.
+
+        Args:
+            excitation: Incident wave amplitude (a scalar or an array over the\
+                frequency points) for each excited external port, e.g.,\
+                {("gc_in", 1): 1.0}. Ports are referenced by net id, custom\
+                port name, or (component_id, port) tuple.
+
+        Returns:
+            A dictionary with the outgoing wave amplitudes at each external\
+                port, {"outputs": {net_id: amplitude}}, and the amplitudes\
+                of the waves travelling in both directions on each connection\
+                net, {"nets": {net_id: {"forward": amplitude, "backward": amplitude}}}.\
+                "forward" is the wave leaving the component that was added\
+                first to the network.
+        """
+        if not bool(self.global_netlist):
+            self.initiate_global_netlist()
+
+        system, nets, net_ports = self._sparse_system()
+        external_nets = [nets[_] for _ in system.external]
+
+        a_E = np.zeros((system.nf, system.nE), dtype=np.complex128)
+        for port, amplitude in excitation.items():
+            net = self._external_net(port)
+            if net not in external_nets:
+                raise ValueError(f"Port {port!r} is not an external port.")
+            a_E[:, external_nets.index(net)] += amplitude
+
+        b_E, a_I = system.solve_excitation(a_E)
+
+        internal_idx = {port: i for i, port in enumerate(system.internal)}
+        return {
+            "outputs": {net: b_E[:, i] for i, net in enumerate(external_nets)},
+            "nets": {
+                net: {
+                    "forward": a_I[:, internal_idx[ports[1]]],
+                    "backward": a_I[:, internal_idx[ports[0]]],
+                }
+                for net, ports in net_ports.items()
+            },
+        }
+
     def enable_mp(self, process_count: int = 0, close_pool: bool = True):
         """
         Enables OPICS multiprocessing
@@ -424,10 +731,7 @@ def inst_components(component_data: dict):
 
     temp_component = component_data["component"](**component_data["params"])
 
-    temp_component.component_id = (
-        f"{temp_component.component_id}_{str(binascii.hexlify(os.urandom(4)))[2:-1]}"
-        if "component_id" not in component_data
-        else component_data["component_id"]
-    )
+    if "component_id" in component_data:
+        temp_component.component_id = component_data["component_id"]
 
     return temp_component
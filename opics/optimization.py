@@ -1,6 +1,524 @@
+""" Optimizers of circuit parameters
+
+The optimizers share an ask/tell interface: `ask` proposes the positions to\
+    evaluate next, and `tell` reports their fitness (the loss to minimize).\
+    `optimize` runs the loop and evaluates the positions with an executor,\
+    e.g., a `concurrent.futures.ProcessPoolExecutor` to run the circuit\
+    simulations in parallel. Asynchronous optimizers are told each fitness as\
+    soon as its evaluation finishes, and keep all the workers busy. An\
+    `EvaluationCache` skips the evaluation of positions already evaluated.\
+    `LBFGSB` is a gradient-based optimizer, see `Network.parameter_gradients`.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
 import numpy as np
 
 
+class LocalExecutor(Executor):
+    """
+    Runs the submitted jobs immediately, in the calling thread. This is the\
+        default executor of the optimizers.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class EvaluationCache:
+    """
+    Fitness of evaluated positions, e.g., of circuit simulations, keyed by\
+        the positions quantized to a resolution. Positions that are revisited,\
+        e.g., after being clipped to the bounds, are not evaluated again.
+
+    The most recently used values are held in memory, and optionally in a\
+        SQLite database file that persists them across optimizations. Use a\
+        database per fitness function.
+
+    Args:
+        resolution (float): Positions that round to the same multiple of the\
+            resolution share their fitness. An array sets the resolution of\
+            each dimension.
+        max_entries (int): Number of values held in memory. The least\
+            recently used values are evicted when it is exceeded.
+        path (str, optional): Path of the SQLite database file.
+    """
+
+    def __init__(self, resolution=1e-9, max_entries=2**16, path=None):
+        self.resolution = np.asarray(resolution, dtype=float)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS fitness "
+                    "(key BLOB PRIMARY KEY, value REAL)"
+                )
+
+    def __len__(self):
+        return len(self._data)
+
+    def keys(self, positions):
+        """Keys of the quantized (n, dimensions) positions."""
+        # the multiples are kept as floats, which do not overflow at large
+        # magnitudes, e.g., frequencies in Hz, and -0.0 is keyed as 0.0
+        quantized = np.round(np.asarray(positions, dtype=float) / self.resolution)
+        quantized = np.ascontiguousarray(quantized + 0.0, dtype=np.float64)
+        # keys of different resolutions can share a database
+        prefix = self.resolution.tobytes()
+        return [prefix + each.tobytes() for each in quantized]
+
+    def lookup(self, positions):
+        """
+        Cached fitness of positions.
+
+        Args:
+            positions (numpy.ndarray): The (n, dimensions) positions.
+
+        Returns:
+            tuple: The fitness of each position, and whether it was found.
+        """
+        keys = self.keys(positions)
+        fitness = np.empty(len(keys))
+        found = np.zeros(len(keys), dtype=bool)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    fitness[i], found[i] = self._data[key], True
+                elif self._db is not None:
+                    row = self._db.execute(
+                        "SELECT value FROM fitness WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        self._put(key, row[0])
+                        fitness[i], found[i] = row[0], True
+            self.hits += int(found.sum())
+            self.misses += int(found.size - found.sum())
+        return fitness, found
+
+    def _put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def store(self, positions, fitness):
+        """
+        Caches the fitness of positions.
+
+        Args:
+            positions (numpy.ndarray): The (n, dimensions) positions.
+            fitness (numpy.ndarray): Fitness of each position.
+        """
+        rows = list(zip(self.keys(positions), np.asarray(fitness, dtype=float)))
+        with self._lock:
+            for key, value in rows:
+                self._put(key, float(value))
+            if self._db is not None:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO fitness VALUES (?, ?)",
+                        [(key, float(value)) for key, value in rows],
+                    )
+
+    def clear(self):
+        """Removes the values held in memory."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """Closes the database."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class HistoryLog:
+    """
+    A log of entries of the same shape, e.g., the particle positions at\
+        every iteration, held in a contiguous, preallocated array instead of\
+        a list of small arrays.
+
+    The array doubles in size when it is full, or, with a `depth`, holds\
+        the most recent entries in a ring buffer of a fixed size. Entries can\
+        also be streamed to a file, which `HistoryLog.load` memory-maps, e.g.,\
+        for post-hoc animations of long optimizations. The file stays open,\
+        and its writes are buffered until `flush` or `close`. The optimizers\
+        flush their logs at the end of `optimize`, and close them in `close`.
+
+    Args:
+        shape (tuple): Shape of an entry.
+        dtype (numpy.dtype): Data type of the entries.
+        depth (int, optional): Number of most recent entries held in memory.\
+            Defaults to all the entries.
+        path (str, optional): File that every entry is appended to. Its\
+            shape and data type are written next to it, in `<path>.json`.
+    """
+
+    def __init__(self, shape=(), dtype=float, depth=None, path=None):
+        if depth is not None and depth < 1:
+            raise ValueError("The log depth must be at least 1.")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.depth = depth
+        self.count = 0
+        self._data = np.empty((depth or 16,) + self.shape, dtype=self.dtype)
+
+        self.path = None if path is None else Path(path)
+        self._file = None
+        if self.path is not None:
+            with open(self._meta_path(self.path), "w") as fid:
+                json.dump({"shape": list(self.shape), "dtype": self.dtype.str}, fid)
+            self._file = open(self.path, "wb")
+
+    @staticmethod
+    def _meta_path(path):
+        return path.with_name(path.name + ".json")
+
+    def append(self, value):
+        """Appends an entry to the log."""
+        value = np.asarray(value, dtype=self.dtype)
+        if value.shape != self.shape:
+            raise ValueError(
+                f"Expected an entry of shape {self.shape}, got {value.shape}."
+            )
+
+        if self._file is not None:
+            # raises a ValueError once the log is closed
+            self._file.write(value.tobytes())
+
+        if self.depth is None and self.count == len(self._data):
+            self._data = np.concatenate((self._data, np.empty_like(self._data)))
+        self._data[self.count % len(self._data)] = value
+        self.count += 1
+
+    def flush(self):
+        """Writes the buffered entries to the file."""
+        if self._file is not None and not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        """Writes the buffered entries and closes the file."""
+        if self._file is not None:
+            self._file.close()
+
+    def __del__(self):
+        # the file is not opened if the arguments were rejected
+        if getattr(self, "_file", None) is not None:
+            self.close()
+
+    def __len__(self):
+        return min(self.count, len(self._data))
+
+    @property
+    def array(self):
+        """The entries held in memory, oldest first."""
+        if self.count <= len(self._data):
+            return self._data[: self.count]
+        start = self.count % len(self._data)
+        return np.concatenate((self._data[start:], self._data[:start]))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.array, dtype=dtype)
+
+    def __getitem__(self, index):
+        return self.array[index]
+
+    def __iter__(self):
+        return iter(self.array)
+
+    def __repr__(self):
+        return f"HistoryLog({self.array!r})"
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-maps the entries streamed to a file.
+
+        Args:
+            path (str): The `path` of the log.
+
+        Returns:
+            numpy.ndarray: The read-only (entries, *shape) entries.
+        """
+        path = Path(path)
+        with open(cls._meta_path(path), "r") as fid:
+            meta = json.load(fid)
+        shape, dtype = tuple(meta["shape"]), np.dtype(meta["dtype"])
+        count = os.path.getsize(path) // (dtype.itemsize * int(np.prod(shape)))
+        if not count:
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count,) + shape)
+
+
+class Optimizer(ABC):
+    """
+    Base class of the ask/tell optimizers.
+
+    Subclasses implement `ask` and `tell`, and track the best fitness\
+        `gbest` found at the position `gbestpos`.
+
+    Args:
+        pos_bounds (tuple): Min and Max values for each dimension.
+        tolerance (float): Fitness at which the optimization stops.
+        seed (int, optional): Seed of the random number generator.
+        log_depth (int, optional): Number of most recent entries held in\
+            memory by each log, defaults to all the entries.
+        log_path (str, optional): Folder that each log is streamed to, in\
+            a `<log name>.dat` file, see `HistoryLog.load`. The files stay\
+            open until `close`, or the end of a `with` block of the optimizer.
+    """
+
+    # whether the optimizer is told each fitness as soon as it is evaluated
+    asynchronous = False
+
+    def __init__(
+        self, pos_bounds, tolerance=1e-5, seed=None, log_depth=None, log_path=None
+    ):
+        self.rng = np.random.default_rng(seed)
+        self.pos_bounds = pos_bounds
+        self.pos_min, self.pos_max = np.array(pos_bounds, dtype=float).T
+        self.dim_shape = self.pos_min.size
+        self.tolerance = tolerance
+
+        self.gbest = np.inf
+        self.gbestpos = np.zeros(self.dim_shape)
+        self.log_depth = log_depth
+        self.log_path = log_path
+        if log_path is not None:
+            Path(log_path).mkdir(parents=True, exist_ok=True)
+        self.log_fitness = self._new_log("log_fitness")
+        self.log_best_particles = self._new_log("log_best_particles", (self.dim_shape,))
+
+    def _new_log(self, name, shape=()):
+        path = None
+        if self.log_path is not None:
+            path = Path(self.log_path) / f"{name}.dat"
+        return HistoryLog(shape, depth=self.log_depth, path=path)
+
+    def _logs(self):
+        return [each for each in vars(self).values() if isinstance(each, HistoryLog)]
+
+    def _flush_logs(self):
+        for each in self._logs():
+            each.flush()
+
+    def close(self):
+        """
+        Closes the files the logs are streamed to. The logs held in memory\
+            stay readable, but no entry can be appended anymore.
+        """
+        for each in self._logs():
+            each.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @abstractmethod
+    def ask(self, n=None):
+        """
+        Positions to evaluate next.
+
+        Args:
+            n (int, optional): Number of positions, defaults to a generation.
+
+        Returns:
+            numpy.ndarray: The (n, dimensions) positions.
+        """
+
+    @abstractmethod
+    def tell(self, positions, fitness):
+        """
+        Reports the fitness of positions returned by `ask`.
+
+        Args:
+            positions (numpy.ndarray): The (n, dimensions) positions.
+            fitness (numpy.ndarray): Fitness value or loss (to be minimized)\
+                of each position.
+        """
+
+    def _update_best(self, positions, fitness):
+        best = np.argmin(fitness)
+        if fitness[best] < self.gbest:
+            self.gbest = fitness[best]
+            self.gbestpos = np.array(positions[best], dtype=float)
+
+    def _candidates(self, positions, index):
+        """What the fitness function receives for the positions at `index`."""
+        return positions[index]
+
+    def evaluate(self, function, positions, batch=False, executor=None, cache=None):
+        """
+        Fitness of positions.
+
+        Args:
+            function (function): Function to be optimized/ minimized, see\
+                `optimize` for what it receives.
+            positions (numpy.ndarray): The (n, dimensions) positions.
+            batch (bool): Whether the function evaluates all the positions\
+                at once. It then receives the (n, dimensions) positions and\
+                returns the fitness of each position.
+            executor (concurrent.futures.Executor, optional): Executor of the\
+                evaluations. Defaults to evaluating them in this thread.
+            cache (opics.optimization.EvaluationCache, optional): Cache of\
+                the fitness of evaluated positions. Only the positions that\
+                are not cached are evaluated.
+        """
+        executor = executor or LocalExecutor()
+        if cache is None:
+            fitness = np.empty(len(positions))
+            index = np.arange(len(positions))
+        else:
+            fitness, found = cache.lookup(positions)
+            index = np.flatnonzero(~found)
+            if not index.size:
+                return fitness
+
+        if batch:
+            values = executor.submit(function, positions[index].copy()).result()
+            values = np.asarray(values, dtype=float)
+            if values.shape != index.shape:
+                raise ValueError(
+                    f"Expected {index.size} fitness values, got {values.shape}."
+                )
+        else:
+            futures = [
+                executor.submit(function, each)
+                for each in self._candidates(positions, index)
+            ]
+            values = np.array([each.result() for each in futures], dtype=float)
+
+        fitness[index] = values
+        if cache is not None:
+            cache.store(positions[index], values)
+        return fitness
+
+    def optimize(
+        self,
+        function,
+        print_step,
+        iterations,
+        batch=False,
+        executor=None,
+        cache=None,
+    ):
+        """
+        Starts optimization.
+
+        Args:
+            function (function): Function to be optimized/ minimized. It\
+                receives the (dimensions,) position array of a candidate,\
+                except with `Swarm`, which passes the `SwarmParticle`, whose\
+                `pos` is the position. `AsyncPSO` passes position arrays.
+            print_step (int): Steps to print optimization progress after.
+            iterations (int): Number of optimization iterations.
+            batch (bool): Whether the function evaluates a whole generation\
+                at once, e.g., in a batched circuit simulation. It then\
+                receives the (n, dimensions) positions and returns the\
+                fitness of each position.
+            executor (concurrent.futures.Executor, optional): Executor of the\
+                evaluations, e.g., a process pool. Defaults to evaluating\
+                them in this thread.
+            cache (opics.optimization.EvaluationCache, optional): Cache of\
+                the fitness of evaluated positions, which are not simulated\
+                again when they are revisited.
+
+        Returns:
+            numpy.ndarray: The best position.
+        """
+        if self.asynchronous:
+            if batch:
+                raise ValueError(
+                    "Asynchronous optimizers evaluate one position at a time."
+                )
+            self._optimize_async(function, print_step, iterations, executor, cache)
+        else:
+            for i in range(iterations):
+                positions = self.ask()
+                fitness = self.evaluate(function, positions, batch, executor, cache)
+                self.tell(positions, fitness)
+
+                if i % print_step == 0:
+                    print(
+                        f"Iteration: {i}, Loss/gbest: {self.gbest}, "
+                        f"Fitness: {fitness.min()}"
+                    )
+
+                if self.gbest <= self.tolerance:
+                    break
+
+        self._flush_logs()
+        print("global best fitness: ", self.gbest)
+        return self.gbestpos
+
+    def _optimize_async(self, function, print_step, iterations, executor, cache):
+        """
+        Keeps `workers` evaluations running, and tells each fitness as soon\
+            as it is evaluated.
+        """
+        executor = executor or LocalExecutor()
+        budget = iterations * self.workers
+        pending = {}
+        submitted = 0
+        evaluated = 0
+
+        def _submit():
+            nonlocal submitted
+            while submitted < budget and self.gbest > self.tolerance:
+                position = self.ask(1)
+                submitted += 1
+                if cache is not None:
+                    fitness, found = cache.lookup(position)
+                    if found[0]:
+                        self.tell(position, fitness)
+                        continue
+                future = executor.submit(function, position[0])
+                pending[future] = position
+                return
+
+        for _ in range(min(self.workers, budget)):
+            _submit()
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                position = pending.pop(future)
+                fitness = np.array([future.result()], dtype=float)
+                if cache is not None:
+                    cache.store(position, fitness)
+                self.tell(position, fitness)
+
+                if evaluated % print_step == 0:
+                    print(
+                        f"Evaluation: {evaluated}, Loss/gbest: {self.gbest}, "
+                        f"Fitness: {fitness[0]}"
+                    )
+                evaluated += 1
+                _submit()
+
+
 class Particle:
     """
     Represents a Particle inside a Swarm.
@@ -18,19 +536,75 @@ class Particle:
         self.pbestpos = np.zeros(dim_shape)
 
 
-class Swarm:
+def _row_property(name):
+    """A property that reads and writes a row of a swarm state array."""
+
+    def fget(self):
+        return getattr(self.swarm, name)[self.index]
+
+    def fset(self, value):
+        getattr(self.swarm, name)[self.index] = value
+
+    return property(fget, fset)
+
+
+def _standalone_particle(pos, vel, pbest, pbestpos):
+    particle = Particle.__new__(Particle)
+    particle.pos, particle.vel = pos, vel
+    particle.pbest, particle.pbestpos = pbest, pbestpos
+    return particle
+
+
+class SwarmParticle(Particle):
+    """
+    A particle of a Swarm, whose state is a row of the swarm arrays.\
+        Particles sent to worker processes are standalone copies.
+
+    Args:
+        swarm (opics.optimization.Swarm): The swarm.
+        index (int): Index of the particle in the swarm.
+    """
+
+    pos = _row_property("pos")
+    vel = _row_property("vel")
+    pbest = _row_property("pbest")
+    pbestpos = _row_property("pbestpos")
+
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+
+    def __reduce__(self):
+        return (
+            _standalone_particle,
+            (self.pos.copy(), self.vel.copy(), self.pbest, self.pbestpos.copy()),
+        )
+
+
+class Swarm(Optimizer):
     """
     Creates a pool/swarm of particles.
 
+    The state of the swarm is held in (particles, dimensions) arrays, `pos`,\
+        `vel`, and `pbestpos`, and the best fitness of each particle in\
+        `pbest`. They are updated for all the particles at once. The\
+        fitness function receives a `SwarmParticle`, a view of a row of the\
+        arrays, unless the whole swarm is evaluated at once with `batch`.
+
     Args:
         num_particles (int): Number of particles.
-        dim_shape (tuple): Number of dimensions to optimize.
+        dim_shape (int): Number of dimensions to optimize.
         pos_bounds (tuple): Min and Max values for position.
         vel_bounds (tuple): Min and Max values for  velocity.
         inertia_weight_bounds (tuple): Min and Max values for interia weight.
         c (tuple):  c[0] -> cognitive parameter, c[1] -> social parameter.
         log_results (tuple): A tuple of boolean values to log best fitness\
             and particle positions, e.g., (True, True).
+        seed (int, optional): Seed of the random number generator.
+        log_depth (int, optional): Number of most recent iterations held in\
+            memory by each log, defaults to all the iterations.
+        log_path (str, optional): Folder that each log is streamed to, see\
+            `Optimizer`.
     """
 
     def __init__(
@@ -43,6 +617,9 @@ class Swarm:
         c=(1.4944, 1.4944),
         log_results=(True, True),
         tolerance=1e-5,
+        seed=None,
+        log_depth=None,
+        log_path=None,
     ):
 
         if vel_bounds is None:
@@ -52,31 +629,34 @@ class Swarm:
         else:
             self.vel_bounds = vel_bounds
 
-        if len(pos_bounds) != dim_shape or type(pos_bounds[-1]) not in (tuple, list):
+        if len(pos_bounds) != dim_shape or type(pos_bounds[-1]) not in (
+            tuple,
+            list,
+            np.ndarray,
+        ):
             raise ValueError("Min and Max values are not provided for each dimension.")
 
-        self.pool = np.array(
-            [
-                Particle(dim_shape, pos_bounds, self.vel_bounds)
-                for _ in range(num_particles)
-            ]
-        )
-        self.gbest = np.inf
-        self.gbestpos = np.zeros(dim_shape)
-        self.pos_bounds = pos_bounds
+        super().__init__(pos_bounds, tolerance, seed, log_depth, log_path)
+
+        shape = (num_particles, dim_shape)
+        self.num_particles = num_particles
+        self.pos = self.rng.uniform(self.pos_min, self.pos_max, shape)
+        self.vel = self.rng.uniform(self.vel_bounds[0], self.vel_bounds[1], shape)
+        self.pbest = np.full(num_particles, np.inf)
+        self.pbestpos = np.zeros(shape)
+        self.pool = np.empty(num_particles, dtype=object)
+        self.pool[:] = [SwarmParticle(self, i) for i in range(num_particles)]
+
         self.c0 = c[0]
         self.c1 = c[1]
         self.inertia_weight_bounds = inertia_weight_bounds
-        self.dim_shape = dim_shape
-        self.update_particle_pos = None
-        self.update_particle_vel = None
 
         self.log_flag_fitness = log_results[0]
         self.log_flag_particles = log_results[1]
-        self.log_fitness = []
-        self.log_all_particles = []
-        self.log_best_particles = []
-        self.tolerance = tolerance
+        # positions and velocities, log_all_particles[i][particle] is (pos, vel)
+        self.log_all_particles = self._new_log(
+            "log_all_particles", (num_particles, 2, dim_shape)
+        )
 
     def update_particle_position(self, p, fitness):
         """
@@ -105,69 +685,316 @@ class Swarm:
         Returns:
             Particle (opics.optimization.Particle)
         """
-        iw = np.random.uniform(
-            self.inertia_weight_bounds[0], self.inertia_weight_bounds[1], self.dim_shape
-        )
+        iw, r0, r1 = self._coefficients((self.dim_shape,))
         p.vel = (
             iw * p.vel
-            + (
-                self.c0
-                * np.random.uniform(0.0, 1.0, self.dim_shape)
-                * (p.pbestpos - p.pos)
-            )
-            + (
-                self.c1
-                * np.random.uniform(0.0, 1.0, self.dim_shape)
-                * (self.gbestpos - p.pos)
-            )
+            + self.c0 * r0 * (p.pbestpos - p.pos)
+            + self.c1 * r1 * (self.gbestpos - p.pos)
+        ).clip(min=self.vel_bounds[0], max=self.vel_bounds[1])
+        p.pos = (p.pos + p.vel).clip(min=self.pos_min, max=self.pos_max)
+
+        return p
+
+    def _coefficients(self, shape):
+        """Random inertia weights, and cognitive and social factors."""
+        iw = self.rng.uniform(*self.inertia_weight_bounds, shape)
+        r0, r1 = self.rng.uniform(0.0, 1.0, (2,) + shape)
+        return iw, r0, r1
+
+    def update_positions(self, fitness, index=slice(None)):
+        """
+        Updates the best positions of the particles and of the swarm.
+
+        Args:
+            fitness (numpy.ndarray): Fitness value or loss (to be minimized)\
+                of each particle.
+            index (optional): Indices of the evaluated particles, defaults to\
+                all the particles.
+        """
+        index = np.arange(self.num_particles)[index]
+        improved = fitness < self.pbest[index]
+        self.pbest[index[improved]] = fitness[improved]
+        self.pbestpos[index[improved]] = self.pos[index[improved]]
+        self._update_best(self.pos[index], fitness)
+
+    def update_velocities(self, index=slice(None)):
+        """
+        Updates the velocities and the positions of the particles.
+
+        Args:
+            index (optional): Indices of the particles to move, defaults to\
+                all the particles.
+        """
+        pos = self.pos[index]
+        iw, r0, r1 = self._coefficients(pos.shape)
+        vel = (
+            iw * self.vel[index]
+            + self.c0 * r0 * (self.pbestpos[index] - pos)
+            + self.c1 * r1 * (self.gbestpos - pos)
+        )
+        self.vel[index] = np.clip(vel, self.vel_bounds[0], self.vel_bounds[1])
+        self.pos[index] = np.clip(pos + self.vel[index], self.pos_min, self.pos_max)
+
+    def _candidates(self, positions, index):
+        return self.pool[index]
+
+    def ask(self, n=None):
+        if n is not None and n != self.num_particles:
+            raise ValueError(f"A swarm evaluates its {self.num_particles} particles.")
+        return self.pos.copy()
+
+    def tell(self, positions, fitness):
+        self.pos[:] = positions
+        self.update_positions(np.asarray(fitness, dtype=float))
+
+        if self.log_flag_fitness:
+            self.log_fitness.append(self.gbest)
+        if self.log_flag_particles:
+            self.log_all_particles.append(np.stack([self.pos, self.vel], axis=1))
+            self.log_best_particles.append(self.gbestpos)
+
+        self.update_velocities()
+
+
+class AsyncPSO(Swarm):
+    """
+    Asynchronous particle swarm. Each particle moves as soon as its fitness\
+        is evaluated, using the best position found so far, instead of\
+        waiting for the whole swarm. Up to one evaluation per particle runs\
+        at a time, so slow evaluations do not leave workers idle.
+
+    `log_fitness` and `log_best_particles` are logged after each evaluation.\
+        Unlike `Swarm`, the fitness function receives the position array of\
+        the particle.
+
+    Args:
+        num_particles (int): Number of particles.
+        dim_shape (int): Number of dimensions to optimize.
+        pos_bounds (tuple): Min and Max values for position.
+        kwargs: Other Swarm parameters.
+    """
+
+    asynchronous = True
+
+    def __init__(self, num_particles=20, dim_shape=None, pos_bounds=None, **kwargs):
+        super().__init__(num_particles, dim_shape, pos_bounds, **kwargs)
+        self.workers = num_particles
+        self._idle = deque(range(num_particles))
+        self._pending = {}
+
+    def ask(self, n=1):
+        if n > len(self._idle):
+            raise RuntimeError("All the particles are being evaluated.")
+        index = [self._idle.popleft() for _ in range(n)]
+        positions = self.pos[index]
+        for i, each in zip(index, positions):
+            self._pending.setdefault(each.tobytes(), deque()).append(i)
+        return positions
+
+    def tell(self, positions, fitness):
+        fitness = np.asarray(fitness, dtype=float)
+        index = np.array(
+            [self._pending[each.tobytes()].popleft() for each in positions]
+        )
+        for each in positions:
+            if not self._pending[each.tobytes()]:
+                del self._pending[each.tobytes()]
+
+        self.update_positions(fitness, index)
+        if self.log_flag_fitness:
+            self.log_fitness.append(self.gbest)
+        if self.log_flag_particles:
+            self.log_best_particles.append(self.gbestpos)
+
+        self.update_velocities(index)
+        self._idle.extend(index)
+
+
+class DifferentialEvolution(Optimizer):
+    """
+    Differential evolution (DE/rand/1/bin). Each generation is a batch of\
+        trial positions, one per member of the population, that can be\
+        evaluated in parallel or in a single batched simulation.
+
+    Args:
+        population_size (int): Number of members of the population.
+        dim_shape (int): Number of dimensions to optimize.
+        pos_bounds (tuple): Min and Max values for each dimension.
+        mutation (float): Differential weight.
+        crossover (float): Crossover probability.
+        tolerance (float): Fitness at which the optimization stops.
+        seed (int, optional): Seed of the random number generator.
+        log_depth (int, optional): Number of most recent generations held in\
+            memory by each log, defaults to all the generations.
+        log_path (str, optional): Folder that each log is streamed to, see\
+            `Optimizer`.
+    """
+
+    def __init__(
+        self,
+        population_size=20,
+        dim_shape=None,
+        pos_bounds=None,
+        mutation=0.8,
+        crossover=0.9,
+        tolerance=1e-5,
+        seed=None,
+        log_depth=None,
+        log_path=None,
+    ):
+        if population_size < 4:
+            raise ValueError("Differential evolution needs at least 4 members.")
+        if len(pos_bounds) != dim_shape:
+            raise ValueError("Min and Max values are not provided for each dimension.")
+        super().__init__(pos_bounds, tolerance, seed, log_depth, log_path)
+
+        self.population_size = population_size
+        self.mutation = mutation
+        self.crossover = crossover
+        self.population = self.rng.uniform(
+            self.pos_min, self.pos_max, (population_size, dim_shape)
         )
+        # the initial population is evaluated first
+        self.fitness = None
 
-        p.vel = p.vel.clip(min=self.vel_bounds[0], max=self.vel_bounds[1])
-        p.pos = p.pos + p.vel
-        for _ in range(self.dim_shape):
-            p.pos[_] = p.pos[_].clip(
-                min=self.pos_bounds[_][0], max=self.pos_bounds[_][1]
+    def ask(self, n=None):
+        if n is not None and n != self.population_size:
+            raise ValueError(
+                f"A generation has {self.population_size} trial positions."
             )
+        if self.fitness is None:
+            return self.population.copy()
 
-        return p
+        # three distinct members, other than the target, for each target
+        size = self.population_size
+        keys = self.rng.random((size, size))
+        keys[np.arange(size), np.arange(size)] = np.inf
+        r0, r1, r2 = np.argsort(keys, axis=1)[:, :3].T
+
+        mutants = self.population[r0] + self.mutation * (
+            self.population[r1] - self.population[r2]
+        )
+        crossed = self.rng.random(self.population.shape) < self.crossover
+        crossed[np.arange(size), self.rng.integers(self.dim_shape, size=size)] = True
+        trials = np.where(crossed, mutants, self.population)
+        return np.clip(trials, self.pos_min, self.pos_max)
+
+    def tell(self, positions, fitness):
+        fitness = np.asarray(fitness, dtype=float)
+        if self.fitness is None:
+            self.population = np.array(positions, dtype=float)
+            self.fitness = fitness.copy()
+        else:
+            improved = fitness <= self.fitness
+            self.population[improved] = positions[improved]
+            self.fitness[improved] = fitness[improved]
+
+        self._update_best(positions, fitness)
+        self.log_fitness.append(self.gbest)
+        self.log_best_particles.append(self.gbestpos)
+
+
+class _Converged(Exception):
+    """Stops a gradient-based optimization at the tolerance."""
+
+
+class LBFGSB(Optimizer):
+    """
+    Gradient-based optimizer, scipy's bounded quasi-Newton L-BFGS-B. The\
+        fitness function returns the fitness and its gradient, e.g., from\
+        `Network.parameter_gradients`, which costs about one more simulation\
+        in a reverse pass instead of a simulation per parameter.
+
+    It runs its own optimization loop, in `optimize`, and does not `ask`.
+
+    Args:
+        pos_bounds (tuple): Min and Max values for each dimension.
+        x0 (numpy.ndarray, optional): Initial position, defaults to a random\
+            position within the bounds.
+        tolerance (float): Fitness at which the optimization stops.
+        seed (int, optional): Seed of the random number generator.
+        log_depth (int, optional): Number of most recent evaluations held in\
+            memory by each log, defaults to all the evaluations.
+        log_path (str, optional): Folder that each log is streamed to, see\
+            `Optimizer`.
+    """
+
+    def __init__(
+        self,
+        pos_bounds,
+        x0=None,
+        tolerance=1e-5,
+        seed=None,
+        log_depth=None,
+        log_path=None,
+    ):
+        super().__init__(pos_bounds, tolerance, seed, log_depth, log_path)
+        if x0 is None:
+            x0 = self.rng.uniform(self.pos_min, self.pos_max)
+        self.pos = np.array(x0, dtype=float)
+        self.evaluations = 0
+
+    def ask(self, n=None):
+        raise NotImplementedError(
+            "LBFGSB runs its own optimization loop, use `optimize` instead."
+        )
+
+    def tell(self, positions, fitness):
+        fitness = np.asarray(fitness, dtype=float)
+        self._update_best(positions, fitness)
+        self.log_fitness.append(self.gbest)
+        self.log_best_particles.append(self.gbestpos)
+        self.evaluations += len(fitness)
 
     def optimize(self, function, print_step, iterations):
         """
         Starts optimization.
 
         Args:
-            function (function): Function to be optimized/ minimized.
+            function (function): Function to be optimized/ minimized. It\
+                receives a position and returns its fitness and the gradient\
+                of the fitness with respect to the position.
             print_step (int): Steps to print optimization progress after.
-            iterations (int): Number of optimization iterations.
+            iterations (int): Maximum number of optimization iterations.
+
+        Returns:
+            numpy.ndarray: The best position.
         """
-        function = np.vectorize(function)
-        self.update_particle_pos = np.vectorize(self.update_particle_position)
-        self.update_particle_vel = np.vectorize(self.update_particle_velocity)
-
-        for i in range(iterations):
-            fitness = function(self.pool)
-            self.pool = self.update_particle_pos(self.pool, fitness)
-            min_fitness = fitness[np.argmin(fitness)]
-            if min_fitness < self.gbest:
-                self.gbest = min_fitness
-                self.gbestpos = self.pool[np.argmin(fitness)].pos
-
-            if self.log_flag_fitness:
-                self.log_fitness.append(self.gbest)
-            if self.log_flag_particles:
-                self.log_all_particles.append(
-                    [[each.pos, each.vel] for each in self.pool]
-                )
-                self.log_best_particles.append(self.gbestpos)
+        from scipy.optimize import minimize
 
-            self.pool = self.update_particle_vel(self.pool)
+        def fitness_and_gradient(pos):
+            fitness, gradient = function(pos.copy())
+            self.tell(pos[None], [fitness])
+            if self.gbest <= self.tolerance:
+                raise _Converged
+            return fitness, np.asarray(gradient, dtype=float)
 
-            if i % print_step == 0:
+        iteration = 0
+
+        def callback(pos):
+            nonlocal iteration
+            self.pos = np.array(pos)
+            if iteration % print_step == 0:
                 print(
-                    f"Iteration: {i}, Loss/gbest: {self.gbest}, Fitness: {min_fitness}"
+                    f"Iteration: {iteration}, Loss/gbest: {self.gbest}, "
+                    f"Evaluations: {self.evaluations}"
                 )
+            iteration += 1
 
-            if self.gbest <= self.tolerance:
-                break
+        try:
+            result = minimize(
+                fitness_and_gradient,
+                self.pos,
+                jac=True,
+                method="L-BFGS-B",
+                bounds=list(zip(self.pos_min, self.pos_max)),
+                callback=callback,
+                options={"maxiter": iterations},
+            )
+            self.pos = result.x
+        except _Converged:
+            self.pos = self.gbestpos.copy()
 
+        self._flush_logs()
         print("global best fitness: ", self.gbest)
+        return self.gbestpos
@@ -0,0 +1,178 @@
+"""Parametric component models interpolated across look-up-table parameters"""
+
+import itertools
+from pathlib import PosixPath
+from typing import Dict, Optional
+import numpy as np
+from numpy import ndarray
+from opics.components import componentModel
+from opics.globals import F
+from opics.utils import LUT_index, LUT_processor
+
+
+class ParametricModel:
+    """
+    A component model that is continuous in its look-up-table parameters.
+
+    Every entry of the look-up-table is loaded once, interpolated onto the\
+        frequency range, and stored in a dense tensor of shape\
+        (grid_1, ..., grid_k, f, n, n) over the parameters that vary across\
+        the entries. S-parameters at arbitrary parameter values are then\
+        interpolated across the parameter grid, for whole batches of\
+        parameter values at once and without any file I/O.
+
+    Args:
+        data_folder: The location of the data folder containing\
+            s-parameter data files and the XML look-up-table.
+        filename: Name of the XML look-up-table file.
+        nports: Number of ports in the component.
+        f: Frequency datapoints. Defaults to `opics.globals.F`.
+        sparam_attr: Look-up-table attribute of the s-parameter data files.
+        fixed: Values of the parameters that are not interpolated, e.g.,\
+            non-numeric parameters. Only the look-up-table entries with these\
+            values are loaded.
+        method: Interpolation across the parameters, "linear" (multilinear)\
+            or "spline" (cubic splines along each parameter, lower order\
+            along parameters with less than four values).
+    """
+
+    def __init__(
+        self,
+        data_folder: PosixPath,
+        filename: str,
+        nports: int,
+        f: Optional[ndarray] = None,
+        sparam_attr: str = None,
+        fixed: Optional[Dict] = None,
+        method: str = "linear",
+    ) -> None:
+
+        if method not in ("linear", "spline"):
+            raise ValueError(f"Unknown interpolation method {method!r}.")
+
+        self.f = F if f is None else f
+        self.nports = nports
+        self.method = method
+        fixed = {key: str(value) for key, value in (fixed or {}).items()}
+
+        _, index, _ = LUT_index(data_folder, filename)
+        entries = [
+            dict(each)
+            for each in index.keys()
+            if all(dict(each).get(key) == value for key, value in fixed.items())
+        ]
+        if not entries:
+            raise ValueError("No look-up-table entry matches the fixed parameters.")
+
+        # parameters that vary across the entries form the interpolation grid
+        names = sorted(set(itertools.chain(*entries)))
+        self.params = [
+            name for name in names if len(set(each.get(name) for each in entries)) > 1
+        ]
+        self.fixed = {name: entries[0].get(name) for name in names}
+        for name in self.params:
+            self.fixed.pop(name)
+
+        try:
+            self.grid = [
+                np.unique([float(each[name]) for each in entries])
+                for name in self.params
+            ]
+        except (KeyError, ValueError):
+            raise ValueError(
+                "Look-up-table parameters must be numeric and set in every entry "
+                "to be interpolated, fix the other parameters with `fixed`."
+            )
+
+        shape = tuple(each.size for each in self.grid)
+        self.data = np.zeros(shape + (self.f.size, nports, nports), np.complex128)
+        loaded = np.zeros(shape, dtype=bool)
+
+        for entry in entries:
+            idx = tuple(
+                np.searchsorted(grid, float(entry[name]))
+                for grid, name in zip(self.grid, self.params)
+            )
+            (source_f, source_s), _ = LUT_processor(
+                data_folder, filename, list(entry.items()), nports, sparam_attr
+            )
+            if np.array_equal(source_f, self.f):
+                self.data[idx] = source_s
+            else:
+                from scipy.interpolate import interp1d
+
+                self.data[idx] = interp1d(source_f, source_s, kind="cubic", axis=0)(
+                    self.f
+                )
+            loaded[idx] = True
+
+        if not loaded.all():
+            raise ValueError(
+                f"The look-up-table entries do not form a complete grid over "
+                f"{self.params}, {np.count_nonzero(~loaded)} combinations are missing."
+            )
+
+    def _weights(self, grid: ndarray, values: ndarray) -> ndarray:
+        """
+        Interpolation weights of the grid points at each value, shape is\
+            (values, grid points).
+        """
+        if grid.size == 1:
+            return np.ones((values.size, 1))
+        if self.method == "linear" or grid.size == 2:
+            kind = "linear"
+        else:
+            kind = "cubic" if grid.size > 3 else "quadratic"
+
+        from scipy.interpolate import interp1d
+
+        # interpolating the identity gives the weight of each grid point
+        return interp1d(grid, np.eye(grid.size), kind=kind, axis=0)(values)
+
+    def evaluate(self, **params) -> ndarray:
+        """
+        Interpolates the s-parameters at the given parameter values.
+
+        Args:
+            params: Value of each interpolated parameter, as scalars or\
+                arrays that broadcast together.
+
+        Returns:
+            S-parameters, shape is (*batch, f, n, n), where batch is the\
+                broadcast shape of the parameter values.
+        """
+        missing = set(self.params) - set(params)
+        unknown = set(params) - set(self.params)
+        if missing or unknown:
+            raise ValueError(
+                f"Expected values for the parameters {self.params}, "
+                f"missing {sorted(missing)}, unknown {sorted(unknown)}."
+            )
+
+        values = np.broadcast_arrays(
+            *[np.asarray(params[_], float) for _ in self.params]
+        )
+        batch = values[0].shape if values else ()
+
+        result = None
+        for grid, value in zip(self.grid, values):
+            weights = self._weights(grid, value.ravel())
+            if result is None:
+                result = np.einsum("qi,i...->q...", weights, self.data)
+            else:
+                result = np.einsum("qi,qi...->q...", weights, result)
+
+        if result is None:
+            result = self.data[None]
+        return result.reshape(batch + result.shape[1:])
+
+    __call__ = evaluate
+
+    def component(self, **params) -> componentModel:
+        """
+        Creates a component with the s-parameters interpolated at the given\
+            (scalar) parameter values.
+        """
+        return componentModel(
+            f=self.f, s=self.evaluate(**params), nports=self.nports, **params
+        )
@@ -1,6 +1,6 @@
-""" Functions operating on s-parameter matrices
-"""
-from typing import Optional
+"""Functions operating on s-parameter matrices"""
+
+from typing import List, Optional, Tuple
 import numpy as np
 from numpy import ndarray
 
@@ -163,6 +163,103 @@ def innerconnect_s(A: ndarray, port_idx_A: int, port_idx_B: int) -> ndarray:
     return C
 
 
+def innerconnect_s_vjp(
+    A: ndarray, port_idx_A: int, port_idx_B: int, grad: ndarray
+) -> ndarray:
+    """
+    Vector-Jacobian product of :func:`innerconnect_s`: the gradient of a real\
+    loss with respect to the input s-matrix, given its gradient with respect\
+    to the resulting s-matrix.
+
+    Gradients of a real loss `L` with respect to a complex matrix `C` are\
+    `dL/dRe(C) + 1j * dL/dIm(C)`, e.g., `2 * C` for `L = sum(abs(C) ** 2)`.
+
+    Parameters
+    -----------
+    A : :class:`numpy.ndarray`
+        S-parameter matrix of `A`, shape is fxnxn
+    port_idx_A : int
+        port index on `A` (port indices start from 0)
+    port_idx_B : int
+        port index on `A`
+    grad : :class:`numpy.ndarray`
+        gradient with respect to the resulting s-matrix, shape is\
+        fx(n-2)x(n-2)
+
+    Returns
+    -------
+    grad_A : :class:`numpy.ndarray`
+        gradient with respect to `A`, shape is fxnxn
+
+    Notes
+    -----
+    With `I` the two connected ports and `E` the others, the resulting\
+    s-matrix is `A_EE + A_EI (P - A_II)^-1 A_IE`, where `P` swaps the\
+    connected ports.
+    """
+    if port_idx_A > A.shape[-1] - 1 or port_idx_B > A.shape[-1] - 1:
+        raise (ValueError("port indices are out of range"))
+
+    internal = [port_idx_A, port_idx_B]
+    external = [i for i in range(A.shape[-1]) if i not in internal]
+    nE = len(external)
+
+    A_EI = A[:, external][:, :, internal]
+    A_IE = A[:, internal][:, :, external]
+    M = np.array([[0, 1], [1, 0]]) - A[:, internal][:, :, internal]
+
+    # X = M^-1 A_IE, and Y = (A_EI M^-1)^H
+    X_H = np.linalg.solve(M, A_IE).conj().transpose(0, 2, 1)
+    Y = np.linalg.solve(M.conj().transpose(0, 2, 1), A_EI.conj().transpose(0, 2, 1))
+
+    # gradient blocks in the (external, internal) port order
+    grad_A = np.empty(A.shape, dtype=np.complex128)
+    grad_A[:, :nE, :nE] = grad
+    grad_A[:, :nE, nE:] = grad @ X_H
+    grad_A[:, nE:, :nE] = Y @ grad
+    grad_A[:, nE:, nE:] = Y @ grad @ X_H
+
+    order = np.argsort(external + internal)
+    return grad_A[:, order][:, :, order]
+
+
+def connect_s_vjp(
+    A: ndarray, port_idx_A: int, B: ndarray, port_idx_B: int, grad: ndarray
+) -> Tuple[ndarray, ndarray]:
+    """
+    Vector-Jacobian product of :func:`connect_s`: the gradients of a real\
+    loss with respect to the two input s-matrices, given its gradient with\
+    respect to the resulting s-matrix, see :func:`innerconnect_s_vjp`.
+
+    Parameters
+    -----------
+    A : :class:`numpy.ndarray`
+            S-parameter matrix of `A`, shape is fxnxn
+    port_idx_A : int
+            port index on `A` (port indices start from 0)
+    B : :class:`numpy.ndarray`
+            S-parameter matrix of `B`, shape is fxmxm
+    port_idx_B : int
+            port index on `B`
+    grad : :class:`numpy.ndarray`
+            gradient with respect to the resulting s-matrix, shape is\
+            fx(n+m-2)x(n+m-2)
+
+    Returns
+    -------
+    grad_A, grad_B : :class:`numpy.ndarray`
+        gradients with respect to `A` and `B`
+    """
+    nA = A.shape[-1]
+    nC = nA + B.shape[-1]
+    C = np.zeros((A.shape[0], nC, nC), dtype=np.complex128)
+    C[:, :nA, :nA] = A
+    C[:, nA:, nA:] = B
+
+    grad_C = innerconnect_s_vjp(C, port_idx_A, nA + port_idx_B, grad)
+    return grad_C[:, :nA, :nA], grad_C[:, nA:, nA:]
+
+
 def v_broadcast_sim(A: np.ndarray, port_idx_A: int, port_idx_B: int) -> np.ndarray:
 
     if port_idx_A > A.shape[-1] - 1 or port_idx_B > A.shape[-1] - 1:
@@ -234,3 +331,226 @@ def v_broadcast_sim(A: np.ndarray, port_idx_A: int, port_idx_B: int) -> np.ndarr
     # ignore all from C[:,:,port_idx_A], and C[:,:,port_idx_B]
 
     return C
+
+
+class SparseSystem:
+    """
+    Global sparse linear system of a network of interconnected s-matrices.
+
+    All the component s-matrices are placed on the diagonal of a single\
+        block-diagonal matrix `S` and the connections are described by a\
+        permutation matrix `P` that maps the outgoing wave of each connected\
+        port to the incoming wave of its partner. With `I` denoting the\
+        connected (internal) ports and `E` the remaining (external) ports,\
+        the incident waves on the internal ports are given by\
+        `(P - S_II) a_I = S_IE a_E`, and the network s-matrix is the Schur\
+        complement `S_EE + S_EI (P - S_II)^-1 S_IE`.
+
+    The sparsity structure of `P - S_II` is the same at every frequency, so\
+        it is assembled once, and the fill-reducing column ordering computed\
+        at the first frequency is reused for the LU factorizations at all\
+        the other frequencies.
+
+    Args:
+        blocks: S-parameter matrices of the components, each of shape fxnxn.
+        connections: Pairs of global port indices that are connected\
+            together. Global port indices number the ports of all the blocks\
+            consecutively, in the order of `blocks`.
+    """
+
+    def __init__(self, blocks: List[ndarray], connections: ndarray) -> None:
+        from scipy.sparse import csr_matrix
+
+        self.nf = blocks[0].shape[0]
+        sizes = np.array([each.shape[-1] for each in blocks])
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self.nports = int(sizes.sum())
+
+        connections = np.asarray(connections, dtype=int).reshape(-1, 2)
+        internal = connections.ravel()
+        if np.unique(internal).size != internal.size:
+            raise ValueError("A port can only be connected once.")
+        if internal.size and (internal.min() < 0 or internal.max() >= self.nports):
+            raise ValueError("port indices are out of range")
+
+        self.connections = connections
+        self.internal = internal
+        self.external = np.setdiff1d(np.arange(self.nports), internal)
+        nI, nE = self.internal.size, self.external.size
+        self.nI, self.nE = nI, nE
+
+        # position of each global port in the internal/external port lists
+        self._pos = np.full(self.nports, -1)
+        self._pos[self.internal] = np.arange(nI)
+        self._pos[self.external] = np.arange(nE)
+        is_internal = np.zeros(self.nports, dtype=bool)
+        is_internal[self.internal] = True
+
+        # row/column indices of every entry of the block-diagonal matrix
+        rows = np.concatenate(
+            [o + np.repeat(np.arange(n), n) for o, n in zip(offsets, sizes)]
+        )
+        cols = np.concatenate(
+            [o + np.tile(np.arange(n), n) for o, n in zip(offsets, sizes)]
+        )
+
+        def _select(row_internal, col_internal):
+            mask = (is_internal[rows] == row_internal) & (
+                is_internal[cols] == col_internal
+            )
+            return np.nonzero(mask)[0], self._pos[rows[mask]], self._pos[cols[mask]]
+
+        self._II = _select(True, True)
+        self._IE = _select(True, False)
+        self._EI = _select(False, True)
+        self._EE = _select(False, False)
+
+        # pattern of M = P - S_II: entries of S_II followed by the entries of P
+        p_rows = self._pos[np.concatenate((connections[:, 0], connections[:, 1]))]
+        p_cols = self._pos[np.concatenate((connections[:, 1], connections[:, 0]))]
+        m_rows = np.concatenate((self._II[1], p_rows))
+        m_cols = np.concatenate((self._II[2], p_cols))
+        self._p_values = np.ones(p_rows.size)
+
+        # merge duplicated entries and sort them in compressed sparse column order
+        keys, inverse = np.unique(m_cols * nI + m_rows, return_inverse=True)
+        self._m_indices = keys % nI
+        self._m_indptr = np.searchsorted(keys // nI, np.arange(nI + 1))
+        self._m_merge = csr_matrix(
+            (np.ones(inverse.size), (inverse.ravel(), np.arange(inverse.size))),
+            shape=(keys.size, inverse.size),
+        )
+        self._col_order = None
+
+        # values of the block-diagonal matrix, one row per frequency
+        self._data = np.concatenate(
+            [each.reshape(self.nf, -1) for each in blocks], axis=1
+        )
+
+    def _block_data(self, selection, idx: int) -> ndarray:
+        """S-matrix values of the selected block-diagonal entries at a frequency."""
+        return self._data[idx, selection[0]]
+
+    def system_matrix(self, idx: int):
+        """
+        Assembles `P - S_II` at the frequency index `idx`, in CSC format.
+        """
+        from scipy.sparse import csc_matrix
+
+        values = np.concatenate(
+            (-self._block_data(self._II, idx), self._p_values)
+        ).astype(np.complex128)
+        return csc_matrix(
+            (self._m_merge @ values, self._m_indices, self._m_indptr),
+            shape=(self.nI, self.nI),
+        )
+
+    def factorize(self, idx: int):
+        """
+        LU factorization of `P - S_II` at the frequency index `idx`.
+
+        Returns a function that solves the system for a right-hand side,\
+            either `(P - S_II) x = b` or, with `trans="T"`, the transposed system.
+        """
+        from scipy.sparse.linalg import splu
+
+        M = self.system_matrix(idx)
+
+        if self._col_order is None:
+            lu = splu(M, permc_spec="COLAMD")
+            # SuperLU factors M Pc, whose column perm_c[j] is the column j of
+            # M, so the columns of M are taken in the inverse order
+            self._col_order = np.argsort(lu.perm_c)
+            return lu.solve
+
+        # reuse the column ordering: factor M[:, order] without reordering
+        order = self._col_order
+        lu = splu(M[:, order], permc_spec="NATURAL")
+
+        def solve(b, trans="N"):
+            if trans == "N":
+                x = np.empty_like(b)
+                x[order] = lu.solve(b)
+                return x
+            return lu.solve(b[order], trans=trans)
+
+        return solve
+
+    def dense(self, selection, idx: int, shape) -> ndarray:
+        """Dense sub-matrix (S_IE, S_EI, S_EE) at the frequency index `idx`."""
+        out = np.zeros(shape, dtype=np.complex128)
+        out[selection[1], selection[2]] = self._block_data(selection, idx)
+        return out
+
+    def external_s(self) -> ndarray:
+        """
+        Solves the network s-matrix over all the frequencies.
+
+        Returns:
+            S-parameter matrix of the external ports, shape is fxnxn,\
+                ordered as `self.external`.
+        """
+        nI, nE = self.nI, self.nE
+        C = np.zeros((self.nf, nE, nE), dtype=np.complex128)
+        for idx in range(self.nf):
+            C[idx] = self.dense(self._EE, idx, (nE, nE))
+            if nI == 0:
+                continue
+            X = self.factorize(idx)(self.dense(self._IE, idx, (nI, nE)))
+            C[idx] += self.dense(self._EI, idx, (nE, nI)) @ X
+        return C
+
+    def _apply(self, selection, idx: int, x: ndarray, size: int) -> ndarray:
+        """Product of a sparse sub-matrix (S_IE, S_EI, S_EE) and a vector."""
+        out = np.zeros(size, dtype=np.complex128)
+        np.add.at(out, selection[1], self._block_data(selection, idx) * x[selection[2]])
+        return out
+
+    def solve_excitation(self, a_E: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Solves the network for the incident waves on the external ports only.
+
+        Args:
+            a_E: Incident waves on the external ports, shape is fxn,\
+                ordered as `self.external`.
+
+        Returns:
+            b_E: Outgoing waves on the external ports, shape is fxn.
+            a_I: Incident waves on the internal ports, shape is fxm,\
+                ordered as `self.internal`.
+        """
+        nI, nE = self.nI, self.nE
+        a_I = np.zeros((self.nf, nI), dtype=np.complex128)
+        b_E = np.zeros((self.nf, nE), dtype=np.complex128)
+        for idx in range(self.nf):
+            if nI:
+                rhs = self._apply(self._IE, idx, a_E[idx], nI)
+                a_I[idx] = self.factorize(idx)(rhs)
+                b_E[idx] = self._apply(self._EI, idx, a_I[idx], nE)
+            b_E[idx] += self._apply(self._EE, idx, a_E[idx], nE)
+        return b_E, a_I
+
+
+def solve_global_s(
+    blocks: List[ndarray], connections: ndarray
+) -> Tuple[ndarray, ndarray]:
+    """
+    Solves the s-matrix of a network of interconnected s-matrices in a\
+        single global sparse linear system, see :class:`SparseSystem`.
+
+    Parameters
+    -----------
+    blocks : list of :class:`numpy.ndarray`
+            S-parameter matrices of the components, each of shape fxnxn
+    connections : :class:`numpy.ndarray`
+            kx2 pairs of connected global port indices
+
+    Returns
+    -------
+    C : :class:`numpy.ndarray`
+        new S-parameter matrix
+    external : :class:`numpy.ndarray`
+        global port indices of the ports of `C`
+    """
+    system = SparseSystem(blocks, connections)
+    return system.external_s(), system.external
@@ -0,0 +1,260 @@
+""" Append-only, chunked store for simulation results
+
+A result store is a folder with:
+
+    - `chunks/`: raw complex128 s-parameter data, appended to chunk files\
+        that are owned by a single writer process each,
+    - `grids/`: the frequency grids, stored once per distinct grid,
+    - `index.jsonl`: one JSON line per result with its chunk, offset,\
+        shape, frequency grid, port labels, and sweep parameters.
+
+Writers append their data to their own chunk files and then the index line,\
+    under an inter-process lock, so worker processes can write concurrently.\
+    Readers memory-map the chunk files and only page in the slices they read.
+"""
+
+import os
+import json
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+from numpy import ndarray
+from opics.cache import FileLock, array_digest
+from opics.components import componentModel
+
+_DTYPE = np.dtype("<c16")
+
+
+class ResultStore:
+    """
+    An append-only store of s-parameter results, e.g., of a parameter sweep.
+
+    Args:
+        path: Store folder, created if it does not exist.
+        chunk_bytes: Size after which a writer starts a new chunk file.
+    """
+
+    def __init__(self, path: os.PathLike, chunk_bytes: int = 256 * 2**20) -> None:
+        self.path = Path(path)
+        self.chunk_bytes = chunk_bytes
+        for each in ("chunks", "grids"):
+            (self.path / each).mkdir(parents=True, exist_ok=True)
+        self.index_path = self.path / "index.jsonl"
+        self.index_path.touch()
+
+        self._writer = None  # (pid, chunk name, file object)
+        self._stored_grids = set()
+        self._grids = {}
+        self._maps = {}
+        self._records = []
+        self._index_offset = 0
+
+    # ------------------------------ writing ------------------------------
+
+    def _chunk_file(self, nbytes: int):
+        """The chunk file of this writer process, rolled over when it is full."""
+        pid = os.getpid()
+        if self._writer is not None:
+            writer_pid, _, fid = self._writer
+            if writer_pid != pid or fid.tell() + nbytes > self.chunk_bytes:
+                if writer_pid == pid:
+                    fid.close()
+                self._writer = None
+
+        if self._writer is None:
+            name = f"{pid:x}-{uuid.uuid4().hex[:12]}.bin"
+            self._writer = (pid, name, open(self.path / "chunks" / name, "ab"))
+        return self._writer[1], self._writer[2]
+
+    def _store_grid(self, f: ndarray) -> str:
+        digest = array_digest(np.asarray(f, dtype=np.float64))
+        grid_path = self.path / "grids" / f"{digest}.npy"
+        if digest not in self._stored_grids and not grid_path.exists():
+            tmp_path = grid_path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+            with open(tmp_path, "wb") as fid:
+                np.save(fid, np.asarray(f, dtype=np.float64))
+            os.replace(tmp_path, grid_path)
+        self._stored_grids.add(digest)
+        return digest
+
+    def append(
+        self,
+        result: Union[componentModel, tuple],
+        params: Optional[Dict[str, Any]] = None,
+        ports: Optional[Sequence] = None,
+    ) -> int:
+        """
+        Appends a result to the store.
+
+        Args:
+            result: A component, e.g., `Network.sim_result`, or a tuple (f, s).
+            params: Sweep parameters of the result, JSON serializable.
+            ports: Port labels, e.g., the nets of the result. Defaults to the\
+                port numbers.
+
+        Returns:
+            The index of the result in the store.
+        """
+        if isinstance(result, componentModel):
+            f, s = result.f, result.s
+        else:
+            f, s = result
+        s = np.ascontiguousarray(s, dtype=_DTYPE)
+        if ports is None:
+            ports = list(range(s.shape[-1]))
+
+        grid = self._store_grid(f)
+        chunk, fid = self._chunk_file(s.nbytes)
+        offset = fid.tell()
+        fid.write(s.tobytes())
+        fid.flush()
+
+        record = {
+            "chunk": chunk,
+            "offset": offset,
+            "shape": list(s.shape),
+            "grid": grid,
+            "ports": [p.item() if isinstance(p, np.generic) else p for p in ports],
+            "params": params or {},
+        }
+        line = json.dumps(record) + "\n"
+
+        # the data is written before the index line that refers to it
+        with FileLock(self.path / "index.lock"):
+            with open(self.index_path, "a") as index:
+                index.write(line)
+                index.flush()
+            return self._count_records() - 1
+
+    def _count_records(self) -> int:
+        self._refresh()
+        return len(self._records)
+
+    def close(self) -> None:
+        """Closes the chunk file of this writer."""
+        if self._writer is not None and self._writer[0] == os.getpid():
+            self._writer[2].close()
+        self._writer = None
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __getstate__(self):
+        # worker processes open their own chunk files and maps
+        return {"path": self.path, "chunk_bytes": self.chunk_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["chunk_bytes"])
+
+    # ------------------------------ reading ------------------------------
+
+    def _refresh(self) -> None:
+        """Reads the index lines appended since the last read."""
+        with open(self.index_path, "r") as index:
+            index.seek(self._index_offset)
+            for line in iter(index.readline, ""):
+                if not line.endswith("\n"):
+                    break  # being written
+                self._records.append(json.loads(line))
+                self._index_offset = index.tell()
+
+    @property
+    def records(self) -> List[Dict]:
+        """Index entries of the stored results."""
+        self._refresh()
+        return self._records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.records)
+
+    def select(
+        self, condition: Optional[Callable[[Dict], bool]] = None, **params
+    ) -> List[int]:
+        """
+        Indices of the results whose sweep parameters match.
+
+        Args:
+            condition: Function of the parameters of a result, e.g.,\
+                `lambda p: p["length"] > 1e-5`.
+            params: Parameter values the results must have.
+        """
+        return [
+            i
+            for i, record in enumerate(self.records)
+            if all(record["params"].get(k) == v for k, v in params.items())
+            and (condition is None or condition(record["params"]))
+        ]
+
+    def frequencies(self, index: int) -> ndarray:
+        """Frequency grid of a result."""
+        grid = self.records[index]["grid"]
+        if grid not in self._grids:
+            self._grids[grid] = np.load(self.path / "grids" / f"{grid}.npy")
+        return self._grids[grid]
+
+    def _map(self, chunk: str, end: int) -> np.memmap:
+        """Read-only map of a chunk file, remapped if it has grown past `end`."""
+        data = self._maps.get(chunk)
+        if data is None or data.size < end:
+            data = np.memmap(self.path / "chunks" / chunk, dtype=np.uint8, mode="r")
+            self._maps[chunk] = data
+        return data
+
+    def sparameters(self, index: int, ports: Optional[Sequence] = None) -> ndarray:
+        """
+        S-parameters of a result, as a read-only view of the memory-mapped\
+            chunk file.
+
+        Args:
+            index: Index of the result.
+            ports: Port pairs (i, j) to read, by port number, or by label\
+                for labels that are not integers. Defaults to the whole matrix.
+
+        Returns:
+            The s-parameters, shape is (f, n, n), or (f, len(ports)) for a\
+                selection of port pairs.
+        """
+        record = self.records[index]
+        shape = tuple(record["shape"])
+        start = record["offset"]
+        end = start + int(np.prod(shape)) * _DTYPE.itemsize
+        s = self._map(record["chunk"], end)[start:end].view(_DTYPE).reshape(shape)
+        if ports is None:
+            return s
+
+        labels = record["ports"]
+
+        def _number(port):
+            return port if isinstance(port, (int, np.integer)) else labels.index(port)
+
+        rows = [_number(i) for i, _ in ports]
+        cols = [_number(j) for _, j in ports]
+        return s[:, rows, cols]
+
+    def stack(
+        self, indices: Optional[Sequence[int]] = None, ports: Optional[Sequence] = None
+    ) -> ndarray:
+        """
+        S-parameters of several results on the same frequency grid, stacked\
+            along a first axis.
+
+        Args:
+            indices: Indices of the results, e.g., from `select`. Defaults to\
+                all the results.
+            ports: Port pairs (i, j) to read, see `sparameters`.
+        """
+        if indices is None:
+            indices = range(len(self))
+        return np.stack([self.sparameters(i, ports) for i in indices])
+
+    def component(self, index: int) -> componentModel:
+        """A component with the data of a result, loaded into memory."""
+        s = np.array(self.sparameters(index))
+        return componentModel(f=self.frequencies(index), s=s, nports=s.shape[-1])
@@ -0,0 +1,234 @@
+""" Touchstone (.sNp) file reader and writer, versions 1.x and 2.0
+
+The data of a whole file is parsed, converted, and formatted in vectorized\
+    passes. Only scattering (S) parameters in the "Full" matrix format are\
+    supported.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from numpy import ndarray
+
+FREQUENCY_UNITS = {"HZ": 1.0, "KHZ": 1e3, "MHZ": 1e6, "GHZ": 1e9, "THZ": 1e12}
+DATA_FORMATS = ("MA", "DB", "RI")
+
+# values per record (frequency and complex values) formatted at once
+_CHUNK_VALUES = 2**20
+
+
+def _to_complex(data: ndarray, data_format: str) -> ndarray:
+    """Converts (..., 2) pairs of values of a data format to complex values."""
+    first, second = data[..., 0], data[..., 1]
+    if data_format == "RI":
+        return first + 1j * second
+    if data_format == "MA":
+        return first * np.exp(1j * np.deg2rad(second))
+    if data_format == "DB":
+        return 10 ** (first / 20) * np.exp(1j * np.deg2rad(second))
+    raise ValueError(f"Unknown data format {data_format!r}, expected {DATA_FORMATS}.")
+
+
+def _from_complex(s: ndarray, data_format: str) -> Tuple[ndarray, ndarray]:
+    """Converts complex values to the pairs of values of a data format."""
+    if data_format == "RI":
+        return s.real, s.imag
+    if data_format == "MA":
+        return np.abs(s), np.rad2deg(np.angle(s))
+    if data_format == "DB":
+        with np.errstate(divide="ignore"):
+            return 20 * np.log10(np.abs(s)), np.rad2deg(np.angle(s))
+    raise ValueError(f"Unknown data format {data_format!r}, expected {DATA_FORMATS}.")
+
+
+def _parse_options(line: str) -> Dict:
+    """Parses the option line, e.g. `# GHz S MA R 50`."""
+    options = {"unit": "GHZ", "parameter": "S", "format": "MA", "z0": 50.0}
+    tokens = line[1:].upper().split()
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in FREQUENCY_UNITS:
+            options["unit"] = token
+        elif token in DATA_FORMATS:
+            options["format"] = token
+        elif token in ("S", "Y", "Z", "H", "G"):
+            options["parameter"] = token
+        elif token == "R" and i + 1 < len(tokens):
+            options["z0"] = float(tokens[i + 1])
+            i += 1
+        i += 1
+    return options
+
+
+def _nports_from_extension(filepath: os.PathLike) -> Optional[int]:
+    match = re.search(r"\.s(\d+)p$", str(filepath), re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def read_touchstone(filepath: os.PathLike) -> Tuple[ndarray, ndarray, Dict]:
+    """
+    Reads a Touchstone file.
+
+    Args:
+        filepath: Touchstone file path. The port count of version 1 files is\
+            taken from the .sNp extension.
+
+    Returns:
+        The frequencies (Hz), the s-parameters (f x n x n), and the file\
+            options {"version", "unit", "format", "z0", "nports"}.
+    """
+    options = None
+    keywords = {}
+    data_lines = []
+    in_data = False
+
+    with open(filepath, "r") as fid:
+        for line in fid:
+            line = line.split("!", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                if options is None:
+                    options = _parse_options(line)
+                in_data = "[VERSION]" not in keywords
+                continue
+            if line.startswith("["):
+                keyword, _, value = line.partition("]")
+                keyword = keyword.upper() + "]"
+                if keyword in ("[NOISE DATA]", "[END]"):
+                    break
+                keywords[keyword] = value.strip()
+                in_data = keyword == "[NETWORK DATA]"
+                continue
+            if in_data:
+                data_lines.append(line)
+
+    if options is None:
+        raise ValueError(f"{filepath} has no option line.")
+    if options["parameter"] != "S":
+        raise ValueError(
+            f"Only S-parameters are supported, got {options['parameter']}."
+        )
+    if keywords.get("[MATRIX FORMAT]", "FULL").upper() != "FULL":
+        raise ValueError("Only the Full matrix format is supported.")
+
+    version = 2 if "[VERSION]" in keywords else 1
+    if version == 2:
+        nports = int(keywords["[NUMBER OF PORTS]"])
+        reference = keywords.get("[REFERENCE]", "").split()
+        if reference:
+            options["z0"] = float(reference[0])
+        order = keywords.get("[TWO-PORT DATA ORDER]", "12_21")
+    else:
+        nports = _nports_from_extension(filepath)
+        if nports is None:
+            raise ValueError(f"Cannot infer the port count of {filepath}.")
+        order = "21_12"
+
+    record = 1 + 2 * nports * nports
+    if nports <= 2:
+        # one record per line, followed by noise parameters in version 1 files
+        lines = [each.split() for each in data_lines]
+        count = next((i for i, each in enumerate(lines) if len(each) != record), None)
+        lines = lines[:count]
+        values = np.array([value for each in lines for value in each], dtype=float)
+    else:
+        values = np.array(" ".join(data_lines).split(), dtype=float)
+
+    if values.size % record:
+        raise ValueError(f"{filepath} holds incomplete {nports}-port records.")
+    values = values.reshape(-1, record)
+
+    f = values[:, 0] * FREQUENCY_UNITS[options["unit"]]
+    s = _to_complex(values[:, 1:].reshape(-1, nports, nports, 2), options["format"])
+    if nports == 2 and order == "21_12":
+        s = s.transpose(0, 2, 1)
+
+    options.update({"version": version, "nports": nports})
+    return f, np.ascontiguousarray(s), options
+
+
+def _format_records(
+    fid, values: ndarray, record_format: str, chunk: int = _CHUNK_VALUES
+) -> None:
+    """Formats and writes whole records at once, in chunks of records."""
+    records = max(1, chunk // values.shape[1])
+    for start in range(0, values.shape[0], records):
+        block = values[start : start + records]
+        fid.write((record_format * block.shape[0]) % tuple(block.ravel()))
+
+
+def write_touchstone(
+    filepath: os.PathLike,
+    f: ndarray,
+    s: ndarray,
+    data_format: str = "MA",
+    version: int = 1,
+    unit: str = "GHz",
+    z0: float = 50.0,
+    comments: Optional[Union[str, List[str]]] = None,
+    precision: int = 12,
+) -> None:
+    """
+    Writes s-parameters to a Touchstone file.
+
+    Args:
+        filepath: Touchstone file path, with the .sNp extension for\
+            version 1 files.
+        f: Frequencies (Hz).
+        s: S-parameters, shape is f x n x n.
+        data_format: "MA" (magnitude, angle), "DB" (dB, angle), or "RI"\
+            (real, imaginary).
+        version: Touchstone version, 1 or 2.
+        unit: Frequency unit, Hz, kHz, MHz, GHz, or THz.
+        z0: Reference impedance.
+        comments: Comment lines written in the header.
+        precision: Digits after the decimal point of the values.
+    """
+    data_format = data_format.upper()
+    if unit.upper() not in FREQUENCY_UNITS:
+        raise ValueError(f"Unknown frequency unit {unit!r}.")
+    if version not in (1, 2):
+        raise ValueError(f"Unknown Touchstone version {version!r}.")
+
+    nports = s.shape[-1]
+    first, second = _from_complex(np.asarray(s), data_format)
+
+    # version 1 two-port data is ordered S11 S21 S12 S22
+    if nports == 2 and version == 1:
+        first, second = first.transpose(0, 2, 1), second.transpose(0, 2, 1)
+
+    values = np.empty((s.shape[0], 1 + 2 * nports * nports))
+    values[:, 0] = f / FREQUENCY_UNITS[unit.upper()]
+    values[:, 1::2] = first.reshape(s.shape[0], -1)
+    values[:, 2::2] = second.reshape(s.shape[0], -1)
+
+    # records of more than two ports: each matrix row on new lines of at most
+    # four value pairs
+    pair = f" %.{precision}e %.{precision}e"
+    if nports <= 2:
+        record_format = f"%.{precision}e" + pair * nports * nports + "\n"
+    else:
+        row = "\n".join(pair * min(4, nports - start) for start in range(0, nports, 4))
+        record_format = f"%.{precision}e" + "\n".join([row] * nports) + "\n"
+
+    if isinstance(comments, str):
+        comments = comments.splitlines()
+
+    with open(filepath, "w") as fid:
+        for line in comments or []:
+            fid.write(f"! {line}\n")
+        if version == 2:
+            fid.write("[Version] 2.0\n")
+        fid.write(f"# {unit} S {data_format} R {z0:g}\n")
+        if version == 2:
+            fid.write(f"[Number of Ports] {nports}\n")
+            if nports == 2:
+                fid.write("[Two-Port Data Order] 12_21\n")
+            fid.write(f"[Number of Frequencies] {s.shape[0]}\n")
+            fid.write("[Network Data]\n")
+        _format_records(fid, values, record_format)
+        if version == 2:
+            fid.write("[End]\n")
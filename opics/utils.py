@@ -1,14 +1,22 @@
-from typing import Any, Dict, List, Tuple
-import cmath as cm
+from typing import Any, Dict, Iterator, List, Tuple
+import os
+import sys
 import time
+import threading
 import re
-import itertools
-import inspect
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 import numpy as np
 from numpy import ndarray
 from pathlib import PosixPath
-from defusedxml.ElementTree import parse
+from opics.cache import cache_dir, file_digest, atomic_write, FileLock
+
+# a number with an optional SI prefix, e.g. "1.3u", "0.5um", or "-18.52E-6"
+_SI_VALUE = re.compile(
+    r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(mm|um|nm|u)?\s*$"
+)
+_SI_PREFIXES = {"mm": "e-3", "um": "e-6", "u": "e-6", "nm": "e-9"}
 
 
 def fromSI(value: str) -> float:
@@ -18,18 +26,78 @@ def fromSI(value: str) -> float:
         value (str): a value in SI units, e.g. 1.3u
 
     Returns:
-        float: the value in metric units.
+        float: the value in metric units, or the value itself if it is not\
+            a number, e.g., a list of points.
     """
-    if "mm" in value:
-        return float(value.replace("mm", "e-3"))
-    elif "um" in value:
-        return float(value.replace("um", "e-6"))
-    elif "u" in value:
-        return float(value.replace("u", "e-6"))
-    elif "nm" in value:
-        return float(value.replace("nm", "e-9"))
-    else:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    match = _SI_VALUE.match(value) if isinstance(value, str) else None
+    if match is None:
         return value
+    number, prefix = match.groups()
+    if prefix is None:
+        return float(number)
+    if "e" in number.lower():
+        return float(number) * float("1" + _SI_PREFIXES[prefix])
+    return float(number + _SI_PREFIXES[prefix])
+
+
+# header line of a data block in formats A and B, e.g. "(101, 3)"
+_SPARAM_BLOCK_SHAPE = re.compile(r"^\(\s*(\d+)\s*,\s*\d+\s*\)")
+
+
+def sparam_file_format(filepath: PosixPath) -> str:
+    """
+    Detects the format of a sparam file from its first line only: format A\
+        starts with the port list ["port 1",""], format B with a data block\
+        header ('port 1','TE',1,'port 1',1,'transmission'), and format C\
+        with numeric columns.
+
+    Args:
+        filepath: Sparam file path.
+    """
+    with open(filepath, "r") as fid:
+        for line in fid:
+            line = line.lstrip()
+            if line:
+                return {"[": "A", "(": "B"}.get(line[0], "C")
+    raise ValueError(f"{filepath} is empty.")
+
+
+def _polar_to_complex(magnitude: ndarray, phase: ndarray) -> ndarray:
+    return magnitude * np.exp(1j * phase)
+
+
+def _read_sparam_blocks(filename: PosixPath, numports: int) -> Tuple[ndarray, ndarray]:
+    """
+    Reads a sparam file of format A or B, which stores one block of\
+        (frequency, magnitude, phase) rows per s-parameter, S[:, m, n] being\
+        block n * numports + m.
+    """
+    numrows = None
+    with open(filename, "r") as fid:
+        for line in fid:
+            match = _SPARAM_BLOCK_SHAPE.match(line)
+            if match:
+                numrows = int(match.group(1))
+                break
+    if numrows is None:
+        raise ValueError(f"{filename} has no data block header.")
+
+    # all the numeric rows at once, header lines are skipped as comments
+    data = np.loadtxt(filename, comments=["(", "["], ndmin=2)
+    size = numports * numports * numrows
+    if data.shape[0] < size or data.shape[1] < 3:
+        raise ValueError(
+            f"{filename} does not hold {numports}x{numports} blocks of {numrows} rows."
+        )
+
+    data = data[:size, :3].reshape(numports, numports, numrows, 3)
+    F = data[0, 0, :, 0].copy()
+    S = _polar_to_complex(data[..., 1], data[..., 2]).transpose(2, 1, 0)
+    return (F, np.ascontiguousarray(S))
 
 
 def universal_sparam_filereader(
@@ -50,130 +118,93 @@ def universal_sparam_filereader(
     filename = sfiledir / sfilename
 
     if format_type == "auto":
-        try:
-            # print("try A")
-            result = universal_sparam_filereader(nports, sfilename, sfiledir, "A")
-            return result
-        except Exception:
-            try:
-                # print("try B")
-                result = universal_sparam_filereader(nports, sfilename, sfiledir, "B")
-                return result
-            except Exception:
-                # print("try C")
-                result = universal_sparam_filereader(nports, sfilename, sfiledir, "C")
-                return result
-
-    elif format_type == "A":
-        """
-        dc_halfring_te_1550
-        Returns the s-parameters across some frequency range for the Sparam fileformat A
+        format_type = sparam_file_format(filename)
 
-        input:
-        ["port 1",""]
-        ["port 2",""]
-        ["port 3",""]
-        ["port 4",""]
-        ("port 1","mode 1",1,"port 1",1,"transmission")
-        (101, 3)
-
-        output:
-        [frequency, s-parameters]
-        """
-        F = []
-        S = []
-        with open(filename, "r") as fid:
-            for _ in range(5):
-                line = fid.readline()
-            line = fid.readline()
-            numrows = int(tuple(line[1:-2].split(","))[0])
-            S = np.zeros((numrows, numports, numports), dtype="complex128")
-            r = m = n = 0
-            for line in fid:
-                if line[0] == "(":
-                    continue
-                data = line.split()
-                data = list(map(float, data))
-                if m == 0 and n == 0:
-                    F.append(data[0])
-                S[r, m, n] = data[1] * np.exp(1j * data[2])
-                r += 1
-                if r == numrows:
-                    r = 0
-                    m += 1
-                    if m == numports:
-                        m = 0
-                        n += 1
-                        if n == numports:
-                            break
-        return (np.array(F), S)
-
-    elif format_type == "B":
+    if format_type in ("A", "B"):
         """
-        ebeam_bdc_te1550, nanotaper, ebeam_y_1550
+        dc_halfring_te_1550 (A), ebeam_bdc_te1550, nanotaper, ebeam_y_1550 (B)
 
-        Returns the s-parameters across some frequency range for the Sparam fileformat A
+        Returns the s-parameters across some frequency range for the Sparam fileformats A and B
         input:
+        ["port 1",""]   (format A only)
+        ["port 2",""]
         ('port 1','TE',1,'port 1',1,'transmission')
         (51,3)
 
         output:
         [frequency, s-parameters]
         """
-        F = []
-        S = []
-        with open(filename, "r") as fid:
-            line = fid.readline()
-            line = fid.readline()
-            numrows = int(tuple(line[1:-2].split(","))[0])
-            S = np.zeros((numrows, numports, numports), dtype="complex128")
-            r = m = n = 0
-            for line in fid:
-                if line[0] == "(":
-                    continue
-                data = line.split()
-                data = list(map(float, data))
-                if m == 0 and n == 0:
-                    F.append(data[0])
-                S[r, m, n] = data[1] * np.exp(1j * data[2])
-                r += 1
-                if r == numrows:
-                    r = 0
-                    m += 1
-                    if m == numports:
-                        m = 0
-                        n += 1
-                        if n == numports:
-                            break
-        return (np.array(F), S)
+        return _read_sparam_blocks(filename, numports)
 
     elif format_type == "C":
         """
         ebeam_gc_te1550
 
-        Returns the s-parameters across some frequency range for the Sparam fileformat A
+        Returns the s-parameters across some frequency range for the Sparam fileformat C
         input:
-        columns with space delimiter
+        columns with space delimiter, f, |S11|, <S11, |S12|, <S12, |S21|, <S21, |S22|, <S22
 
         output:
         [frequency, s-parameters]
         """
-        with open(filename) as fid:
-            # grating coupler compact models have 100 points for each s-matrix index
-            lines = fid.readlines()
-            arrlen = len(lines)
-            F = np.zeros(arrlen)
-            S = np.zeros((arrlen, 2, 2), "complex128")
-            for i in range(arrlen):
-                words = lines[i].split()
-                F[i] = float(words[0])
-                S[i, 0, 0] = cm.rect(float(words[1]), float(words[2]))
-                S[i, 0, 1] = cm.rect(float(words[3]), float(words[4]))
-                S[i, 1, 0] = cm.rect(float(words[5]), float(words[6]))
-                S[i, 1, 1] = cm.rect(float(words[7]), float(words[8]))
-            F = F[::-1]
-            S = S[::-1, :, :]
-        return (np.array(F), S)
+        # rows are stored in decreasing frequency order
+        data = np.loadtxt(filename, ndmin=2)[::-1]
+        F = data[:, 0].copy()
+        S = _polar_to_complex(data[:, 1:9:2], data[:, 2:9:2]).reshape(-1, 2, 2)
+        return (F, S)
+
+    raise ValueError(f"Unknown sparam file format {format_type!r}.")
+
+
+# parsed look-up-tables, {filepath: (file signature, xml, index, last entry)}
+_LUT_index_cache = {}
+_LUT_index_lock = threading.Lock()
+
+
+def _LUT_key(lutdata: List[List[str]]) -> frozenset:
+    """Canonical, order independent form of a look-up-table parameter set."""
+    return frozenset((str(name), str(value)) for name, value in lutdata)
+
+
+def LUT_index(filedir: PosixPath, lutfilename: str) -> Tuple[Any, Dict, Tuple]:
+    """
+    Parses a look-up-table into an index that maps each parameter set to\
+        its s-parameter data files. The index is built once per file, shared\
+        process-wide, and rebuilt when the file is modified.
+
+    Args:
+        filedir: Directory of the XML look-up-table file.
+        lutfilename: Look-up-table filename.
+
+    Returns:
+        The parsed XML, the index {parameter set: (data files, node)}, and the\
+            (data files, node) of the last entry of the look-up-table.
+    """
+    filepath = os.path.abspath(filedir / lutfilename)
+    stat = os.stat(filepath)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _LUT_index_cache.get(filepath)
+    if entry is not None and entry[0] == signature:
+        return entry[1:]
+
+    from defusedxml.ElementTree import parse
+
+    with _LUT_index_lock:
+        xml = parse(filepath)
+        root = xml.getroot()
+
+        index = {}
+        last = None
+        for node in root.iter("association"):
+            sample = [[each.attrib["name"], each.text] for each in node.iter("value")]
+            last = (sample[-1][1], node)
+            # the first matching entry is used, as with a linear scan
+            index.setdefault(_LUT_key(sample[:-1]), last)
+
+        _LUT_index_cache[filepath] = (signature, xml, index, last)
+
+    return xml, index, last
 
 
 def LUT_reader(filedir: PosixPath, lutfilename: str, lutdata: List[List[str]]):
@@ -185,15 +216,11 @@ def LUT_reader(filedir: PosixPath, lutfilename: str, lutdata: List[List[str]]):
         lutfilename: Look-up-table filename.
         lutdata: Look-up-table arguments.
     """
-    xml = parse(filedir / lutfilename)
-    root = xml.getroot()
+    xml, index, last = LUT_index(filedir, lutfilename)
 
-    for node in root.iter("association"):
-        sample = [[each.attrib["name"], each.text] for each in node.iter("value")]
-        if sorted(sample[:-1]) == sorted(lutdata):
-            break
-    sparam_file = sample[-1][1].split(";")
-    return (sparam_file, xml, node)
+    # without a match, the last entry is used
+    sparam_file, node = index.get(_LUT_key(lutdata), last)
+    return (sparam_file.split(";"), xml, node)
 
 
 def LUT_processor(
@@ -204,9 +231,36 @@ def LUT_processor(
     sparam_attr: str,
     verbose: bool = False,
 ) -> Tuple[Tuple[ndarray, ndarray], str]:
-    """process look up table data"""
+    """
+    Process look up table data.
+
+    Text sparam files are converted to npz files once, in the user-level\
+        cache directory (see :func:`opics.cache.cache_dir`), keyed by the hash\
+        of the sparam file. The conversion is written atomically under a file\
+        lock, so concurrent processes can share it, and the library files\
+        are never modified.
+
+    If the library has a pack (see :mod:`opics.libraries.pack`), the data is\
+        read from the memory-mapped pack instead, unless the packed data has\
+        another number of ports than `nports`.
+    """
+    from opics.libraries.pack import find_pack
+
     start = time.time()
-    sparam_file, xml, node = LUT_reader(filedir, lutfilename, lutdata)
+
+    pack = find_pack(filedir)
+    packed = pack.lookup_lut(filedir, lutfilename, lutdata) if pack else None
+    # the packed port count is inferred from the sparam file header, the data
+    # file is read again if it is not the requested one
+    if packed is not None and packed[0][1].shape[-1] == nports:
+        if verbose:
+            print(
+                "SParam data extracted from the library pack in ",
+                time.time() - start,
+            )
+        return packed
+
+    sparam_file, _, _ = LUT_reader(filedir, lutfilename, lutdata)
 
     # read data
     if ".npz" in sparam_file[0] or ".npz" in sparam_file[-1]:
@@ -216,34 +270,262 @@ def LUT_processor(
         npz_file = npzfile
 
     else:
-        if verbose:
-            print("numpy datafile not found. reading sparam file instead..")
+        source = filedir / sparam_file[-1]
+        try:
+            npz_path = cache_dir("sparam") / f"{file_digest(source)}_{nports}.npz"
+            npz_file = str(npz_path)
+            sdata = _converted_sparam_file(npz_path, nports, source, verbose)
+        except OSError:
+            # the cache directory is not usable, parse the sparam file instead
+            npz_file = sparam_file[-1]
+            sdata = universal_sparam_filereader(nports, source.name, filedir, "auto")
+
+    if verbose:
+        print("SParam data extracted in ", time.time() - start)
+    return (sdata, npz_file)
 
-        sdata = universal_sparam_filereader(nports, sparam_file[-1], filedir, "auto")
-        # create npz file name
-        npz_file = sparam_file[-1].split(".")[0]
 
-        # save as npz file
-        np.savez(filedir / npz_file, f=sdata[0], s=sdata[1])
+def _converted_sparam_file(
+    npz_path: PosixPath, nports: int, source: PosixPath, verbose: bool
+) -> Tuple[ndarray, ndarray]:
+    """Loads a converted sparam file from the cache, converts it on a miss."""
+    if not npz_path.exists():
+        with FileLock(npz_path.with_suffix(".lock")):
+            # another process may have converted the file while we waited
+            if not npz_path.exists():
+                if verbose:
+                    print("numpy datafile not found. reading sparam file instead..")
 
-        # update xml file
-        sparam_file.append(f"{npz_file}.npz")
-        sparam_file = list(set(sparam_file))
+                f, s = universal_sparam_filereader(
+                    nports, source.name, source.parent, "auto"
+                )
+                atomic_write(npz_path, lambda fid: np.savez(fid, f=f, s=s))
+                return (f, s)
 
-        for each in node.iter("value"):
-            if each.attrib["name"] == sparam_attr:
-                each.text = ";".join(sparam_file)
-        xml.write(filedir / lutfilename)
+    tempdata = np.load(npz_path)
+    return (tempdata["f"], tempdata["s"])
 
-    if verbose:
-        print("SParam data extracted in ", time.time() - start)
-    return (sdata, npz_file)
+
+def _component_params(cls_attrs: Dict, comp_attrs: Dict) -> Dict:
+    """
+    Parameters of a library component, its class attributes updated with the\
+        netlist attributes whose names contain them, e.g. "wg_length" sets\
+        "length".
+    """
+    params = deepcopy(cls_attrs)
+    for each_cls_attrs in params.keys():
+        for each_comp_attrs in comp_attrs.keys():
+            if each_cls_attrs in each_comp_attrs:
+                params[each_cls_attrs] = fromSI(comp_attrs[each_comp_attrs])
+    return params
+
+
+def _network_nets(circuitData: Dict[str, Any]) -> Dict[str, List[int]]:
+    """
+    Nets of each component of a circuit, with the connection nets numbered\
+        from 0 as in a network.
+    """
+    labels, nets = circuitData["compLabels"], circuitData["circuitNets"]
+    connections = circuitData["circuitConns"]
+    if connections == list(range(len(connections))):
+        return dict(zip(labels, nets))
+
+    net_ids = {net: i for i, net in enumerate(connections)}
+    return {
+        label: [net_ids.get(net, net) for net in each]
+        for label, each in zip(labels, nets)
+    }
+
+
+def _merge_schedule(circuitData: Dict[str, Any]) -> List:
+    """Merge schedule of the network of a circuit, see `Network.merge_schedule`."""
+    from opics.network import Network
+
+    network = Network(network_id=circuitData["networkID"])
+    network.global_netlist = _network_nets(circuitData)
+    network.current_connections = list(range(len(circuitData["circuitConns"])))
+    return network.merge_schedule()
+
+
+def _library_versions(circuitData: Dict[str, Any]) -> Dict[str, Any]:
+    """Catalogue versions of the libraries used by a netlist."""
+    from opics.libraries import library_catalogue
+
+    names = {
+        lib
+        for each in [circuitData, *circuitData["subcircuits"].values()]
+        for lib in each["compLibs"]
+        if lib is not None
+    }
+    return {
+        name: library_catalogue.get(name, {}).get("version") for name in sorted(names)
+    }
+
+
+# sub-circuit parameter reference in a component attribute, e.g. {length}
+_SUBCIRCUIT_PARAM = re.compile(r"^\{(\w+)\}$")
+
+
+def _subcircuit_attrs(
+    definition: Dict[str, Any], instance_attrs: Dict[str, str]
+) -> List[Dict[str, str]]:
+    """
+    Component attributes of a sub-circuit instance, with the references to\
+        the sub-circuit parameters, e.g. "{length}", replaced by their values.
+    """
+    params = {**definition["params"], **instance_attrs}
+    if not params:
+        return definition["compAttrs"]
+
+    substituted = {}
+    for attrs in definition["compAttrs"]:
+        if id(attrs) not in substituted:
+            substituted[id(attrs)] = {
+                key: _substitute_param(value, params) for key, value in attrs.items()
+            }
+    return [substituted[id(attrs)] for attrs in definition["compAttrs"]]
+
+
+def _substitute_param(value: str, params: Dict[str, str]) -> str:
+    """Value of an attribute, or of the sub-circuit parameter it references."""
+    match = _SUBCIRCUIT_PARAM.match(value)
+    if match is None:
+        return value
+    return params.get(match.group(1), value)
+
+
+def _solve_subcircuit(network, libs_comps, subcircuits, instance, solved):
+    """
+    Simulates a sub-circuit instance, (model, attributes), into a single\
+        component, whose ports follow the order of the .subckt ports. The\
+        sub-circuits it instantiates are taken from `solved`.
+    """
+    model, instance_attrs = instance
+    definition = subcircuits[model]
+    circuitData = {
+        **definition,
+        "compAttrs": _subcircuit_attrs(definition, dict(instance_attrs)),
+    }
+    subnetwork = type(network)(network_id=model, f=network.f)
+    _add_netlist_components(subnetwork, circuitData, libs_comps, solved)
+
+    if circuitData["circuitConns"]:
+        result = subnetwork.simulate_network()
+    elif len(circuitData["compLabels"]) == 1:
+        result = subnetwork.current_components[circuitData["compLabels"][0]]
+    else:
+        raise RuntimeError(f"Some components of sub-circuit {model} are not connected.")
+
+    nets = list(subnetwork.global_netlist.values())[-1]
+    order = [nets.index(net) for net in definition["ports"]]
+    result = result.clone()
+    result.s = result.s[:, order][:, :, order]
+    result.nports = len(order)
+    result.port_references = dict(enumerate(definition["terminals"]))
+    return result
+
+
+def _subcircuit_instances(circuitData: Dict[str, Any]) -> List[Tuple]:
+    """Distinct sub-circuit instances of a circuit, as (model, attributes)."""
+    return list(
+        dict.fromkeys(
+            (model, tuple(sorted(comp_attrs.items())))
+            for lib, model, comp_attrs in zip(
+                circuitData["compLibs"],
+                circuitData["compModels"],
+                circuitData["compAttrs"],
+            )
+            if lib is None
+        )
+    )
+
+
+def _solve_subcircuits(network, circuitData, libs_comps, subcircuits, executor):
+    """
+    Simulates each distinct sub-circuit instance of a circuit hierarchy once,\
+        leaves first. The instances of the same nesting depth are simulated\
+        in parallel on the executor, none of them waits for another.
+
+    Returns:
+        The simulated instances {(model, attributes): component}.
+    """
+    depths = {}
+
+    def depth(instance):
+        if instance not in depths:
+            model, instance_attrs = instance
+            definition = subcircuits[model]
+            children = _subcircuit_instances(
+                {
+                    **definition,
+                    "compAttrs": _subcircuit_attrs(definition, dict(instance_attrs)),
+                }
+            )
+            depths[instance] = 1 + max(map(depth, children), default=-1)
+        return depths[instance]
+
+    for instance in _subcircuit_instances(circuitData):
+        depth(instance)
+
+    solved = {}
+    for level in range(max(depths.values(), default=-1) + 1):
+        futures = {
+            instance: executor.submit(
+                _solve_subcircuit, network, libs_comps, subcircuits, instance, solved
+            )
+            for instance, instance_depth in depths.items()
+            if instance_depth == level
+        }
+        solved.update((key, future.result()) for key, future in futures.items())
+    return solved
+
+
+def _add_netlist_components(network, circuitData, libs_comps, solved) -> None:
+    """
+    Adds the components of a circuit to a network, one instance per distinct\
+        component. Sub-circuit instances are clones of the simulated ones in\
+        `solved`.
+    """
+    components = list(
+        zip(
+            circuitData["compLabels"],
+            circuitData["compLibs"],
+            circuitData["compModels"],
+            circuitData["compAttrs"],
+        )
+    )
+
+    prototypes = {}
+    network_nets = _network_nets(circuitData)
+    for label, lib, model, comp_attrs in components:
+        key = (model, tuple(sorted(comp_attrs.items())))
+        prototype = solved[key] if lib is None else prototypes.get((lib, *key))
+        if prototype is None:
+            comp_model = libs_comps[lib][model]
+            prototypes[(lib, *key)] = network.add_component(
+                comp_model,
+                params=_component_params(comp_model.cls_attrs, comp_attrs),
+                component_id=label,
+            )
+        else:
+            network.add_component(prototype.clone(label))
+
+        # add circuit netlist
+        network.global_netlist[label] = network_nets[label]
+    # add unique net component connections
+    network.current_connections = list(range(len(circuitData["circuitConns"])))
+    network.schedule = circuitData.get("schedule")
 
 
 def NetlistProcessor(spice_filepath, Network, libraries, c_, circuitData, verbose=True):
     """
     Processes a spice netlist to setup and simulate a circuit.
 
+    Components with the same library, model, and attributes are instantiated\
+        once, the other instances are clones that share the s-parameter data.\
+        Each distinct sub-circuit and parameterization is simulated once,\
+        and its instances are added to the circuit as a single component.
+
     Args:
         spice_filepath: Path to the spice netlist file.
         Network:
@@ -262,220 +544,301 @@ def NetlistProcessor(spice_filepath, Network, libraries, c_, circuitData, verbos
 
     # create a circuit
     subckt = Network(network_id=circuitData["networkID"], f=freq)
-    # get library
-    all_libraries = dict(
-        [
-            each
-            for each in inspect.getmembers(libraries, inspect.ismodule)
-            if each[0][0] != "_"
-        ]
-    )
+    # get the libraries, imported on first use
+    subcircuits = circuitData.get("subcircuits", {})
     libs_comps = {
-        each_lib: all_libraries[each_lib].component_factory
-        for each_lib in list(set(circuitData["compLibs"]))
+        each_lib: getattr(libraries, each_lib).component_factory
+        for each in [circuitData, *subcircuits.values()]
+        for each_lib in set(each["compLibs"])
+        if each_lib is not None
     }
 
-    # add circuit components
-    for i in range(len(circuitData["compModels"])):
-
-        # get component model
-        comp_model = libs_comps[circuitData["compLibs"][i]][
-            circuitData["compModels"][i]
-        ]
-        # clean attributes
-        cls_attrs = deepcopy(comp_model.cls_attrs)  # class attributes
-        comp_attrs = circuitData["compAttrs"][i]  # component attributes
-        # clean up attributes
-        for each_cls_attrs in cls_attrs.keys():
-            for each_comp_attrs in comp_attrs.keys():
-                if each_cls_attrs in each_comp_attrs:
-                    cls_attrs[each_cls_attrs] = fromSI(comp_attrs[each_comp_attrs])
-
-        subckt.add_component(
-            libs_comps[circuitData["compLibs"][i]][circuitData["compModels"][i]],
-            params=cls_attrs,
-            component_id=circuitData["compLabels"][i],
+    # simulate the sub-circuits, then add circuit components
+    with ThreadPoolExecutor() as executor:
+        solved = _solve_subcircuits(
+            subckt, circuitData, libs_comps, subcircuits, executor
         )
-
-        # add circuit netlist
-        subckt.global_netlist[circuitData["compLabels"][i]] = circuitData[
-            "circuitNets"
-        ][i]
-    # add unique net component connections
-    subckt.current_connections = circuitData["circuitConns"]
+    _add_netlist_components(subckt, circuitData, libs_comps, solved)
 
     return subckt
 
 
+# attributes, e.g. wg_length=10u, library="Design kits/ebeam" or start = 1.5e-6,
+# with the quotes of the values removed
+_NETLIST_ATTR = re.compile(r'(?<!\S)(?=([^\s=]+))\1\s*=\s*"?((?<=")[^"]*|[^\s"]*)"?')
+# schematic placement attributes
+_PLACEMENT_ATTRS = ("sch_x", "sch_y")
+
+
+def _netlist_lines(filepath: PosixPath) -> Iterator[str]:
+    """
+    Streams the statements of a spice netlist, with the comments removed and\
+        the "+" continuation lines joined.
+    """
+    statement = ""
+    with open(filepath, "r") as fid:
+        for line in fid:
+            line = line.strip()
+            if not line or line.startswith("*"):
+                continue
+            if line.startswith("+"):
+                statement = f"{statement} {line[1:]}"
+                continue
+            if statement:
+                yield statement
+            statement = line
+    if statement:
+        yield statement
+
+
+# layout version of the cached netlists, see netlistParser.readfile
+_NETLIST_CACHE_FORMAT = 1
+
+
+def _read_netlist_cache(cache_path: PosixPath) -> Dict[str, Any]:
+    """Reads a cached netlist, None if it is missing, unreadable, or outdated."""
+    try:
+        with open(cache_path, "rb") as fid:
+            entry = pickle.load(fid)
+    except Exception:
+        # missing, or e.g. truncated, entries are rebuilt by the caller
+        return None
+    if not isinstance(entry, dict) or entry.get("format") != _NETLIST_CACHE_FORMAT:
+        return None
+    return entry
+
+
+def _new_circuit(name: str, terminals: List[str], params: Dict) -> Dict[str, Any]:
+    """Circuit data of a .subckt definition, filled while it is parsed."""
+    return {
+        "circuitNets": [],
+        "circuitConns": [],
+        "compLibs": [],
+        "compModels": [],
+        "compLabels": [],
+        "compAttrs": [],
+        "compLocs": [],
+        "networkID": name,
+        "terminals": terminals,
+        "params": params,
+        "terminalNets": {},
+    }
+
+
 class netlistParser:
-    "A netlist parser to read spi files generated by SiEPIC tools"
+    """
+    A netlist parser to read spi files generated by SiEPIC tools
 
-    def __init__(self, mainfile_path: PosixPath) -> None:
+    Parsed netlists are cached on disk, in the user-level cache directory,\
+        with the merge schedules of their circuits. The cache entries are keyed\
+        by the content of the netlist and are rebuilt when the versions of\
+        the libraries it uses change.
+
+    Args:
+        mainfile_path: Path to the netlist file.
+        cache: Whether to read and write the cache of parsed netlists.
+    """
+
+    def __init__(self, mainfile_path: PosixPath, cache: bool = True) -> None:
         self.circuitComponents = []
         self.circuitConnections = []
         self.mainfile_path = mainfile_path
+        self.cache = cache
 
     def readfile(self) -> Dict[str, Any]:
-        filepath = self.mainfile_path
-        circuitID = ""
-        inp = ""
-        out = ""
-        inp_net = 0
-        out_net = []
-
-        circuitLabels = []
-        circuitModels = []
-        circuitConns = []
-        circuitNets = []
-        componentLibs = []
-        componentAttrs = []
-        component_locations = []
-
-        temp_file = open(filepath, "r")
-        temp_lines = temp_file.readlines()
+        """
+        Parses the netlist, or loads it from the cache.
+
+        The netlist is parsed without the cache if the cache directory is\
+            not usable.
+
+        Returns:
+            The circuit data, see `parse`. Cached circuit data also holds the\
+                merge schedule of each circuit.
+        """
+        if not self.cache:
+            return self.parse()
+
+        try:
+            cache_path = (
+                cache_dir("netlists") / f"{file_digest(self.mainfile_path)}.pkl"
+            )
+        except OSError:
+            # the cache directory is not usable, parse the netlist instead
+            return self.parse()
+        entry = _read_netlist_cache(cache_path)
+        if entry is not None and entry["libraries"] == _library_versions(
+            entry["circuitData"]
+        ):
+            return entry["circuitData"]
+
+        circuitData = self.parse()
+        for each in [circuitData, *circuitData["subcircuits"].values()]:
+            each["schedule"] = _merge_schedule(each)
+        entry = {
+            "format": _NETLIST_CACHE_FORMAT,
+            "libraries": _library_versions(circuitData),
+            "circuitData": circuitData,
+        }
+        try:
+            atomic_write(
+                cache_path,
+                lambda fid: pickle.dump(entry, fid, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+        except OSError:
+            pass  # the netlist is parsed again next time
+        return circuitData
+
+    def parse(self) -> Dict[str, Any]:
+        """
+        Parses the netlist in a single streaming pass. Components with the\
+            same attributes share the same attribute dictionary.
+
+        The main circuit is the last .subckt definition that no other\
+            definition instantiates. The other definitions are kept as\
+            sub-circuits, instantiated by the components that have no\
+            library and whose model is the sub-circuit name.
+
+        Returns:
+            The circuit data: the nets, library, model, label, attributes,\
+                and layout location of each component, the connection nets,\
+                the circuit ID, the input and output nets, the analysis\
+                parameters, and the sub-circuit definitions with the nets of\
+                their ports and their default parameters.
+        """
+        circuits = {}
+        circuit = None
+        shared_attrs = {}
 
         free_node_idx = -1
 
         freq_data = []
-        seek_component = 0
-        seek_ona = 0
         orthogonal_ID = 0
 
-        # extract circuit connectivity
-        for each_line in temp_lines:
-            each_line = re.sub(" +", " ", each_line.strip())  # remove empty lines
-            if each_line.startswith("*"):
+        for statement in _netlist_lines(self.mainfile_path):
+            # names and nodes come before the first attribute
+            attr = _NETLIST_ATTR.search(statement)
+            start = attr.start() if attr else len(statement)
+            tokens = statement[:start].split()
+            if not tokens:
+                continue
+            keyword = tokens[0].lower()
+
+            if keyword == ".subckt":
+                circuit = _new_circuit(
+                    tokens[1], tokens[2:], dict(_NETLIST_ATTR.findall(statement, start))
+                )
+                circuits[tokens[1]] = circuit
+                terminals = set(tokens[2:])
+                free_node_idx = -1
+
+            elif keyword == ".ends":
+                circuit = None
+
+            elif keyword == ".ona":
+                # ONA related data
+                for key, value in _NETLIST_ATTR.findall(statement, start):
+                    if key == "orthogonal_identifier":
+                        orthogonal_ID = int(value)
+                    elif key in ("start", "stop"):
+                        freq_data.append(float(value))
+                    elif key == "number_of_points":
+                        freq_data.append(int(value))
+
+            elif keyword.startswith(".") or circuit is None or len(tokens) < 2:
+                # .param and other statements
                 continue
-            each_line = "".join(
-                [
-                    "".join(filter(None, each_section.split(" ")))
-                    if ('"' in each_section)
-                    else each_section
-                    for each_section in re.split(r"""("[^"]*"|'[^']*')""", each_line)
-                ]
-            )
-            temp_data = each_line.split(" ")
-
-            if len(temp_data) > 1:  # if line is not an empty one
-
-                MC_location = []
-
-                if temp_data[0] == ".subckt":
-                    circuitID = temp_data[1]
-                    inp = temp_data[2]
-                    out = [temp_data[x] for x in range(3, len(temp_data))]
-                    seek_component = 1
-
-                elif temp_data[0] == ".param":
-                    continue
-
-                elif temp_data[0] == ".ends":
-                    seek_component = 0
-
-                elif temp_data[0] == ".ona":
-                    seek_ona = 1
-
-                elif seek_ona == 1:
-                    # ONA related data
-                    if len(temp_data) < 3:
-                        temp_data = [0] + temp_data[-1].split("=")
-
-                    if temp_data[1] == "orthogonal_identifier":
-                        orthogonal_ID = int(temp_data[-1])
-
-                    elif temp_data[1] in ["start", "stop"]:
-                        freq_data.append(float(temp_data[-1]))
-
-                    elif temp_data[1] == "number_of_points":
-                        freq_data.append(int(temp_data[-1]))
-
-                elif seek_component == 1:
-                    # otherwise its component data
-                    circuitLabels.append(temp_data[0])
-                    temp_ports = []
-                    found_ports = 0
-                    found_library = 0
-                    for i in range(1, len(temp_data)):
-                        # if its an optical port
-                        if (
-                            "N$" in temp_data[i]
-                            and "N$None".lower() != temp_data[i].lower()
-                        ):
-                            temp_ports.append(int(temp_data[i].replace("N$", "")))
-                            found_ports = 1
-
-                        elif "N$None".lower() == temp_data[i].lower():
-                            temp_ports.append(free_node_idx)
-                            free_node_idx -= 1
-                            found_ports = 1
-
-                        elif inp == temp_data[i]:
-                            temp_ports.append(free_node_idx)
-                            inp_net = free_node_idx
-                            free_node_idx -= 1
-                            found_ports = 1
 
-                        elif out[0] == temp_data[i]:
-                            temp_ports.append(free_node_idx)
-                            out_net.append(free_node_idx)
+            else:
+                # otherwise its component data: label, optical ports, model
+                ports = []
+                for node in tokens[1:-1]:
+                    if node[:2] in ("N$", "n$"):
+                        if node[2:].lower() == "none":
+                            ports.append(free_node_idx)
                             free_node_idx -= 1
+                        else:
+                            ports.append(int(node[2:]))
+                    elif node in terminals:
+                        circuit["terminalNets"][node] = free_node_idx
+                        ports.append(free_node_idx)
+                        free_node_idx -= 1
+
+                # the library and the placement data are not component
+                # parameters, the layout location is kept for Monte Carlo runs
+                attrs = dict(_NETLIST_ATTR.findall(statement, start))
+                library = attrs.pop("library", None)
+                location = [
+                    fromSI(attrs.pop(key)) * 1e6
+                    for key in ("lay_x", "lay_y")
+                    if key in attrs
+                ]
+                for key in _PLACEMENT_ATTRS:
+                    attrs.pop(key, None)
+                attrs = shared_attrs.setdefault(tuple(attrs.items()), attrs)
+
+                # components without a library are sub-circuit instances
+                if library is not None:
+                    library = sys.intern(library.split("/")[-1].strip().lower())
+
+                circuit["compLabels"].append(tokens[0])
+                circuit["compModels"].append(sys.intern(tokens[-1]))
+                circuit["compLibs"].append(library)
+                circuit["compAttrs"].append(attrs)
+                circuit["circuitNets"].append(ports)
+                if location:
+                    circuit["compLocs"].append(location)
+
+        instantiated = set()
+        for each in circuits.values():
+            for label, lib, model in zip(
+                each["compLabels"], each["compLibs"], each["compModels"]
+            ):
+                if lib is None:
+                    if model not in circuits:
+                        raise ValueError(f"Component {label} has no library.")
+                    instantiated.add(model)
+
+            # remove IOs from component connections' list
+            each["circuitConns"] = sorted(
+                {net for nets in each["circuitNets"] for net in nets if net >= 0}
+            )
 
-                            if len(out) > 1:
-                                out.pop(0)
-
-                            if len(out) == 0:
-                                found_ports = 1
-
-                        elif found_ports == 1:
-                            circuitModels.append(temp_data[i])
-                            temp_cls_atrr = {}  # deepcopy(lib[temp_data[i]].cls_attrs)
-                            found_ports = -1
-
-                        elif "lay" in temp_data[i] or "sch" in temp_data[i]:
-                            if "lay" in temp_data[i]:
-                                MC_location.append(
-                                    fromSI(temp_data[i].split("=")[-1]) * 1e6
-                                )
-
-                            # ignore layout and schematic position data for now.
-                            # adapt opics models to accept this data
-                            # they are component parameters
-                        elif "library" in temp_data[i]:
-                            # cprint(temp_data[i])
-                            temp_lib = (
-                                temp_data[i].replace('"', "").split("=")[1].split()
-                            )
-                            componentLibs.append(temp_lib[-1].split("/")[-1].lower())
-                            found_library = 1
-
-                        elif "=" in temp_data[i] and found_library == 1:
-                            # if its a components' attribute
-                            temp_attr = temp_data[i].split("=")
-                            # print(temp_attr[0])
-                            # if(temp_attr[0] in temp_cls_atrr):
-                            temp_cls_atrr[temp_attr[0]] = temp_attr[1].strip('"')
-
-                    componentAttrs.append(temp_cls_atrr)
-                    circuitNets.append(temp_ports)
-                    if bool(MC_location):
-                        component_locations.append(MC_location)
-
-        circuitConns = list(set(list(itertools.chain(*circuitNets))))
-        # remove IOs from component connections' list
-        circuitConns = [each for each in circuitConns if each >= 0]
+        main_ids = [each for each in circuits if each not in instantiated]
+        if main_ids:
+            main = circuits.pop(main_ids[-1])
+        elif circuits:
+            raise ValueError("The sub-circuits instantiate each other.")
+        else:
+            main = _new_circuit("", [None], {})
+
+        for each in circuits.values():
+            terminal_nets = each.pop("terminalNets")
+            missing = [t for t in each["terminals"] if t not in terminal_nets]
+            if missing:
+                raise ValueError(
+                    f"Ports {missing} of sub-circuit {each['networkID']} are "
+                    "not connected."
+                )
+            each["ports"] = [terminal_nets[t] for t in each["terminals"]]
+
+        # the first port of the main circuit is the input, the others outputs
+        terminal_nets = main["terminalNets"]
+        inp, outs = main["terminals"][0], main["terminals"][1:]
 
         # return all data
         return {
-            "circuitNets": circuitNets,
-            "circuitConns": circuitConns,
-            "compLibs": componentLibs,
-            "compModels": circuitModels,
-            "compLabels": circuitLabels,
-            "compAttrs": componentAttrs,
-            "compLocs": component_locations,
-            "networkID": circuitID,
-            "inp_net": inp_net,
-            "out_net": out_net,
+            "circuitNets": main["circuitNets"],
+            "circuitConns": main["circuitConns"],
+            "compLibs": main["compLibs"],
+            "compModels": main["compModels"],
+            "compLabels": main["compLabels"],
+            "compAttrs": main["compAttrs"],
+            "compLocs": main["compLocs"],
+            "networkID": main["networkID"],
+            "inp_net": terminal_nets.get(inp, 0),
+            "out_net": [terminal_nets[each] for each in outs if each in terminal_nets],
             "sim_params": freq_data,
             "OID": orthogonal_ID,
+            "subcircuits": circuits,
         }
@@ -0,0 +1,193 @@
+"""On-demand, cached, and decimated views of component s-parameters"""
+
+from typing import Callable, Dict, Tuple
+import numpy as np
+from numpy import ndarray
+
+
+def _abs_sq(s: ndarray) -> ndarray:
+    return np.square(s.real) + np.square(s.imag)
+
+
+def _log(s: ndarray) -> ndarray:
+    with np.errstate(divide="ignore"):
+        return 10 * np.log10(_abs_sq(s))
+
+
+# derived quantities of the s-parameters, {yscale: (function, unit)}
+QUANTITIES: Dict[str, Tuple[Callable[[ndarray], ndarray], str]] = {
+    "abs": (np.abs, "abs"),
+    "abs_sq": (_abs_sq, "abs_sq"),
+    "log": (_log, "dB"),
+    "phase": (np.angle, "rad"),
+}
+
+
+def _finite(y: ndarray) -> ndarray:
+    """Replaces non-finite values, e.g., -inf dB, by the finite extremes."""
+    finite = np.isfinite(y)
+    if finite.all() or not finite.any():
+        return y
+    low, high = y[finite].min(), y[finite].max()
+    return np.where(finite, y, np.where(y > 0, high, low))
+
+
+def minmax_indices(y: ndarray, max_points: int) -> ndarray:
+    """
+    Indices of a min-max decimation: the minimum and maximum of each of\
+        max_points / 2 buckets, and the end points. Every peak and dip of\
+        the data is kept.
+
+    Args:
+        y: Data.
+        max_points: Maximum number of points, e.g., the plot width in pixels.
+    """
+    n = y.size
+    if n <= max_points:
+        return np.arange(n)
+
+    y = _finite(y)
+    size = -(-n // max(1, (max_points - 2) // 2))
+    # fewer buckets if the last ones would be only padding
+    buckets = -(-n // size)
+    padded = buckets * size - n
+
+    low = np.concatenate([y, np.full(padded, np.inf)]).reshape(buckets, size)
+    high = np.concatenate([y, np.full(padded, -np.inf)]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    return np.unique(
+        np.concatenate(
+            [
+                [0, n - 1],
+                offsets + np.argmin(low, axis=1),
+                offsets + np.argmax(high, axis=1),
+            ]
+        )
+    )
+
+
+def lttb_indices(x: ndarray, y: ndarray, max_points: int) -> ndarray:
+    """
+    Indices of a largest-triangle-three-buckets decimation, which keeps the\
+        visual shape of the data, including its peaks.
+
+    Args:
+        x: X data, sorted.
+        y: Y data.
+        max_points: Maximum number of points, e.g., the plot width in pixels.
+    """
+    n = y.size
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    y = _finite(y)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for k in range(max_points - 2):
+        start, end = edges[k], edges[k + 1]
+        next_start = edges[k + 1]
+        next_end = edges[k + 2] if k + 2 < edges.size else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # area of the triangles formed with the previous point and the next average
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[k + 1] = a
+    return indices
+
+
+def decimate(
+    x: ndarray, y: ndarray, max_points: int, method: str = "minmax"
+) -> ndarray:
+    """
+    Indices of the points kept by a peak-preserving decimation.
+
+    Args:
+        x: X data, sorted.
+        y: Y data.
+        max_points: Maximum number of points.
+        method: "minmax" or "lttb".
+    """
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    if method == "lttb":
+        order = np.argsort(x, kind="stable")
+        return np.sort(order[lttb_indices(x[order], y[order], max_points)])
+    raise ValueError(f"Unknown decimation method {method!r}.")
+
+
+class SParameterView:
+    """
+    Derived quantities of the s-parameters of a component, computed only for\
+        the requested port pairs and cached until the s-parameters change.
+
+    Args:
+        component: The component.
+    """
+
+    def __init__(self, component) -> None:
+        self.component = component
+        self._s = None
+        self._cache = {}
+
+    def _check(self) -> ndarray:
+        s = self.component.s
+        if s is not self._s:
+            self._s = s
+            self._cache.clear()
+        return s
+
+    def xdata(self, xscale: str = "freq") -> Tuple[ndarray, str]:
+        """X data and label, frequency (Hz) or wavelength (um)."""
+        if xscale == "freq":
+            return self.component.f, "Frequency (Hz)"
+        return self.component.lambda_, "Wavelength (um)"
+
+    def __call__(self, i: int, j: int, yscale: str = "log") -> ndarray:
+        """
+        A derived quantity of S[:, i, j].
+
+        Args:
+            i: Output port.
+            j: Input port.
+            yscale: "log" (dB), "abs", "abs_sq", or "phase".
+        """
+        s = self._check()
+        key = (yscale, i, j)
+        if key not in self._cache:
+            if yscale not in QUANTITIES:
+                raise ValueError(
+                    f"Unknown scale {yscale!r}, expected {list(QUANTITIES)}."
+                )
+            data = QUANTITIES[yscale][0](s[:, i, j])
+            data.setflags(write=False)
+            self._cache[key] = data
+        return self._cache[key]
+
+    def decimated(
+        self,
+        i: int,
+        j: int,
+        yscale: str = "log",
+        xscale: str = "freq",
+        max_points: int = 2000,
+        method: str = "minmax",
+    ) -> Tuple[ndarray, ndarray]:
+        """
+        Decimated x and y data of a derived quantity of S[:, i, j], e.g., for\
+            a plot that is max_points pixels wide.
+        """
+        y = self(i, j, yscale)
+        key = ("decimated", yscale, xscale, i, j, max_points, method)
+        if key not in self._cache:
+            x, _ = self.xdata(xscale)
+            idx = decimate(x, y, max_points, method)
+            self._cache[key] = (x[idx], y[idx])
+        return self._cache[key]
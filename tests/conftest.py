@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+
+def _write_lut(filepath, entries):
+    """Writes a look-up-table of (parameters, sparam file name) entries."""
+    associations = "".join(
+        "<association><design>"
+        + "".join(f'<value name="{k}" type="double">{v}</value>' for k, v in params)
+        + f'</design><extracted><value name="sparam" type="string">{sparam}</value>'
+        + "</extracted></association>"
+        for params, sparam in entries
+    )
+    filepath.write_text(f"<lookup_table>{associations}</lookup_table>")
+
+
+def _write_sparam(filepath, nports=2, npoints=4):
+    """Writes a format B sparam file with S[:, m, n] = m + nports * n."""
+    f = np.linspace(190e12, 200e12, npoints)
+    with open(filepath, "w") as fid:
+        for n in range(nports):
+            for m in range(nports):
+                fid.write(f"('port {m+1}','TE',1,'port {n+1}',1,'transmission')\n")
+                fid.write(f"({f.size},3)\n")
+                magnitude = np.full(f.size, m + nports * n)
+                np.savetxt(fid, np.array([f, magnitude, np.zeros(f.size)]).T)
+    return f
+
+
+@pytest.fixture
+def write_lut():
+    return _write_lut
+
+
+@pytest.fixture
+def write_sparam():
+    return _write_sparam
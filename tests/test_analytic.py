@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from opics.analytic import (
+    AnalyticComponentModel,
+    IdealCoupler,
+    IdealWaveguide,
+    PhaseShifter,
+)
+from opics.cache import analytic_cache
+from opics.network import Network
+
+f = np.linspace(190e12, 200e12, 7)
+
+
+def test_batched_evaluation() -> None:
+    analytic_cache.clear()
+    lengths = np.array([[10e-6], [20e-6]])
+    s = IdealWaveguide.evaluate(f, length=lengths, loss=[0.0, 300.0])
+    assert s.shape == (2, 2, f.size, 2, 2)
+
+    # every batch entry matches the component instance with the same parameters
+    wg = IdealWaveguide(f=f, length=20e-6, loss=300.0)
+    np.testing.assert_allclose(s[1, 1], wg.s)
+    assert np.all(s[..., 0, 0] == 0)
+
+    # repeated evaluations are cached
+    assert IdealWaveguide.evaluate(f, length=lengths, loss=[0.0, 300.0]) is s
+    assert IdealWaveguide(f=f.copy(), length=20e-6, loss=300.0).s is wg.s
+
+    with pytest.raises(ValueError):
+        IdealWaveguide(f=f, width=1.0)
+    with pytest.raises(ValueError):
+        IdealWaveguide(f=f, length=lengths)
+
+
+def test_s_model_is_abstract() -> None:
+    class Incomplete(AnalyticComponentModel):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(f)
+
+
+def test_mach_zehnder() -> None:
+    circuit = Network(f=f)
+    dc1 = circuit.add_component(IdealCoupler, params={"f": f})
+    dc2 = circuit.add_component(IdealCoupler, params={"f": f})
+    arm1 = circuit.add_component(PhaseShifter, params={"f": f, "phase": np.pi})
+    arm2 = circuit.add_component(PhaseShifter, params={"f": f})
+    circuit.connect(dc1, 2, arm1, 0)
+    circuit.connect(dc1, 3, arm2, 0)
+    circuit.connect(arm1, 1, dc2, 0)
+    circuit.connect(arm2, 1, dc2, 1)
+    s = circuit.simulate_network().s
+
+    # a pi phase difference between the arms sends the input to the bar port
+    nets = list(circuit.global_netlist.values())[-1]
+    power = np.abs(s) ** 2
+    np.testing.assert_allclose(power.sum(axis=1), 1)
+    np.testing.assert_allclose(power[:, nets.index(-7), nets.index(-1)], 1)
+
+
+def test_parameter_gradients() -> None:
+    length, loss = 20e-6, 300.0
+    derivatives = IdealWaveguide.derivatives(f, length=length, loss=loss)
+    t = IdealWaveguide(f=f, length=length, loss=loss).s[:, 1, 0]
+    np.testing.assert_allclose(
+        derivatives["loss"][:, 1, 0], -np.log(10) / 20 * length * t, rtol=1e-6
+    )
+    assert derivatives["length"].shape == (f.size, 2, 2)
+
+    def mach_zehnder(phase):
+        circuit = Network(f=f)
+        dc1 = circuit.add_component(IdealCoupler, params={"f": f})
+        dc2 = circuit.add_component(IdealCoupler, params={"f": f})
+        arm1 = circuit.add_component(
+            PhaseShifter, params={"f": f, "phase": phase}, component_id="arm1"
+        )
+        arm2 = circuit.add_component(PhaseShifter, params={"f": f})
+        circuit.connect(dc1, 2, arm1, 0)
+        circuit.connect(dc1, 3, arm2, 0)
+        circuit.connect(arm1, 1, dc2, 0)
+        circuit.connect(arm2, 1, dc2, 1)
+        return circuit, circuit.simulate_network(record=True).s
+
+    # gradient of the cross port power, sin(phase / 2) ** 2
+    circuit, s = mach_zehnder(0.3)
+    nets = list(circuit.global_netlist.values())[-1]
+    out, inp = nets.index(-7), nets.index(-1)
+    grad = np.zeros_like(s)
+    grad[:, out, inp] = 2 * s[:, out, inp]
+    gradients = circuit.parameter_gradients(grad)
+    np.testing.assert_allclose(np.abs(s[:, out, inp]) ** 2, np.sin(0.15) ** 2)
+    np.testing.assert_allclose(
+        gradients["arm1"]["phase"], f.size * np.sin(0.3) / 2, rtol=1e-6
+    )
+    assert gradients["arm1"]["insertion_loss"] < 0
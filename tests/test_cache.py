@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from opics.cache import LRUCache, interpolation_cache
+from opics.components import componentModel
+
+
+def test_lru_cache_eviction() -> None:
+    cache = LRUCache(max_bytes=3 * 800)
+    for key in "abc":
+        cache.put(key, np.zeros(100))
+    cache.get("a")
+    cache.put("d", np.zeros(100))
+
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.nbytes == 3 * 800
+    assert not cache.get("a").flags.writeable
+
+
+def load(folder, filename, f):
+    component = componentModel(f=f)
+    component.s = component.load_sparameters(folder, filename)
+    return component.s
+
+
+def test_interpolation_cache(tmp_path) -> None:
+    source_f = np.linspace(180e12, 210e12, 50)
+    source_s = np.exp(1j * source_f[:, None, None] / 1e13) * np.ones((1, 2, 2))
+    np.savez(tmp_path / "data.npz", f=source_f, s=source_s)
+
+    interpolation_cache.clear()
+    f = np.linspace(190e12, 200e12, 20)
+    first = load(tmp_path, "data.npz", f)
+    second = load(tmp_path, "data.npz", f.copy())
+
+    assert second is first
+    assert interpolation_cache.hits == 1
+
+    # the shared data is read-only, a component modifies a copy of it
+    with pytest.raises(ValueError):
+        first[0, 0, 0] = 0
+    component = componentModel(f=f)
+    component.s = component.load_sparameters(tmp_path, "data.npz").copy()
+    component.s[0, 0, 0] = 0
+    assert first[0, 0, 0] != 0
+    np.testing.assert_allclose(
+        first, np.exp(1j * f / 1e13)[:, None, None] * np.ones((1, 2, 2)), rtol=1e-6
+    )
+
+    # the data is used as is on its own frequency grid
+    native = load(tmp_path, "data.npz", source_f)
+    np.testing.assert_array_equal(native, source_s)
+
+
+def test_lru_cache_oversized_value() -> None:
+    value = np.zeros(100)
+    assert LRUCache(max_bytes=10).put("a", value) is value
+    assert value.flags.writeable
+
+
+def test_interpolation_cache_lut_data_file(
+    tmp_path, monkeypatch, write_lut, write_sparam
+) -> None:
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "cache"))
+    f = write_sparam(tmp_path / "b.sparam")
+    write_lut(tmp_path / "lut.xml", [([("gap", "1e-07")], "b.sparam")])
+
+    def load_lut():
+        component = componentModel(f=f, nports=2, sparam_attr="sparam", gap=1e-07)
+        return component.load_sparameters(tmp_path, "lut.xml")
+
+    np.testing.assert_array_equal(load_lut()[0].real, [[0, 2], [1, 3]])
+
+    # the data file behind the unchanged look-up-table is edited
+    columns = [f] + [np.full(f.size, 5.0), np.zeros(f.size)] * 4
+    np.savetxt(tmp_path / "b.sparam", np.column_stack(columns))
+    np.testing.assert_array_equal(load_lut()[0].real, np.full((2, 2), 5.0))
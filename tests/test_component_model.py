@@ -0,0 +1,45 @@
+import copy
+import pickle
+import numpy as np
+import pytest
+from opics.components import componentModel, PortReferences
+
+f = np.linspace(190e12, 200e12, 5)
+
+
+def test_compact_components() -> None:
+    a, b = componentModel(f=f), componentModel(f=f, nports=3)
+
+    # slotted, with wavelengths shared per frequency grid and unique ids
+    assert not hasattr(a, "__dict__")
+    assert a.lambda_ is b.lambda_
+    np.testing.assert_allclose(a.lambda_, a.C * 1e6 / f)
+    # models can still assign their own wavelengths
+    a.lambda_ = a.lambda_ * 2
+    np.testing.assert_allclose(a.lambda_, a.C * 2e6 / f)
+    assert b.lambda_ is not a.lambda_
+    a.lambda_ = None
+    assert a.lambda_ is b.lambda_
+    assert a.component_id != b.component_id
+
+    b.set_port_reference(1, "out")
+    assert dict(b.port_references) == {0: 0, 1: "out", 2: 2, "out": 1}
+    assert b.port_references["out"] == 1
+    assert dict(a.port_references) == {0: 0, 1: 1}
+    with pytest.raises(KeyError):
+        a.port_references[2]
+
+    for clone in (copy.copy(b), pickle.loads(pickle.dumps(b))):
+        assert clone.component_id == b.component_id
+        assert clone.port_references["out"] == 1
+
+    # clones name their ports independently of the prototype
+    clone = b.clone()
+    clone.set_port_reference(2, "drop")
+    assert clone.port_references["out"] == 1 and clone.port_references[2] == "drop"
+    assert b.port_references[2] == 2 and "drop" not in b.port_references
+
+    # port references can still be assigned as a dictionary
+    a.port_references = {0: "in", "in": 0, 1: 1}
+    assert isinstance(a.port_references, PortReferences)
+    assert a.port_references[0] == "in"
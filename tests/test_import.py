@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+import pytest
+import opics
+
+# time to import opics and its network solver, in a fresh interpreter
+IMPORT_BUDGET = 0.5
+
+_script = """
+import sys, time, json
+import numpy
+start = time.perf_counter()
+import opics
+opics.Network
+elapsed = time.perf_counter() - start
+heavy = ["matplotlib", "scipy", "yaml", "defusedxml", "holoviews", "pandas"]
+json.dump(
+    {"elapsed": elapsed, "imported": [m for m in heavy if m in sys.modules]},
+    sys.stderr,
+)
+"""
+
+
+def test_import_opics() -> None:
+    catalogue = Path(opics.__file__).parent / "libraries" / "catalogue.yaml"
+    existed = catalogue.exists()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(Path(opics.__file__).parents[1]), env.get("PYTHONPATH", "")]
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", _script],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    measured = json.loads(result.stderr)
+
+    # no output, no heavy dependencies, and no catalogue written
+    assert result.stdout == ""
+    assert measured["imported"] == []
+    assert catalogue.exists() == existed
+    assert measured["elapsed"] < IMPORT_BUDGET
+
+
+def test_lazy_attributes() -> None:
+    assert opics.C == 299792458
+    assert "Network" in dir(opics)
+    assert opics.libraries.library_catalogue["ebeam"]["name"] == "ebeam"
+    assert opics.libraries.pack.LibraryPack is not None
+    with pytest.raises(AttributeError):
+        opics.missing_module
+    with pytest.raises(AttributeError):
+        opics.libraries.missing_library
@@ -0,0 +1,191 @@
+import pickle
+import numpy as np
+import pytest
+import scipy.sparse.linalg
+from opics.components import componentModel
+from opics.network import Network
+from opics.sparam_ops import SparseSystem
+
+f = np.linspace(190e12, 200e12, 5)
+
+
+def random_component(nports, seed):
+    rng = np.random.default_rng(seed)
+    s = rng.normal(size=(f.size, nports, nports)) + 1j * rng.normal(
+        size=(f.size, nports, nports)
+    )
+    # scale the s-matrices to make the components passive
+    s /= 2 * np.linalg.norm(s, ord=2, axis=(1, 2), keepdims=True)
+    return componentModel(f=f, s=s, nports=nports)
+
+
+def ring_network(solver):
+    """Three four-port couplers in a chain, with a feedback loop on each."""
+    circuit = Network(network_id="rings", f=f, solver=solver)
+    for i in range(3):
+        circuit.add_component(random_component(4, i))
+        circuit.add_component(random_component(2, 10 + i))
+    ids = list(circuit.current_components.keys())
+    for i in range(3):
+        dc, wg = ids[2 * i], ids[2 * i + 1]
+        circuit.connect(dc, 1, wg, 0)
+        circuit.connect(wg, 1, dc, 3)
+        if i:
+            circuit.connect(ids[2 * i - 2], 2, dc, 0)
+    return circuit
+
+
+def solve(solver):
+    circuit = ring_network(solver)
+    result = circuit.simulate_network()
+    nets = list(circuit.global_netlist.values())[-1]
+    return result.s, nets
+
+
+def test_sparse_solver_matches_pairwise() -> None:
+    s_pairwise, nets_pairwise = solve("pairwise")
+    s_sparse, nets_sparse = solve("sparse")
+
+    assert sorted(nets_pairwise) == sorted(nets_sparse)
+    order = [nets_sparse.index(each) for each in nets_pairwise]
+    np.testing.assert_allclose(s_sparse[:, order][:, :, order], s_pairwise, atol=1e-12)
+
+
+def test_unknown_solver() -> None:
+    with pytest.raises(ValueError):
+        Network(solver="dense")
+
+
+def test_solve_excitation() -> None:
+    circuit = ring_network("sparse")
+    ids = list(circuit.current_components.keys())
+    response = circuit.solve_excitation({(ids[0], 0): 1.0, (ids[-2], 2): 0.5j})
+
+    # waves leaving the first coupler are "forward" on its connection nets
+    coupler, coupler_nets = (
+        circuit.current_components[ids[0]],
+        circuit.global_netlist[ids[0]],
+    )
+    a_in = np.array(
+        [np.ones(f.size)]
+        + [response["nets"][net]["backward"] for net in coupler_nets[1:]]
+    ).T
+    b_out = np.einsum("fij,fj->fi", coupler.s, a_in)
+    for port, net in enumerate(coupler_nets[1:], start=1):
+        np.testing.assert_allclose(
+            response["nets"][net]["forward"], b_out[:, port], atol=1e-12
+        )
+
+    s, nets = solve("sparse")
+    a = np.zeros(len(nets), dtype=complex)
+    a[nets.index(-1)] = 1.0
+    a[nets.index(-15)] = 0.5j
+    b = s @ a
+
+    for net, amplitude in response["outputs"].items():
+        np.testing.assert_allclose(amplitude, b[:, nets.index(net)], atol=1e-12)
+    assert len(response["nets"]) == 8
+
+
+class NpzComponent(componentModel):
+    def __init__(self, f, data_folder, filename, nports):
+        super().__init__(f=f, nports=nports)
+        self.s = self.load_sparameters(data_folder, filename)
+
+
+def test_lazy_sparameters(tmp_path) -> None:
+    blocks = [random_component(4, 0).s, random_component(2, 1).s]
+    for i, s in enumerate(blocks):
+        np.savez(tmp_path / f"{i}.npz", f=f, s=s)
+
+    circuit = Network(f=f)
+    coupler = circuit.add_component(NpzComponent(f, tmp_path, "0.npz", 4))
+    wg = circuit.add_component(NpzComponent(f, tmp_path, "1.npz", 2))
+    unused = NpzComponent(f, tmp_path, "missing.npz", 2)
+    circuit.connect(coupler, 1, wg, 0)
+    circuit.connect(wg, 1, coupler, 3)
+
+    # the netlist is planned without loading any data
+    assert len(circuit.merge_schedule()) == 2
+    assert not coupler.is_materialized and not wg.is_materialized
+
+    result = circuit.simulate_network()
+    assert coupler.is_materialized and wg.is_materialized
+    assert not unused.is_materialized
+
+    eager = Network(f=f)
+    ids = [
+        eager.add_component(componentModel(f=f, s=s, nports=s.shape[-1])).component_id
+        for s in blocks
+    ]
+    eager.connect(ids[0], 1, ids[1], 0)
+    eager.connect(ids[1], 1, ids[0], 3)
+    np.testing.assert_array_equal(result.s, eager.simulate_network().s)
+
+    # deferred s-parameters behave like arrays, and pickle as a recipe
+    deferred = NpzComponent(f, tmp_path, "1.npz", 2)
+    assert pickle.loads(pickle.dumps(deferred)).s.shape == (f.size, 2, 2)
+    assert not deferred.is_materialized
+    np.testing.assert_array_equal(np.abs(deferred._s), np.abs(blocks[1]))
+
+
+def test_sparameter_gradients() -> None:
+    weights = random_component(2, 20).s
+
+    def loss(perturb=None):
+        circuit = ring_network("pairwise")
+        if perturb is not None:
+            position, index, step = perturb
+            component = list(circuit.current_components.values())[position]
+            component.s = component.s.copy()
+            component.s[index] += step
+        s = circuit.simulate_network(record=True).s
+        return np.sum((weights.conj() * s).real), circuit
+
+    _, circuit = loss()
+    grads = circuit.sparameter_gradients(weights)
+    ids = list(circuit.tape["components"])
+    assert sorted(grads) == sorted(ids)
+
+    # the gradients match central differences of the loss
+    step = 1e-7
+    for position, index in ((0, (1, 0, 2)), (3, (2, 1, 0))):
+        for unit, part in ((1, np.real), (1j, np.imag)):
+            forward = loss((position, index, unit * step))[0]
+            backward = loss((position, index, -unit * step))[0]
+            np.testing.assert_allclose(
+                (forward - backward) / (2 * step),
+                part(grads[ids[position]][index]),
+                rtol=1e-5,
+            )
+
+    with pytest.raises(ValueError):
+        ring_network("sparse").simulate_network(record=True)
+    with pytest.raises(RuntimeError):
+        ring_network("pairwise").sparameter_gradients(weights)
+
+
+def test_sparse_system_reused_ordering(monkeypatch) -> None:
+    rng = np.random.default_rng(0)
+    blocks = [random_component(4, seed).s for seed in range(100)]
+    connections = rng.permutation(4 * len(blocks))[:-8].reshape(-1, 2)
+    system = SparseSystem(blocks, connections)
+
+    factors = []
+    splu = scipy.sparse.linalg.splu
+    monkeypatch.setattr(
+        scipy.sparse.linalg,
+        "splu",
+        lambda *a, **k: factors.append(splu(*a, **k)) or factors[-1],
+    )
+    system.factorize(0)
+    solve = system.factorize(1)
+
+    # the reused ordering is the one COLAMD computes, with the same fill-in
+    M = system.system_matrix(1)
+    fresh = splu(M, permc_spec="COLAMD")
+    assert factors[-1].L.nnz + factors[-1].U.nnz == fresh.L.nnz + fresh.U.nnz
+
+    b = rng.normal(size=system.nI) + 0j
+    np.testing.assert_allclose(M @ solve(b), b, atol=1e-10)
+    np.testing.assert_allclose(M.T @ solve(b, trans="T"), b, atol=1e-10)
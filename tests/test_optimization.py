@@ -0,0 +1,236 @@
+import numpy as np
+import pytest
+from opics.analytic import IdealWaveguide, PhaseShifter
+from opics.network import Network
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from opics.optimization import (
+    AsyncPSO,
+    DifferentialEvolution,
+    EvaluationCache,
+    HistoryLog,
+    LBFGSB,
+    Optimizer,
+    Swarm,
+    SwarmParticle,
+)
+
+bounds = ((-5.0, 5.0), (-2.0, 8.0))
+
+
+def sphere(pos):
+    return np.sum((pos - [1.0, 3.0]) ** 2, axis=-1)
+
+
+def particle_sphere(p):
+    return sphere(p.pos)
+
+
+def test_swarm() -> None:
+    swarm = Swarm(30, 2, bounds, seed=0, tolerance=-1)
+    swarm.optimize(sphere, 100, 80, batch=True)
+
+    assert swarm.gbest < 1e-8
+    np.testing.assert_allclose(swarm.gbestpos, [1.0, 3.0], atol=1e-4)
+    assert np.all(swarm.pos >= swarm.pos_min) and np.all(swarm.pos <= swarm.pos_max)
+    assert np.all(np.diff(swarm.log_fitness) <= 0)
+    assert swarm.log_all_particles[0].shape == (30, 2, 2)
+    assert swarm.pool[3].pos is not None
+    np.testing.assert_array_equal(swarm.pool[3].pbestpos, swarm.pbestpos[3])
+
+    # particles evaluated one at a time follow the same trajectory
+    serial = Swarm(30, 2, bounds, seed=0, tolerance=-1)
+    serial.optimize(lambda p: sphere(p.pos), 100, 80)
+    np.testing.assert_array_equal(serial.log_fitness, swarm.log_fitness)
+
+    with pytest.raises(ValueError):
+        Swarm(30, 2, (-5.0, 5.0))
+    with pytest.raises(ValueError):
+        Swarm(30, 2, bounds).optimize(lambda pos: sphere(pos)[:-1], 1, 1, batch=True)
+
+
+def test_swarm_batched_simulation() -> None:
+    f = np.linspace(190e12, 200e12, 21)
+    target = IdealWaveguide(f=f, length=10.03e-6, loss=300.0).s[:, 1, 0]
+
+    def fitness(pos):
+        # a single simulation of the waveguides of all the particles
+        s = IdealWaveguide.evaluate(f, length=pos[:, 0] * 1e-6, loss=pos[:, 1])
+        return np.sum(np.abs(s[..., 1, 0] - target) ** 2, axis=-1)
+
+    swarm = Swarm(20, 2, ((9.9, 10.1), (0.0, 1000.0)), seed=1, tolerance=-1)
+    swarm.optimize(fitness, 100, 60, batch=True)
+    np.testing.assert_allclose(swarm.gbestpos, [10.03, 300.0], rtol=1e-2)
+
+
+def test_ask_tell() -> None:
+    swarm = Swarm(10, 2, bounds, seed=0)
+    for _ in range(5):
+        positions = swarm.ask()
+        swarm.tell(positions, sphere(positions))
+    assert len(swarm.log_fitness) == 5
+    assert swarm.gbest == sphere(swarm.gbestpos)
+
+    # particles are sent to worker processes as standalone copies
+    with ProcessPoolExecutor(2) as executor:
+        swarm.optimize(particle_sphere, 100, 5, executor=executor)
+    assert len(swarm.log_fitness) == 10
+    with pytest.raises(ValueError):
+        swarm.ask(3)
+
+
+def test_async_pso() -> None:
+    swarm = AsyncPSO(20, 2, bounds, seed=0, tolerance=1e-8)
+    with ThreadPoolExecutor(4) as executor:
+        best = swarm.optimize(sphere, 1000, 100, executor=executor)
+
+    assert swarm.gbest <= 1e-8
+    np.testing.assert_allclose(best, [1.0, 3.0], atol=1e-3)
+    assert len(swarm._idle) == 20 and not swarm._pending
+    with pytest.raises(ValueError):
+        swarm.optimize(sphere, 1, 1, batch=True)
+
+
+def test_fitness_arguments() -> None:
+    received = []
+
+    def fitness(each):
+        received.append(type(each))
+        return sphere(each.pos if isinstance(each, SwarmParticle) else each)
+
+    Swarm(4, 2, bounds, seed=0).optimize(fitness, 10, 1)
+    AsyncPSO(4, 2, bounds, seed=0).optimize(fitness, 10, 1)
+    DifferentialEvolution(4, 2, bounds, seed=0).optimize(fitness, 10, 1)
+    assert received == [SwarmParticle] * 4 + [np.ndarray] * 8
+
+
+def test_differential_evolution() -> None:
+    de = DifferentialEvolution(20, 2, bounds, seed=0, tolerance=-1)
+    best = de.optimize(sphere, 100, 100, batch=True)
+
+    np.testing.assert_allclose(best, [1.0, 3.0], atol=1e-4)
+    assert np.all(np.diff(de.log_fitness) <= 0)
+    assert np.all(de.population >= de.pos_min) and np.all(de.population <= de.pos_max)
+    np.testing.assert_array_equal(de.fitness, sphere(de.population))
+    with pytest.raises(ValueError):
+        DifferentialEvolution(3, 2, bounds)
+
+
+def test_evaluation_cache(tmp_path) -> None:
+    evaluated = []
+
+    def fitness(pos):
+        evaluated.append(len(pos))
+        return sphere(pos)
+
+    # the particles pile up on the bounds, at the same clipped positions
+    narrow = ((2.0, 4.0), (4.0, 6.0))
+    cache = EvaluationCache(1e-6, path=tmp_path / "fitness.sqlite")
+    swarm = Swarm(10, 2, narrow, seed=0, tolerance=-1)
+    swarm.optimize(fitness, 100, 20, batch=True, cache=cache)
+    assert sum(evaluated) < 10 * 20
+    assert cache.hits + cache.misses == 10 * 20 and len(cache) == cache.misses
+    np.testing.assert_allclose(swarm.gbestpos, [2.0, 4.0])
+
+    cached, found = cache.lookup(swarm.pos + 1e-8)
+    assert found.all()
+    np.testing.assert_allclose(cached, sphere(swarm.pos), atol=1e-6)
+    cache.close()
+
+    # a repeated optimization reads the persisted values
+    evaluated.clear()
+    cache = EvaluationCache(1e-6, max_entries=4, path=tmp_path / "fitness.sqlite")
+    Swarm(10, 2, narrow, seed=0, tolerance=-1).optimize(
+        fitness, 100, 20, batch=True, cache=cache
+    )
+    assert not evaluated and len(cache) == 4
+    cache.close()
+
+    cache = EvaluationCache(1e-6)
+    AsyncPSO(10, 2, narrow, seed=0).optimize(sphere, 100, 20, cache=cache)
+    assert cache.hits > 0
+
+    # large-magnitude positions, e.g., frequencies in Hz, have distinct keys
+    cache = EvaluationCache()
+    cache.store([[1.90e14], [-1.90e14]], [1.0, 2.0])
+    assert not cache.lookup([[1.95e14], [-1.95e14]])[1].any()
+    fitness, found = cache.lookup([[1.90e14], [-1.90e14]])
+    assert found.all() and list(fitness) == [1.0, 2.0]
+    assert cache.keys([[-1e-12]]) == cache.keys([[0.0]])
+
+
+def test_lbfgsb_adjoint_gradients() -> None:
+    f = np.linspace(190e12, 200e12, 21)
+
+    def simulate(length, phase):
+        circuit = Network(f=f)
+        wg = circuit.add_component(
+            IdealWaveguide, params={"f": f, "length": length * 1e-6}, component_id="wg"
+        )
+        ps = circuit.add_component(
+            PhaseShifter, params={"f": f, "phase": phase}, component_id="ps"
+        )
+        circuit.connect(wg, 1, ps, 0)
+        return circuit, circuit.simulate_network(record=True).s
+
+    target = simulate(10.03, 1.0)[1]
+
+    def fitness(pos):
+        circuit, s = simulate(*pos)
+        gradients = circuit.parameter_gradients(2 * (s - target))
+        return np.sum(np.abs(s - target) ** 2), [
+            gradients["wg"]["length"] * 1e-6,
+            gradients["ps"]["phase"],
+        ]
+
+    optimizer = LBFGSB(((9.9, 10.1), (0.0, 2.0)), x0=(10.0, 0.5), tolerance=1e-10)
+    best = optimizer.optimize(fitness, 10, 100)
+    np.testing.assert_allclose(best, [10.03, 1.0], rtol=1e-4)
+    assert optimizer.gbest <= 1e-10 and optimizer.evaluations < 50
+    with pytest.raises(NotImplementedError, match="optimize"):
+        optimizer.ask()
+
+    # the ask/tell optimizers implement both
+    with pytest.raises(TypeError):
+        Optimizer(bounds)
+
+
+def test_history_log(tmp_path) -> None:
+    log = HistoryLog((2,), depth=3, path=tmp_path / "log.dat")
+    for i in range(5):
+        log.append([i, -i])
+    assert len(log) == 3 and log.count == 5
+    np.testing.assert_array_equal(log.array[:, 0], [2, 3, 4])
+    np.testing.assert_array_equal(log[-1], [4, -4])
+    # the file is written in buffered writes, until the log is flushed
+    log.flush()
+    np.testing.assert_array_equal(
+        HistoryLog.load(tmp_path / "log.dat")[:, 1], -np.arange(5)
+    )
+    with pytest.raises(ValueError):
+        log.append([1, 2, 3])
+    log.append([5, -5])
+    log.close()
+    log.close()
+    assert HistoryLog.load(tmp_path / "log.dat").shape == (6, 2)
+    with pytest.raises(ValueError):
+        log.append([6, -6])
+
+    # the swarm logs are preallocated arrays, and streamed to memory-mapped files
+    with Swarm(
+        10, 2, bounds, seed=0, log_depth=4, log_path=tmp_path / "swarm"
+    ) as swarm:
+        swarm.optimize(sphere, 100, 20, batch=True)
+    logs = swarm._logs()
+    assert len(logs) == 3 and all(each._file.closed for each in logs)
+    assert swarm.log_all_particles.array.shape == (4, 10, 2, 2)
+    logged = HistoryLog.load(tmp_path / "swarm" / "log_all_particles.dat")
+    assert logged.shape == (20, 10, 2, 2)
+    np.testing.assert_array_equal(logged[-4:], swarm.log_all_particles.array)
+    np.testing.assert_array_equal(
+        HistoryLog.load(tmp_path / "swarm" / "log_fitness.dat")[-1], swarm.gbest
+    )
+
+    unbounded = HistoryLog()
+    for i in range(100):
+        unbounded.append(i)
+    np.testing.assert_array_equal(unbounded, np.arange(100))
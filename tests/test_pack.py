@@ -0,0 +1,88 @@
+import os
+import numpy as np
+from opics.cache import interpolation_cache
+from opics.components import componentModel
+from opics.libraries.__main__ import main
+from opics.libraries.pack import build_pack, find_pack, LibraryPack
+from opics.utils import LUT_processor
+
+
+def test_library_pack(tmp_path, monkeypatch, write_lut, write_sparam) -> None:
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "cache"))
+    library = tmp_path / "library"
+    (library / "source").mkdir(parents=True)
+
+    write_sparam(library / "source" / "a.sparam", nports=3)
+    write_sparam(library / "source" / "b.sparam", nports=3, npoints=6)
+    write_lut(
+        library / "source" / "lut.xml",
+        [([("gap", "1e-07")], "a.sparam"), ([("gap", "2e-07")], "b.sparam")],
+    )
+    f = np.linspace(190e12, 200e12, 5)
+    np.savez(library / "source" / "c.npz", f=f, s=np.ones((5, 2, 2)))
+
+    expected, _ = LUT_processor(
+        library / "source", "lut.xml", [["gap", "2e-07"]], 3, "sparam"
+    )
+    pack_path = build_pack(library)
+    assert isinstance(find_pack(library / "source"), LibraryPack)
+    assert len(find_pack(library / "source")) == 3
+
+    # data is read from the memory-mapped pack
+    (f2, s2), key = LUT_processor(
+        library / "source", "lut.xml", [["gap", "2e-07"]], 3, "sparam"
+    )
+    assert not s2.flags.writeable
+    np.testing.assert_array_equal(f2, expected[0])
+    np.testing.assert_array_equal(s2, expected[1])
+
+    interpolation_cache.clear()
+    s3 = componentModel(f=f).load_sparameters(library / "source", "c.npz")
+    np.testing.assert_array_equal(s3, np.ones((5, 2, 2)))
+
+    # entries packed with another port count are read from their data file
+    (_, s5), key = LUT_processor(
+        library / "source", "lut.xml", [["gap", "2e-07"]], 2, "sparam"
+    )
+    assert not key.startswith("lut:") and s5.shape == (6, 2, 2)
+
+    # modified data files are not read from the pack
+    write_sparam(library / "source" / "a.sparam", nports=3, npoints=9)
+    (f4, _), key = LUT_processor(
+        library / "source", "lut.xml", [["gap", "1e-07"]], 3, "sparam"
+    )
+    assert not key.startswith("lut:") and f4.size == 9
+    (_, _), key = LUT_processor(
+        library / "source", "lut.xml", [["gap", "2e-07"]], 3, "sparam"
+    )
+    assert key.startswith("lut:")
+
+    # modified look-up-tables are not read from the pack
+    write_lut(library / "source" / "lut.xml", [([("gap", "2e-07")], "a.sparam")])
+    os.utime(library / "source" / "lut.xml", ns=(0, 0))
+    _, key = LUT_processor(
+        library / "source", "lut.xml", [["gap", "2e-07"]], 3, "sparam"
+    )
+    assert not key.startswith("lut:")
+    assert pack_path == library / "library.opicspack"
+
+
+def test_compile_library(tmp_path, monkeypatch, write_lut, write_sparam) -> None:
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "cache"))
+    library = tmp_path / "library"
+    library.mkdir()
+    entries = []
+    for i in range(4):
+        write_sparam(library / f"{i}.sparam", nports=2, npoints=4 + i)
+        entries.append(([("gap", f"{i}e-07")], f"{i}.sparam"))
+    write_lut(library / "lut.xml", entries)
+
+    assert main(["compile", str(library), "--processes", "2"]) == 0
+    assert len(find_pack(library)) == 4
+
+    # no text sparam file is read once the library is compiled
+    for i in range(4):
+        os.remove(library / f"{i}.sparam")
+    (f, s), key = LUT_processor(library, "lut.xml", [["gap", "3e-07"]], 2, "sparam")
+    assert key.startswith("lut:") and f.size == 7
+    np.testing.assert_array_equal(s[0].real, [[0, 2], [1, 3]])
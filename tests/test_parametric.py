@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from opics.parametric import ParametricModel
+
+
+def test_parametric_model(tmp_path, monkeypatch, write_lut) -> None:
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "cache"))
+    f = np.linspace(190e12, 200e12, 6)
+
+    # s-parameters linear in both parameters: s = gap + 10 * width
+    entries = []
+    for gap in (1, 2, 3, 4):
+        for width in (5, 6):
+            name = f"s_{gap}_{width}.npz"
+            s = np.full((f.size, 2, 2), gap + 10.0 * width, dtype=complex)
+            np.savez(tmp_path / name, f=f, s=s)
+            entries.append(([("gap", gap), ("width", width), ("mode", "TE")], name))
+    write_lut(tmp_path / "lut.xml", entries)
+
+    for method in ("linear", "spline"):
+        model = ParametricModel(tmp_path, "lut.xml", 2, f=f, method=method)
+        assert model.params == ["gap", "width"]
+        assert model.fixed == {"mode": "TE"}
+
+        gap = np.array([1.0, 1.5, 3.25])
+        s = model.evaluate(gap=gap, width=5.5)
+        assert s.shape == (3, f.size, 2, 2)
+        np.testing.assert_allclose(s[:, 0, 0, 0], gap + 55.0)
+
+    component = model.component(gap=2.5, width=6)
+    np.testing.assert_allclose(component.s, 62.5)
+
+    with pytest.raises(ValueError):
+        model.evaluate(gap=2.0)
@@ -1,17 +1,53 @@
+import types
+from concurrent.futures import ThreadPoolExecutor
 import pathlib
-from opics import libraries
+import numpy as np
+import pytest
+from opics import libraries, utils
+from opics.analytic import AnalyticComponentModel, IdealWaveguide, PhaseShifter
 from opics.network import Network
-from opics.utils import netlistParser, NetlistProcessor
+from opics.utils import netlistParser, NetlistProcessor, fromSI, _subcircuit_attrs
 from opics.globals import C as c_
 
 # warnings.filterwarnings('ignore') #ignore all/complex number warnings from numpy or scipy
 
+spice_filepath = pathlib.Path(__file__).absolute().parent / "test_read_netlist"
+spice_filepath = spice_filepath / "test_sample.spi"
 
-def test_read_netlist() -> None:
 
-    # read netlist
-    cwd = pathlib.Path(__file__).absolute().parent
-    spice_filepath = cwd / "test_read_netlist" / "test_sample.spi"
+class GC(PhaseShifter):
+    cls_attrs = {}
+
+
+class Y(AnalyticComponentModel):
+    num_ports = 3
+    cls_attrs = {}
+
+    @classmethod
+    def s_model(cls, f):
+        s = np.zeros(f.shape + (3, 3), dtype=np.complex128)
+        for i in (1, 2):
+            s[:, 0, i] = s[:, i, 0] = np.sqrt(0.5)
+        return s
+
+
+class Waveguide(IdealWaveguide):
+    cls_attrs = {"length": 10e-6}
+
+
+# a library of closed-form models standing in for the ebeam library
+test_libraries = types.ModuleType("test_libraries")
+test_libraries.ebeam = types.ModuleType("ebeam")
+test_libraries.ebeam.component_factory = {"GC": GC, "Y": Y, "Waveguide": Waveguide}
+
+
+@pytest.fixture(autouse=True)
+def netlist_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache" / "netlists"
+
+
+def test_read_netlist() -> None:
 
     # get netlist data
     circuitData = netlistParser(spice_filepath).readfile()
@@ -26,12 +62,213 @@ def test_read_netlist() -> None:
     subckt.simulate_network()
 
     # get input and output net labels
-    inp_idx = subckt.sim_result.nets[0].index(circuitData["inp_net"])
-    out_idx = [subckt.sim_result.nets[0].index(each) for each in circuitData["out_net"]]
+    nets = subckt.global_netlist[list(subckt.global_netlist)[-1]]
+    inp_idx = nets.index(circuitData["inp_net"])
+    out_idx = [nets.index(each) for each in circuitData["out_net"]]
 
     ports = [[each_output, inp_idx] for each_output in out_idx]
     assert len(ports) > 0
 
 
-if __name__ == "__main__":
-    test_read_netlist()
+def test_parse_netlist() -> None:
+    circuitData = netlistParser(spice_filepath).readfile()
+
+    assert circuitData["networkID"] == "test"
+    assert circuitData["compModels"] == ["GC", "Y", "Y", "GC", "Waveguide", "Waveguide"]
+    assert set(circuitData["compLibs"]) == {"ebeam"}
+    assert circuitData["circuitNets"][:2] == [[-1, 0], [0, 1, 2]]
+    assert circuitData["circuitConns"] == list(range(6))
+    assert (circuitData["inp_net"], circuitData["out_net"]) == (-1, [-2])
+    assert circuitData["sim_params"] == [1.53e-6, 1.58e-6, 2000]
+    assert circuitData["OID"] == 1
+    assert circuitData["compLocs"][0] == pytest.approx([-18.52, 2.02])
+
+    attrs = circuitData["compAttrs"]
+    assert attrs[4]["wg_length"] == "157.666u"
+    assert "lay_x" not in attrs[4] and "library" not in attrs[4]
+    # identical attributes are shared
+    assert attrs[0] is attrs[3]
+
+    assert fromSI(attrs[4]["wg_length"]) == 157.666e-6
+    assert fromSI("-18.52E-6") == -18.52e-6
+    assert fromSI(attrs[4]["points"]) == attrs[4]["points"]
+
+
+def test_netlist_processor() -> None:
+    circuitData = netlistParser(spice_filepath).readfile()
+    subckt = NetlistProcessor(
+        spice_filepath, Network, test_libraries, c_, circuitData, verbose=False
+    )
+
+    # identical components are clones of a single instance
+    components = subckt.current_components
+    assert list(components) == circuitData["compLabels"]
+    assert components["ebeam_gc_te1550_3"].s is components["ebeam_gc_te1550_0"].s
+    assert components["ebeam_y_1550_2"].component_id == "ebeam_y_1550_2"
+    assert components["ebeam_wg_integral_1550_5"].params["length"] == 317.206e-6
+
+    result = subckt.simulate_network()
+    nets = subckt.global_netlist[list(subckt.global_netlist)[-1]]
+    inp_idx = nets.index(circuitData["inp_net"])
+    out_idx = nets.index(circuitData["out_net"][0])
+
+    # lossless Mach-Zehnder interferometer
+    transmission = np.abs(result.s[:, out_idx, inp_idx]) ** 2
+    assert result.s.shape == (2000, 2, 2)
+    assert transmission.max() == pytest.approx(1, abs=1e-3)
+    assert transmission.min() == pytest.approx(0, abs=1e-3)
+
+
+def test_hierarchical_netlist() -> None:
+    filepath = spice_filepath.parent / "test_hierarchical.spi"
+    circuitData = netlistParser(filepath).readfile()
+
+    assert circuitData["networkID"] == "top"
+    assert circuitData["compLibs"][1:4] == [None] * 3
+    mzi = circuitData["subcircuits"]["mzi"]
+    assert mzi["terminals"] == ["a", "b"]
+    assert mzi["ports"] == [-1, -2]
+    assert mzi["params"] == {"arm": "317.206u"}
+
+    subckt = NetlistProcessor(
+        filepath, Network, test_libraries, c_, circuitData, verbose=False
+    )
+
+    # identical sub-circuit instances are simulated once, as a single component
+    components = subckt.current_components
+    assert components["mzi_1"].s is components["mzi_2"].s
+    assert components["mzi_1"].s is not components["mzi_3"].s
+    assert components["mzi_1"].s.shape == (2000, 2, 2)
+    assert components["mzi_1"].port_references["b"] == 1
+
+    result = subckt.simulate_network()
+    nets = subckt.global_netlist[list(subckt.global_netlist)[-1]]
+    inp_idx = nets.index(circuitData["inp_net"])
+    out_idx = nets.index(circuitData["out_net"][0])
+
+    # two unbalanced interferometers of the flat netlist in series, and a
+    # lossless balanced one
+    flat = netlistParser(spice_filepath).readfile()
+    flat_result = NetlistProcessor(
+        spice_filepath, Network, test_libraries, c_, flat, verbose=False
+    ).simulate_network()
+    np.testing.assert_allclose(
+        np.abs(result.s[:, out_idx, inp_idx]),
+        np.abs(flat_result.s[:, 1, 0]) ** 2,
+        atol=1e-12,
+    )
+
+
+def test_nested_subcircuits(tmp_path, monkeypatch) -> None:
+    netlist = (spice_filepath.parent / "test_hierarchical.spi").read_text()
+    # two stages of two interferometers each, the arm of the first one set by
+    # the stage parameter
+    stage = (
+        ".subckt stage a c arm=317.206u\n"
+        " mzi_1  a N$1 mzi arm={arm}\n"
+        " mzi_2  N$1 c mzi\n"
+        ".ends stage\n"
+    )
+    top = netlist[netlist.index(".subckt top") : netlist.index(".ends top")]
+    netlist = netlist.replace(top, stage + "\n" + top.replace(" mzi", " stage"))
+    filepath = tmp_path / "nested.spi"
+    filepath.write_text(netlist)
+    circuitData = netlistParser(filepath).readfile()
+    assert circuitData["compModels"][1:4] == ["stage"] * 3
+
+    solved = []
+    solve = utils._solve_subcircuit
+    monkeypatch.setattr(
+        utils,
+        "_solve_subcircuit",
+        lambda *args: solved.append(args[3]) or solve(*args),
+    )
+
+    # a single worker simulates the leaves first, none waits for another
+    monkeypatch.setattr(utils, "ThreadPoolExecutor", lambda: ThreadPoolExecutor(1))
+    subckt = NetlistProcessor(
+        filepath, Network, test_libraries, c_, circuitData, verbose=False
+    )
+    assert [model for model, _ in solved] == ["mzi"] * 3 + ["stage"] * 2
+    assert len(set(solved)) == len(solved)
+
+    components = subckt.current_components
+    assert components["stage_1"].s is components["stage_2"].s
+    assert subckt.simulate_network().s.shape == (2000, 2, 2)
+
+
+def test_subcircuit_attrs() -> None:
+    definition = {
+        "params": {"arm": "317.206u", "width": "0.5u"},
+        "compAttrs": [{"wg_length": "{arm}", "wg_width": "width", "x": "{arm}u"}],
+    }
+
+    # only the whole-value references to the parameters are substituted
+    assert _subcircuit_attrs(definition, {"arm": "157.666u"}) == [
+        {"wg_length": "157.666u", "wg_width": "width", "x": "{arm}u"}
+    ]
+    assert _subcircuit_attrs(definition, {})[0]["wg_length"] == "317.206u"
+
+
+def test_netlist_cache(tmp_path, netlist_cache, monkeypatch) -> None:
+    filepath = tmp_path / "test_hierarchical.spi"
+    filepath.write_text((spice_filepath.parent / filepath.name).read_text())
+
+    parsed = []
+    parse = netlistParser.parse
+    monkeypatch.setattr(
+        netlistParser, "parse", lambda self: parsed.append(1) or parse(self)
+    )
+
+    circuitData = netlistParser(filepath).readfile()
+    assert len(list(netlist_cache.glob("*.pkl"))) == 1
+    assert circuitData["schedule"] and circuitData["subcircuits"]["mzi"]["schedule"]
+
+    cached = netlistParser(filepath).readfile()
+    assert len(parsed) == 1
+    assert cached["schedule"] == circuitData["schedule"]
+    assert cached["compAttrs"][1] is cached["compAttrs"][2]
+
+    # the cached schedule is used by the network
+    subckt = NetlistProcessor(
+        filepath, Network, test_libraries, c_, cached, verbose=False
+    )
+    assert subckt.schedule == circuitData["schedule"]
+    result = subckt.simulate_network()
+    expected = NetlistProcessor(
+        filepath,
+        Network,
+        test_libraries,
+        c_,
+        netlistParser(filepath, cache=False).readfile(),
+        verbose=False,
+    ).simulate_network()
+    np.testing.assert_allclose(result.s, expected.s)
+
+    # a new library version or a modified netlist is parsed again
+    monkeypatch.setitem(libraries.library_catalogue, "ebeam", {"version": "0.0"})
+    netlistParser(filepath).readfile()
+    netlistParser(filepath).readfile()
+    assert len(parsed) == 3
+
+    filepath.write_text(filepath.read_text().replace("157.666u", "150u"))
+    mzi = netlistParser(filepath).readfile()["subcircuits"]["mzi"]
+    assert mzi["compAttrs"][1]["wg_length"] == "150u"
+    assert len(parsed) == 4
+    assert len(list(netlist_cache.glob("*.pkl"))) == 2
+
+    # unreadable entries are rebuilt
+    for each in netlist_cache.glob("*.pkl"):
+        each.write_bytes(b"corrupted")
+    netlistParser(filepath).readfile()
+    assert len(parsed) == 5
+
+
+def test_netlist_cache_unusable(tmp_path, monkeypatch) -> None:
+    # the cache directory cannot be created under a regular file
+    (tmp_path / "file").write_text("")
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "file" / "cache"))
+    circuitData = netlistParser(
+        spice_filepath.parent / "test_hierarchical.spi"
+    ).readfile()
+    assert circuitData["networkID"] == "top" and "schedule" not in circuitData
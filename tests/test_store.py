@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from opics.components import componentModel
+from opics.store import ResultStore
+
+f = np.linspace(190e12, 200e12, 5)
+
+
+def result(length):
+    s = np.full((f.size, 3, 3), length, dtype=complex)
+    s += np.arange(9).reshape(3, 3)
+    return componentModel(f=f, s=s, nports=3)
+
+
+def write_results(store, lengths):
+    with store:
+        for length in lengths:
+            store.append(result(length), {"length": length}, ["in", "out", "drop"])
+
+
+def test_result_store(tmp_path) -> None:
+    store = ResultStore(tmp_path / "sweep", chunk_bytes=1024)
+
+    # concurrent writers, each with its own chunk files
+    with ProcessPoolExecutor(2) as executor:
+        list(executor.map(write_results, [store] * 2, [[10, 20, 30], [40, 50, 60]]))
+    write_results(store, [70])
+
+    assert len(store) == 7
+    assert len(list((tmp_path / "sweep" / "chunks").iterdir())) > 3
+    assert sorted(r["params"]["length"] for r in store) == list(range(10, 80, 10))
+
+    (idx,) = store.select(length=40)
+    s = store.sparameters(idx)
+    assert not s.flags.writeable
+    np.testing.assert_array_equal(s, result(40).s)
+    np.testing.assert_array_equal(store.frequencies(idx), f)
+
+    # sliced reads of port pairs, by number or label, over a parameter subset
+    selected = store.select(lambda p: p["length"] >= 50)
+    data = store.stack(selected, ports=[(1, 0), ("drop", "in")])
+    assert data.shape == (3, f.size, 2)
+    np.testing.assert_array_equal(data[:, 0, 1].real, [56, 66, 76])
+
+    # a reopened store reads the same index
+    reopened = ResultStore(tmp_path / "sweep")
+    np.testing.assert_array_equal(reopened.component(idx).s, result(40).s)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from opics.components import componentModel
+from opics.touchstone import read_touchstone, write_touchstone
+from opics.utils import universal_sparam_filereader
+
+f = np.linspace(190e12, 200e12, 6)
+
+
+def random_s(nports, seed=0):
+    rng = np.random.default_rng(seed)
+    shape = (f.size, nports, nports)
+    return rng.uniform(0.1, 1, shape) * np.exp(1j * rng.uniform(-3, 3, shape))
+
+
+@pytest.mark.parametrize("nports", [1, 2, 3, 5])
+@pytest.mark.parametrize("version", [1, 2])
+@pytest.mark.parametrize("data_format", ["MA", "DB", "RI"])
+def test_touchstone_round_trip(tmp_path, nports, version, data_format) -> None:
+    s = random_s(nports)
+    filepath = tmp_path / f"data.s{nports}p"
+    write_touchstone(filepath, f, s, data_format=data_format, version=version)
+
+    f2, s2, options = read_touchstone(filepath)
+    assert options["version"] == version and options["nports"] == nports
+    np.testing.assert_allclose(f2, f, rtol=1e-12)
+    np.testing.assert_allclose(s2, s, rtol=1e-10)
+
+
+def test_touchstone_two_port_order(tmp_path) -> None:
+    filepath = tmp_path / "dut.s2p"
+    filepath.write_text(
+        "! two-port data is ordered S11 S21 S12 S22\n"
+        "# MHz S RI R 50\n"
+        "100 0.1 0 0.2 0 0.3 0 0.4 0\n"
+        "200 0.1 0 0.2 0 0.3 0 0.4 0 ! comment\n"
+        "! noise parameters\n"
+        "100 1.5 0.5 40 0.3\n"
+    )
+    f2, s2, _ = read_touchstone(filepath)
+    np.testing.assert_array_equal(f2, [100e6, 200e6])
+    np.testing.assert_array_equal(s2[0].real, [[0.1, 0.3], [0.2, 0.4]])
+
+
+def test_component_touchstone(tmp_path) -> None:
+    component = componentModel(f=f, s=random_s(4), nports=4)
+    component.write_touchstone(tmp_path / "circuit.s4p", data_format="DB")
+
+    loaded = componentModel.from_touchstone(tmp_path / "circuit.s4p")
+    assert loaded.nports == 4
+    np.testing.assert_allclose(loaded.s, component.s, rtol=1e-10)
+
+    interpolated = componentModel.from_touchstone(tmp_path / "circuit.s4p", f=f[1:4])
+    np.testing.assert_allclose(interpolated.s, component.s[1:4], rtol=1e-10)
+
+    # the lumerical export is read back in the same port order
+    component.write_sparameters(tmp_path, "circuit.sparam", f, component.s)
+    f2, s2 = universal_sparam_filereader(4, "circuit.sparam", tmp_path)
+    np.testing.assert_allclose(s2, component.s, rtol=1e-10)
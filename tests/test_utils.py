@@ -0,0 +1,104 @@
+import os
+import pathlib
+import numpy as np
+from opics.utils import (
+    LUT_index,
+    LUT_reader,
+    LUT_processor,
+    sparam_file_format,
+    universal_sparam_filereader,
+)
+
+
+def test_LUT_reader(tmp_path, write_lut) -> None:
+    write_lut(
+        tmp_path / "lut.xml",
+        [
+            ([("gap", "1e-07"), ("radius", "5e-06")], "a.sparam"),
+            ([("gap", "2e-07"), ("radius", "5e-06")], "b.sparam;b.npz"),
+        ],
+    )
+
+    sparam_file, _, _ = LUT_reader(
+        tmp_path, "lut.xml", [["radius", "5e-06"], ["gap", "2e-07"]]
+    )
+    assert sparam_file == ["b.sparam", "b.npz"]
+    assert LUT_reader(tmp_path, "lut.xml", [["gap", "1e-07"], ["radius", "5e-06"]])[
+        0
+    ] == ["a.sparam"]
+
+    # the parsed index is shared until the file changes
+    index = LUT_index(tmp_path, "lut.xml")[1]
+    assert LUT_index(tmp_path, "lut.xml")[1] is index
+
+    write_lut(
+        tmp_path / "lut.xml", [([("gap", "1e-07"), ("radius", "5e-06")], "c.sparam")]
+    )
+    os.utime(tmp_path / "lut.xml", ns=(0, 0))
+    assert LUT_reader(tmp_path, "lut.xml", [["gap", "1e-07"], ["radius", "5e-06"]])[
+        0
+    ] == ["c.sparam"]
+
+
+def test_LUT_processor_conversion_cache(
+    tmp_path, monkeypatch, write_lut, write_sparam
+) -> None:
+    monkeypatch.setenv("OPICS_CACHE_DIR", str(tmp_path / "cache"))
+    library = tmp_path / "library"
+    library.mkdir()
+
+    f = write_sparam(library / "b.sparam")
+    write_lut(library / "lut.xml", [([("gap", "1e-07")], "b.sparam")])
+    lut = (library / "lut.xml").read_text()
+
+    (f1, s1), npz_file = LUT_processor(
+        library, "lut.xml", [["gap", "1e-07"]], 2, "sparam"
+    )
+    np.testing.assert_array_equal(f1, f)
+    np.testing.assert_array_equal(s1[0].real, [[0, 2], [1, 3]])
+
+    # converted once into the cache directory, the library is left untouched
+    assert pathlib.Path(npz_file).parent == tmp_path / "cache" / "sparam"
+    assert (library / "lut.xml").read_text() == lut
+    assert sorted(os.listdir(library)) == ["b.sparam", "lut.xml"]
+
+    (_, s2), _ = LUT_processor(library, "lut.xml", [["gap", "1e-07"]], 2, "sparam")
+    np.testing.assert_array_equal(s2, s1)
+
+
+def test_sparam_file_formats(tmp_path, write_sparam) -> None:
+    f = np.linspace(190e12, 200e12, 5)
+    s = np.exp(1j * np.arange(f.size * 9).reshape(f.size, 3, 3) / 7.0)
+    s *= np.linspace(0.1, 0.9, 9).reshape(3, 3)
+
+    with open(tmp_path / "a.sparam", "w") as fid:
+        for i in range(3):
+            fid.write(f'["port {i+1}",""]\n')
+        for n in range(3):
+            for m in range(3):
+                fid.write(f'("port {m+1}","mode 1",1,"port {n+1}",1,"transmission")\n')
+                fid.write(f"({f.size}, 3)\n")
+                data = [f, np.abs(s[:, m, n]), np.angle(s[:, m, n])]
+                np.savetxt(fid, np.array(data).T, fmt="%.15e")
+
+    with open(tmp_path / "c.sparam", "w") as fid:
+        data = [f[::-1]]
+        for m, n in ((0, 0), (0, 1), (1, 0), (1, 1)):
+            data += [np.abs(s[::-1, m, n]), np.angle(s[::-1, m, n])]
+        np.savetxt(fid, np.array(data).T, fmt="%.15e")
+
+    write_sparam(tmp_path / "b.sparam", nports=3, npoints=f.size)
+
+    assert [sparam_file_format(tmp_path / f"{_}.sparam") for _ in "abc"] == list("ABC")
+
+    for format_type in ("A", "auto"):
+        f_a, s_a = universal_sparam_filereader(3, "a.sparam", tmp_path, format_type)
+        np.testing.assert_allclose(f_a, f)
+        np.testing.assert_allclose(s_a, s, rtol=1e-12)
+
+    _, s_b = universal_sparam_filereader(3, "b.sparam", tmp_path)
+    np.testing.assert_array_equal(s_b[0].real, [[0, 3, 6], [1, 4, 7], [2, 5, 8]])
+
+    f_c, s_c = universal_sparam_filereader(2, "c.sparam", tmp_path)
+    np.testing.assert_allclose(f_c, f)
+    np.testing.assert_allclose(s_c, s[:, :2, :2], rtol=1e-12)
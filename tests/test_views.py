@@ -0,0 +1,55 @@
+import matplotlib
+import numpy as np
+import pytest
+from opics.components import componentModel
+from opics.views import decimate
+
+matplotlib.use("Agg")
+
+f = np.linspace(190e12, 200e12, 50001)
+
+
+def resonator():
+    # a narrow resonance dip on the through port
+    detuning = (f - 195.3e12) / 2e9
+    s = np.zeros((f.size, 2, 2), dtype=complex)
+    s[:, 1, 0] = 1 - 0.99 / (1 + 1j * detuning)
+    s[:, 0, 1] = 0.5
+    return componentModel(f=f, s=s, nports=2)
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+@pytest.mark.parametrize("max_points", [500, 2000])
+def test_decimation_keeps_peaks(method, max_points) -> None:
+    y = 10 * np.log10(np.abs(resonator().s[:, 1, 0]) ** 2)
+    idx = decimate(f, y, max_points, method)
+    assert idx.size <= max_points and idx[0] == 0 and idx[-1] == f.size - 1
+    assert np.argmin(y) in idx
+
+    # wavelengths are decreasing
+    idx = decimate(f[::-1], y, max_points, method)
+    assert np.argmin(y) in idx
+
+
+def test_get_data_views() -> None:
+    component = resonator()
+    data = component.get_data(ports=[[1, 0]])
+    np.testing.assert_allclose(
+        data["S_1_0"], 10 * np.log10(np.abs(component.s[:, 1, 0]) ** 2)
+    )
+    assert data["yunit"] == "dB" and data["xdata"] is component.f
+
+    # derived quantities are cached per port pair, until the data changes
+    assert component.view(1, 0, "log") is data["S_1_0"]
+    component.s = component.s * 0.5
+    assert component.view(1, 0, "log") is not data["S_1_0"]
+
+    decimated = component.get_data(
+        ports=[[1, 0], [0, 1]], xscale="lambda", max_points=400
+    )
+    assert decimated["xdata"].size <= 800
+    assert decimated["S_1_0"].min() == component.view(1, 0, "log").min()
+
+    component.plot_sparameters(ports=[[1, 0]], show_freq=False, max_points=400)
+    component.plot_sparameters(ports=[[1, 0]], scale="phase")
+    assert matplotlib.pyplot.gca().get_ylabel() == "Phase (rad)"